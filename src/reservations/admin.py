@@ -13,6 +13,8 @@ from reservations.models import (
     Reservable,
     ReservableSet,
     Reservation,
+    ReservationReservable,
+    ReservationSeries,
     Resource,
     UserProfile,
 )
@@ -22,10 +24,22 @@ class StudentAdmin(admin.ModelAdmin):
     filter_horizontal = ("groups",)
 
 
+class ReservationReservableInline(admin.TabularInline):
+    model = ReservationReservable
+    fields = ("reservable",)
+    extra = 1
+
+
 class ReservationAdmin(GuardedModelAdmin):
     # This will generate a ModelForm
     # form = al.modelform_factory(Reservation, fields='__all__')
     search_fields = ("reason",)
+    inlines = (ReservationReservableInline,)
+
+
+class ReservationSeriesAdmin(GuardedModelAdmin):
+    search_fields = ("reason",)
+    list_filter = ("frequency",)
 
 
 class ReservableAdmin(admin.ModelAdmin):
@@ -33,6 +47,7 @@ class ReservableAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Reservation, ReservationAdmin)
+admin.site.register(ReservationSeries, ReservationSeriesAdmin)
 admin.site.register(Reservable, ReservableAdmin)
 admin.site.register(Resource)
 admin.site.register(NResources)
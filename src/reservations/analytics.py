@@ -0,0 +1,383 @@
+"""Occupancy rollups and utilisation of the reservables.
+
+The reserved time of every reservable is summed into hourly buckets in the
+:class:`~reservations.models.Occupancy` table. The buckets are updated by the
+signal handlers whenever reservables are added to reservations and when the
+reservation interval changes, and by the querysets deleting the reservations or
+their reservables, so the utilisation heat maps are read from the rollups instead of
+the reservations. Overlapping reservations are counted separately, so the
+utilisation of a double booked reservable exceeds one.
+
+Only the reservations are rolled up. The occurrences of the
+:class:`~reservations.models.ReservationSeries` are not stored and are unbounded
+without the until time, so they are expanded within the window of the heat map when
+it is read and added to the rolled up time.
+
+The rollups are rebuilt from scratch by the ``rebuild_occupancy`` command, from the
+current and the archived reservations (see :mod:`reservations.archive`). The
+bucket arithmetic is vectorised with NumPy when it is installed (the ``analytics``
+extra) and performed in Python otherwise. Note that changing the reservation
+interval through QuerySet.update bypasses the signals and requires a rebuild.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Optional
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from reservations.models import (
+    ArchivedReservation,
+    Occupancy,
+    ReservationReservable,
+    ReservationSeries,
+)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+#: The length of the bucket in seconds.
+BUCKET = 3600
+
+#: The number of objects written or (reservable, bucket) pairs updated at once.
+BATCH_SIZE = 1000
+
+#: The number of intervals converted to arrays at once by the vectorised rollup.
+CHUNK_SIZE = 100_000
+
+#: The largest (reservable, bucket) grid the vectorised rollup sums on.
+DENSE_GRID = 1 << 22
+
+#: The resolutions of the utilisation heat maps.
+RESOLUTIONS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+Interval = tuple[int, Optional[datetime], Optional[datetime]]
+
+
+def bucket_seconds(start: int, end: int) -> Iterator[tuple[int, int]]:
+    """Split the interval given in epoch seconds into the (bucket, seconds) pairs."""
+    bucket = start // BUCKET
+    while bucket * BUCKET < end:
+        yield bucket, min(end, (bucket + 1) * BUCKET) - max(start, bucket * BUCKET)
+        bucket += 1
+
+
+def bucket_start(bucket: int) -> datetime:
+    """Get the start of the bucket."""
+    return datetime.fromtimestamp(bucket * BUCKET, tz=UTC)
+
+
+def rollup(intervals: Iterable[Interval]) -> Iterator[tuple[int, int, int]]:
+    """Sum the reserved seconds of the (reservable, start, end) intervals.
+
+    The intervals without the start or the end are skipped.
+
+    :returns: the (reservable primary key, bucket, seconds) triples.
+    """
+    intervals = (
+        (reservable_id, int(start.timestamp()), int(end.timestamp()))
+        for reservable_id, start, end in intervals
+        if start is not None and end is not None
+    )
+    if numpy is not None:
+        return rollup_arrays(intervals)
+    totals: dict[tuple[int, int], int] = defaultdict(int)
+    for reservable_id, start, end in intervals:
+        for bucket, seconds in bucket_seconds(start, end):
+            totals[reservable_id, bucket] += seconds
+    return (
+        (reservable_id, bucket, seconds)
+        for (reservable_id, bucket), seconds in totals.items()
+    )
+
+
+def rollup_arrays(
+    intervals: Iterator[tuple[int, int, int]],
+) -> Iterator[tuple[int, int, int]]:
+    """Sum the reserved seconds of the intervals in epoch seconds with NumPy.
+
+    Every interval is expanded into the buckets it covers and the seconds in the
+    buckets are computed for the whole chunk at once. The seconds are summed on the
+    dense (reservable, bucket) grid of the chunk, which is small when the intervals
+    are sorted by their start, or by sorting the keys otherwise. The sums of the
+    chunks are merged the same way.
+    """
+    keys, sums = [], []
+    while chunk := list(islice(intervals, CHUNK_SIZE)):
+        reservable_ids, starts, ends = numpy.array(chunk, dtype=numpy.int64).T
+        first = starts // BUCKET
+        counts = numpy.maximum((ends - 1) // BUCKET - first + 1, 0)
+        rows = numpy.repeat(numpy.arange(len(chunk)), counts)
+        buckets = first[rows] + (
+            numpy.arange(counts.sum())
+            - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        )
+        seconds = numpy.minimum(ends[rows], (buckets + 1) * BUCKET) - numpy.maximum(
+            starts[rows], buckets * BUCKET
+        )
+        # The buckets since the epoch fit into 32 bits.
+        chunk_keys, chunk_sums = sum_by_key(
+            (reservable_ids[rows] << 32) | buckets, seconds
+        )
+        keys.append(chunk_keys)
+        sums.append(chunk_sums)
+    if len(keys) > 1:
+        keys, sums = sum_by_key(numpy.concatenate(keys), numpy.concatenate(sums))
+    elif keys:
+        keys, sums = keys[0], sums[0]
+    else:
+        return iter(())
+    return zip(
+        (keys >> 32).tolist(), (keys & 0xFFFFFFFF).tolist(), sums.tolist(), strict=True
+    )
+
+
+def sum_by_key(keys, values):
+    """Sum the values with the same (reservable << 32 | bucket) key with NumPy.
+
+    :returns: the array of the distinct keys and the array of the sums.
+    """
+    reservables = keys >> 32
+    buckets = keys & 0xFFFFFFFF
+    if not len(keys):
+        return keys, values
+    lowest = buckets.min()
+    span = int(buckets.max() - lowest + 1)
+    present = numpy.zeros(reservables.max() + 1, dtype=bool)
+    present[reservables] = True
+    distinct = numpy.flatnonzero(present)
+    if len(distinct) * span <= DENSE_GRID:
+        index = numpy.cumsum(present) - 1
+        totals = numpy.bincount(
+            index[reservables] * span + (buckets - lowest),
+            values,
+            len(distinct) * span,
+        )
+        cells = numpy.flatnonzero(totals)
+        keys = (distinct[cells // span] << 32) | (cells % span + lowest)
+        return keys, totals[cells].astype(numpy.int64)
+    keys, inverse = numpy.unique(keys, return_inverse=True)
+    return keys, numpy.bincount(inverse, values).astype(numpy.int64)
+
+
+def apply_intervals(intervals: Iterable[Interval], sign: int = 1):
+    """Add (or subtract with the negative sign) the intervals to the rollups.
+
+    The missing buckets are created first and the buckets changed by the same number
+    of seconds are updated together.
+    """
+    changes = {
+        (reservable_id, bucket): sign * seconds
+        for reservable_id, bucket, seconds in rollup(intervals)
+        if seconds
+    }
+    if not changes:
+        return
+    Occupancy.objects.bulk_create(
+        (
+            Occupancy(reservable_id=reservable_id, start=bucket_start(bucket))
+            for reservable_id, bucket in changes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    grouped = defaultdict(list)
+    for (reservable_id, bucket), change in changes.items():
+        grouped[change, bucket].append(reservable_id)
+    for (change, bucket), reservable_ids in grouped.items():
+        for offset in range(0, len(reservable_ids), BATCH_SIZE):
+            Occupancy.objects.filter(
+                reservable__in=reservable_ids[offset : offset + BATCH_SIZE],
+                start=bucket_start(bucket),
+            ).update(seconds=F("seconds") + change)
+
+
+@transaction.atomic
+def rebuild(reservables: Optional[Iterable] = None) -> int:
+    """Recompute the rollups from the reservation reservables.
+
+    The reservables of the archived reservations are rolled up with the intervals of
+    their reservations, the archive keeps them in the rollups. The buckets are written with plain inserts, skipping the construction of the
+    model instances which dominates the time of the bulk create.
+
+    :param reservables: the reservables or their primary keys, all by default.
+    :returns: the number of the written buckets.
+    """
+    occupancy = Occupancy.objects.all()
+    rows = ReservationReservable.objects.values_list("reservable", "start", "end")
+    archived = ArchivedReservation.reservables.through.objects.values_list(
+        "reservable", "archivedreservation__start", "archivedreservation__end"
+    )
+    if reservables is not None:
+        pks = {getattr(reservable, "pk", reservable) for reservable in reservables}
+        occupancy = occupancy.filter(reservable__in=pks)
+        rows = rows.filter(reservable__in=pks)
+        archived = archived.filter(reservable__in=pks)
+    occupancy.delete()
+    # The intervals are rolled up in the order of their start.
+    totals = rollup(
+        merge(
+            archived.order_by("archivedreservation__start").iterator(
+                chunk_size=CHUNK_SIZE
+            ),
+            rows.order_by("start").iterator(chunk_size=CHUNK_SIZE),
+            key=itemgetter(1),
+        )
+    )
+    quote = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    insert = "INSERT INTO {} ({}) VALUES (%s, %s, %s)".format(
+        quote(Occupancy._meta.db_table),
+        ", ".join(
+            quote(Occupancy._meta.get_field(name).column)
+            for name in ("reservable", "start", "seconds")
+        ),
+    )
+    count = 0
+    with connection.cursor() as cursor:
+        while batch := [
+            (reservable_id, adapt(bucket_start(bucket)), seconds)
+            for reservable_id, bucket, seconds in islice(totals, BATCH_SIZE)
+            if seconds
+        ]:
+            cursor.executemany(insert, batch)
+            count += len(batch)
+    return count
+
+
+def occurrence_seconds(
+    reservables: models.QuerySet, group: str, keys: list, boundaries: list[datetime]
+) -> Iterator[tuple[Any, int, int]]:
+    """Split the occurrences of the series on the reservables into the buckets.
+
+    Only the series overlapping the window are expanded and only the reservables of
+    these series are mapped to their groups.
+
+    :param keys: the groups of the heat map.
+    :param boundaries: the starts of the buckets followed by the end of the last one.
+    :returns: the (group, bucket index, seconds) triples.
+    """
+    start, end = boundaries[0], boundaries[-1]
+    series = list(
+        ReservationSeries.objects.overlapping(
+            start, end, reservables.order_by().values("pk")
+        )
+    )
+    if not series:
+        return
+    groups = defaultdict(list)
+    for pk, key in (
+        reservables.order_by()
+        .filter(
+            pk__in={
+                reservable.pk for one in series for reservable in one.reservables.all()
+            },
+            **{f"{group}__in": keys},
+        )
+        .values_list("pk", group)
+    ):
+        groups[pk].append(key)
+    for (
+        reservable_id,
+        occurrence_start,
+        occurrence_end,
+        _,
+    ) in ReservationSeries.objects.expand(series, set(groups), start, end):
+        column = max(bisect_right(boundaries, occurrence_start) - 1, 0)
+        while column < len(boundaries) - 1 and boundaries[column] < occurrence_end:
+            seconds = int(
+                (
+                    min(occurrence_end, boundaries[column + 1])
+                    - max(occurrence_start, boundaries[column])
+                ).total_seconds()
+            )
+            for key in groups[reservable_id]:
+                yield key, column, seconds
+            column += 1
+
+
+def utilisation(
+    reservables: models.QuerySet,
+    group: str,
+    start: datetime,
+    end: datetime,
+    resolution: str = "hour",
+) -> dict:
+    """Get the heat map of the reserved time of the groups of the reservables.
+
+    The reserved seconds are summed by the group and the bucket in the database. The
+    window is extended to the whole hours, or to the whole days in the current time
+    zone. Every row of the heat map contains the reserved minutes and the
+    utilisation, the reserved time divided by the time of all the reservables in the
+    group, in every bucket. The occurrences of the reservation series are expanded
+    within the window and counted like the reservations.
+
+    :param group: the path of the reservable field the reservables are grouped by,
+        a reservable can belong to several groups.
+    """
+    step = RESOLUTIONS[resolution]
+    if resolution == "day":
+        first = timezone.localtime(start).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        bucket = TruncDay("start")
+    else:
+        first = start.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+        bucket = F("start")
+    count = -(-(end - first) // step)
+    sizes = dict(
+        reservables.order_by()
+        .exclude(**{f"{group}__isnull": True})
+        .values_list(group)
+        .annotate(size=Count("pk", distinct=True))
+    )
+
+    seconds = {key: [0] * count for key in sizes}
+    for key, when, reserved in (
+        Occupancy.objects.filter(
+            reservable__in=reservables.order_by().values("pk"),
+            start__gte=first,
+            start__lt=end,
+            **{f"reservable__{group}__in": list(sizes)},
+        )
+        .annotate(bucket=bucket)
+        .values_list(f"reservable__{group}", "bucket")
+        .annotate(total=Sum("seconds"))
+    ):
+        if resolution == "day":
+            column = (timezone.localtime(when).date() - first.date()).days
+        else:
+            column = (when - first) // step
+        seconds[key][column] += reserved
+
+    buckets = [first + i * step for i in range(count + 1)]
+    for key, column, reserved in occurrence_seconds(
+        reservables, group, list(sizes), buckets
+    ):
+        seconds[key][column] += reserved
+
+    return {
+        "resolution": resolution,
+        "buckets": buckets[:-1],
+        "rows": [
+            {
+                "group": key,
+                "reservables": sizes[key],
+                "minutes": [round(value / 60, 2) for value in seconds[key]],
+                "utilisation": [
+                    round(value / (step.total_seconds() * sizes[key]), 4)
+                    for value in seconds[key]
+                ],
+            }
+            for key in sorted(seconds)
+        ],
+    }
@@ -5,6 +5,7 @@ Reservatons app
 ===============
 
 """
+
 from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
@@ -14,3 +15,7 @@ class ReservationsConfig(AppConfig):
 
     name = "reservations"
     verbose_name = _("Reservations")
+
+    def ready(self):
+        """Connect the signal handlers."""
+        from reservations import signals  # noqa: F401
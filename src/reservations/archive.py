@@ -0,0 +1,181 @@
+"""Archival of past reservations.
+
+The reservations that ended before a cutoff are moved in batches from the
+reservation tables into the archive tables, so the overlap checks, the filtered
+listings and the exports of the current reservations only read the working set.
+Every batch is copied with INSERT ... SELECT statements and deleted with plain
+DELETE statements in its own transaction. The rows are moved in the database and the
+signal handlers are bypassed: the archived reservations stay in the occupancy
+rollups and no tombstones are left in the change feed, since the reservations still
+exist.
+
+The reservation endpoint reads the archive only for the queries which may match
+archived reservations, that is when the lower bound of the filtered window is not
+after the :meth:`~reservations.models.ArchivedReservationManager.horizon`.
+"""
+
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from reservations.models import (
+    ArchivedNRequirements,
+    ArchivedReservation,
+    NRequirements,
+    Reservation,
+    ReservationReservable,
+)
+
+#: The number of reservations moved at once.
+BATCH_SIZE = 1000
+
+#: The filters of the reservations giving a lower bound of their end, by whether the
+#: end must be after the bound.
+LOWER_BOUNDS = {
+    "start": True,
+    "start__gt": True,
+    "start__gte": True,
+    "end": False,
+    "end__gt": True,
+    "end__gte": False,
+}
+
+
+def reads_archive(
+    bounds: dict[str, Optional[datetime]], horizon: Optional[datetime]
+) -> bool:
+    """Can the reservations within the lower bounds be archived.
+
+    :param bounds: the values of the :data:`LOWER_BOUNDS` filters.
+    :param horizon: the horizon of the archive.
+    """
+    if horizon is None:
+        return False
+    return not any(
+        bound is not None
+        and (bound > horizon or bound == horizon and LOWER_BOUNDS[name])
+        for name, bound in bounds.items()
+    )
+
+
+def copy_rows(
+    source: type[models.Model],
+    target: type[models.Model],
+    fields: dict[str, str],
+    key: str,
+    pks: list[int],
+    constants: Optional[dict[str, object]] = None,
+):
+    """Copy the rows of the source table with the keys into the target table.
+
+    :param fields: the target fields by the source fields.
+    :param key: the source field holding the keys.
+    :param constants: the values of the target fields set to the same value.
+    """
+    quote = connection.ops.quote_name
+    constants = constants or {}
+    columns = [target._meta.get_field(name).column for name in fields.values()]
+    columns += [target._meta.get_field(name).column for name in constants]
+    values = [quote(source._meta.get_field(name).column) for name in fields]
+    values += ["%s"] * len(constants)
+    sql = "INSERT INTO {} ({}) SELECT {} FROM {} WHERE {} IN ({})".format(
+        quote(target._meta.db_table),
+        ", ".join(map(quote, columns)),
+        ", ".join(values),
+        quote(source._meta.db_table),
+        quote(source._meta.get_field(key).column),
+        ", ".join(["%s"] * len(pks)),
+    )
+    params = [
+        target._meta.get_field(name).get_db_prep_value(value, connection)
+        for name, value in constants.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, *pks])
+
+
+def delete_rows(model: type[models.Model], key: str, pks: list[int]):
+    """Delete the rows of the table with the keys, bypassing the signal handlers."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM {} WHERE {} IN ({})".format(
+                quote(model._meta.db_table),
+                quote(model._meta.get_field(key).column),
+                ", ".join(["%s"] * len(pks)),
+            ),
+            pks,
+        )
+
+
+def archive_batch(pks: list[int]):
+    """Move the reservations with their relations into the archive."""
+    Owner = Reservation.owners.through
+    ArchivedOwner = ArchivedReservation.owners.through
+    ArchivedReservable = ArchivedReservation.reservables.through
+    copy_rows(
+        Reservation,
+        ArchivedReservation,
+        {name: name for name in ("id", "reason", "start", "end", "series", "sequence")},
+        "id",
+        pks,
+        {"archived": timezone.now()},
+    )
+    copy_rows(
+        Owner,
+        ArchivedOwner,
+        {"reservation": "archivedreservation", "user": "user"},
+        "reservation",
+        pks,
+    )
+    copy_rows(
+        ReservationReservable,
+        ArchivedReservable,
+        {"reservation": "archivedreservation", "reservable": "reservable"},
+        "reservation",
+        pks,
+    )
+    copy_rows(
+        NRequirements,
+        ArchivedNRequirements,
+        {name: name for name in ("resource", "reservation", "n")},
+        "reservation",
+        pks,
+    )
+    for model in (Owner, ReservationReservable, NRequirements):
+        delete_rows(model, "reservation", pks)
+    delete_rows(Reservation, "id", pks)
+
+
+def archive(
+    before: datetime,
+    batch_size: int = BATCH_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Move the reservations which ended before the given time into the archive.
+
+    The reservations are selected by their primary keys, every batch is locked and
+    moved in its own transaction.
+
+    :param progress: called with the number of moved reservations after every batch.
+    :returns: the number of the archived reservations.
+    """
+    count = 0
+    last = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                Reservation.objects.select_for_update()
+                .filter(end__lt=before, pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                return count
+            archive_batch(pks)
+        count += len(pks)
+        last = pks[-1]
+        if progress is not None:
+            progress(count)
@@ -0,0 +1,289 @@
+"""Asynchronous read-only endpoints.
+
+The reservation and reservable lists and the availability of the reservables are
+also served by native async views under ``/api/async/``. Their queries are awaited
+with the async ORM, so on an ASGI server (see ``tests/asgi.py``) the requests
+waiting for the database do not hold the workers of the server and the bursts of
+polling clients are served by the event loop. The middleware of the project is
+async-capable, so the requests are not passed through threads on their way to the
+views.
+
+The views accept the query parameters of the REST endpoints and respond with the
+same JSON representations: they reuse the authentication classes, the filters, the
+serializers, the keyset pagination and the permission classes of the REST views.
+The authentication and the permission checks may read the database synchronously,
+so they run in a thread together with the filters. The catalog cache and the
+conditional responses of the REST endpoints are not used.
+"""
+
+import abc
+from heapq import merge
+from operator import attrgetter
+from typing import Iterable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django_filters.rest_framework import DjangoFilterBackend
+
+from django.db import models
+from django.http import HttpRequest, HttpResponse
+from django.views import View
+
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from reservations.availability import aavailability
+from reservations.filters import (
+    ArchivedReservationFilter,
+    ReservableAvailabilityFilter,
+    ReservableFilter,
+    ReservationFilter,
+    ReservationSeriesExportFilter,
+)
+from reservations.models import (
+    ArchivedReservation,
+    Occurrence,
+    Reservable,
+    Reservation,
+    ReservationSeries,
+)
+from reservations.pagination import KeysetPagination
+from reservations.permissions import ReservationPermission
+from reservations.serializers import (
+    AvailabilityWindowSerializer,
+    FlatReservationSerializer,
+    ReservableSerializer,
+    ReservationSerializer,
+    SeriesOccurrenceSerializer,
+    serialize_entries,
+)
+
+
+class AsyncReadView(View, abc.ABC):
+    """Base of the asynchronous read-only views.
+
+    The subclasses read the data of the response from the filtered queryset.
+    """
+
+    http_method_names = ["get", "head"]
+
+    queryset: models.QuerySet
+    filterset_class: type
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+
+    def get_queryset(self) -> models.QuerySet:
+        """Get the queryset of the objects, used by the permission classes too."""
+        return self.queryset.all()
+
+    def check_permissions(self, request: Request):
+        """Check the permission classes.
+
+        :raises PermissionDenied: if the permission is denied.
+        """
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                raise exceptions.PermissionDenied()
+
+    def filter_queryset(self, request: Request) -> models.QuerySet:
+        """Filter the queryset by the query parameters.
+
+        :raises ValidationError: if the query parameters are not valid.
+        """
+        return DjangoFilterBackend().filter_queryset(request, self.get_queryset(), self)
+
+    def initial(self, request: Request) -> models.QuerySet:
+        """Authenticate the user, check the permissions and filter the queryset.
+
+        :raises APIException: if the request is not authenticated, permitted or
+            valid.
+        """
+        # The user is authenticated on the first access.
+        request.user
+        self.check_permissions(request)
+        return self.filter_queryset(request)
+
+    @abc.abstractmethod
+    async def read(self, request: Request, queryset: models.QuerySet, **kwargs):
+        """Get the data of the response."""
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Check the request, filter the queryset and render the data."""
+        request = Request(
+            request, authenticators=[auth() for auth in self.authentication_classes]
+        )
+        try:
+            queryset = await sync_to_async(self.initial)(request)
+            data = await self.read(request, queryset, **kwargs)
+        except exceptions.APIException as error:
+            return self.handle_exception(request, error)
+        return self.render(data)
+
+    def handle_exception(
+        self, request: Request, error: exceptions.APIException
+    ) -> HttpResponse:
+        """Render the error like the REST views.
+
+        The unauthenticated requests are challenged by the first authentication
+        class, or forbidden when it has no challenge.
+        """
+        status, headers = error.status_code, {}
+        if isinstance(
+            error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            challenge = None
+            if request.authenticators:
+                challenge = request.authenticators[0].authenticate_header(request)
+            if challenge:
+                headers["WWW-Authenticate"] = challenge
+            else:
+                status = exceptions.PermissionDenied.status_code
+        detail = error.detail
+        if not isinstance(detail, (dict, list)):
+            detail = {"detail": detail}
+        return self.render(detail, status, headers)
+
+    def render(self, data, status: int = 200, headers=None) -> HttpResponse:
+        """Render the data as JSON like the REST views."""
+        renderer = JSONRenderer()
+        return HttpResponse(
+            renderer.render(data),
+            content_type=renderer.media_type,
+            status=status,
+            headers=headers,
+        )
+
+
+class AsyncPaginatedView(AsyncReadView):
+    """Base of the asynchronous views of the lists paginated by the keyset."""
+
+    serializer_class: type
+    keyset_ordering: tuple[str, ...]
+
+    def get_serializer_class(self, request: Request) -> type:
+        """Get the serializer of the objects."""
+        return self.serializer_class
+
+    async def read_list(
+        self, request: Request, querysets: Iterable[models.QuerySet], entries=None
+    ) -> object:
+        """Read and serialize the objects of the querysets merged by the keyset.
+
+        :param entries: the coroutine function getting the entries which are not
+            stored, see the asynchronous pagination of the keyset.
+        """
+        serializer_class = self.get_serializer_class(request)
+        querysets = [serializer_class.setup_eager_loading(qs) for qs in querysets]
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_querysets(
+            querysets, request, view=self, entries=entries
+        )
+        context = {"request": request}
+        if page is not None:
+            data = serialize_entries(serializer_class, page, context)
+            return paginator.get_paginated_response(data).data
+        if len(querysets) == 1 and entries is None:
+            objects = [instance async for instance in querysets[0]]
+        else:
+            lists = []
+            for queryset in querysets:
+                ordered = queryset.order_by(*self.keyset_ordering)
+                lists.append([instance async for instance in ordered])
+            if entries is not None:
+                lists.append(await entries(None))
+            objects = list(merge(*lists, key=attrgetter(*self.keyset_ordering)))
+        return serialize_entries(serializer_class, objects, context)
+
+
+class AsyncReservationList(AsyncPaginatedView):
+    """List the reservations, with the archived ones when the query can match any,
+    and the occurrences of the series matching the query.
+
+    The flat representation is selected by the ``flat`` query parameter.
+    """
+
+    queryset = Reservation.objects.all()
+    filterset_class = ReservationFilter
+    permission_classes = (ReservationPermission,)
+    serializer_class = ReservationSerializer
+    keyset_ordering = ("start", "id")
+
+    def get_serializer_class(self, request: Request) -> type:
+        """Use the flat serializer when requested."""
+        if request.query_params.get("flat") in ("1", "true", "yes"):
+            return FlatReservationSerializer
+        return self.serializer_class
+
+    async def read(self, request: Request, queryset: models.QuerySet, **kwargs):
+        """Read the page or the list of the reservations and the occurrences."""
+        querysets = [queryset]
+        horizon = await ArchivedReservation.objects.ahorizon()
+        if horizon is not None:
+            # The filters were validated with the current reservations.
+            archived = ArchivedReservationFilter.filter_archive(request, horizon)
+            if archived is not None:
+                querysets.append(archived)
+        series = ReservationSeriesExportFilter(
+            request.query_params,
+            queryset=ReservationSeries.objects.all(),
+            request=request,
+        )
+
+        async def occurrences(cursor: Optional[tuple]) -> Iterator[Occurrence]:
+            since = None if cursor is None else cursor[0]
+            queryset = SeriesOccurrenceSerializer.setup_eager_loading(
+                series.qs.occurring(since, None)
+            )
+            matching = [one async for one in queryset]
+            return (
+                Occurrence(*occurrence)
+                for occurrence in series.occurrences(matching, since)
+            )
+
+        return await self.read_list(request, querysets, occurrences)
+
+
+class AsyncReservableList(AsyncPaginatedView):
+    """List the reservables."""
+
+    queryset = Reservable.objects.all()
+    filterset_class = ReservableFilter
+    serializer_class = ReservableSerializer
+    keyset_ordering = ("slug",)
+
+    async def read(self, request: Request, queryset: models.QuerySet, **kwargs):
+        """Read the page or the list of the reservables."""
+        return await self.read_list(request, [queryset])
+
+
+class AsyncAvailability(AsyncReadView):
+    """Get the busy and free intervals of the reservables.
+
+    The reservables are filtered by the query parameters or given by the slug in the
+    URL.
+    """
+
+    queryset = Reservable.objects.all()
+    filterset_class = ReservableAvailabilityFilter
+
+    async def read(
+        self,
+        request: Request,
+        queryset: models.QuerySet,
+        slug: Optional[str] = None,
+        **kwargs,
+    ):
+        """Read the availability in the window given by the query parameters."""
+        window = AvailabilityWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        reservables = queryset.values_list("pk", "slug")
+        if slug is not None:
+            reservables = reservables.filter(slug=slug)
+            if await reservables.afirst() is None:
+                raise exceptions.NotFound(
+                    f"No {Reservable._meta.object_name} matches the given query."
+                )
+        return await aavailability(
+            reservables, window.validated_data["start"], window.validated_data["end"]
+        )
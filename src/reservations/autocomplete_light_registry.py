@@ -5,12 +5,13 @@ Created on Jun 17, 2014
 """
 
 from autocomplete_light import shortcuts as al
-from guardian.shortcuts import get_objects_for_user
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 
 from reservations.models import Reservable, Reservation
+from reservations.search import find
 
 #
 # autocomplete_light.register(Reservable,
@@ -26,17 +27,28 @@ from reservations.models import Reservable, Reservation
 # )
 
 
-class ReservableAutocomplete(al.AutocompleteModelBase):
+class SearchIndexMixin:
+    """Find the choices in the search index instead of scanning the table."""
+
+    def _choices_for_request_conditions(self, q, search_fields):
+        words = q.strip().split() if self.split_words else [q]
+        found = [find(self.model, search_fields, word) for word in words]
+        if not found or None in found:
+            return super()._choices_for_request_conditions(q, search_fields)
+        if self.split_words == "or":
+            return Q(pk__in=set.union(*found))
+        return Q(pk__in=set.intersection(*found))
+
+
+class ReservableAutocomplete(SearchIndexMixin, al.AutocompleteModelBase):
     search_fields = ["slug", "name"]
     model = Reservable
     widget_attrs = {"data-widget-maximum-values": 30}
 
     def choices_for_request(self):
         if not self.request.user.is_staff:
-            self.choices = get_objects_for_user(
-                self.request.user, "reserve", self.choices
-            )
-            # Only retrieve reservables user can see
+            # Only retrieve reservables user can see, read from the permission map.
+            self.choices = self.choices.permitted(self.request.user, "reserve")
         return super(ReservableAutocomplete, self).choices_for_request()
 
     def choice_label(self, choice):
@@ -46,7 +58,7 @@ class ReservableAutocomplete(al.AutocompleteModelBase):
 al.register(Reservable, ReservableAutocomplete)
 
 
-class UserAutocomplete(al.AutocompleteModelBase):
+class UserAutocomplete(SearchIndexMixin, al.AutocompleteModelBase):
     search_fields = ["first_name", "last_name", "username"]
     model = get_user_model()
     widget_attrs = {"data-widget-maximum-values": 30}
@@ -0,0 +1,254 @@
+"""Busy and free intervals of reservables.
+
+The busy intervals of all the requested reservables are read with a single ordered
+query on the reservation-reservable table, completed with the occurrences of the
+reservation series and merged with a sweep over the intervals of every reservable.
+The queries of the availability can also be awaited with the async ORM.
+"""
+
+from datetime import datetime, timedelta
+from heapq import heapify, heappop, heappush
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, Optional
+
+from django.db import models
+
+from reservations.models import ReservationReservable, ReservationSeries
+
+Interval = tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> list[Interval]:
+    """Merge the overlapping and adjacent intervals.
+
+    The intervals must be sorted by their start.
+    """
+    merged: list[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_intervals(busy: list[Interval], start: datetime, end: datetime):
+    """Get the gaps between the merged busy intervals inside the window."""
+    free: list[Interval] = []
+    for busy_start, busy_end in busy:
+        if start < busy_start:
+            free.append((start, busy_start))
+        start = max(start, busy_end)
+    if start < end:
+        free.append((start, end))
+    return free
+
+
+def find_overlaps(
+    intervals: list[tuple[datetime, datetime, Optional[int]]],
+) -> set[int]:
+    """Get the indices of the new intervals overlapping any other interval.
+
+    :param intervals: the (start, end, index) intervals sorted by their start. The
+        index is None for the existing intervals.
+    """
+    overlapping = set()
+    # The (end, position) of the intervals overlapping the current start.
+    active: list[tuple[datetime, int]] = []
+    for position, (start, end, index) in enumerate(intervals):
+        while active and active[0][0] <= start:
+            heappop(active)
+        if active:
+            if index is not None:
+                overlapping.add(index)
+            overlapping.update(
+                intervals[other][2]
+                for _end, other in active
+                if intervals[other][2] is not None
+            )
+        heappush(active, (end, position))
+    return overlapping
+
+
+def interval_rows(
+    reservable_ids: Iterable[int], start: datetime, end: datetime
+) -> models.QuerySet:
+    """Get the (reservable id, start, end) rows of the reservations in the window.
+
+    The rows are sorted by the reservable and the start.
+    """
+    return (
+        ReservationReservable.objects.filter(
+            reservable__in=reservable_ids, end__gt=start, start__lt=end
+        )
+        .order_by("reservable_id", "start")
+        .values_list("reservable_id", "start", "end")
+    )
+
+
+def collect_intervals(
+    intervals: dict[int, list[Interval]],
+    rows: Iterable[tuple[int, datetime, datetime]],
+    occurrences: Iterable[tuple[int, datetime, datetime, int]],
+) -> dict[int, list[Interval]]:
+    """Add the sorted rows and the occurrences to the intervals of the reservables.
+
+    The intervals of every reservable are sorted by their start.
+    """
+    for reservable_id, group in groupby(rows, key=itemgetter(0)):
+        intervals[reservable_id] = [row[1:] for row in group]
+
+    unsorted = set()
+    for reservable_id, occurrence_start, occurrence_end, _series in occurrences:
+        intervals[reservable_id].append((occurrence_start, occurrence_end))
+        unsorted.add(reservable_id)
+    for reservable_id in unsorted:
+        intervals[reservable_id].sort()
+    return intervals
+
+
+def existing_intervals(
+    reservable_ids: Iterable[int],
+    start: datetime,
+    end: datetime,
+    exclude_series: Optional[int] = None,
+) -> dict[int, list[Interval]]:
+    """Get the intervals of reservations and series occurrences on reservables.
+
+    The intervals overlapping the window are sorted by their start.
+    """
+    intervals: dict[int, list[Interval]] = {pk: [] for pk in reservable_ids}
+    return collect_intervals(
+        intervals,
+        interval_rows(list(intervals), start, end).iterator(),
+        ReservationSeries.objects.occurrences(
+            start, end, list(intervals), exclude=exclude_series
+        ),
+    )
+
+
+async def aexisting_intervals(
+    reservable_ids: Iterable[int], start: datetime, end: datetime
+) -> dict[int, list[Interval]]:
+    """Get the intervals of reservations and series occurrences asynchronously."""
+    intervals: dict[int, list[Interval]] = {pk: [] for pk in reservable_ids}
+    rows = [row async for row in interval_rows(list(intervals), start, end)]
+    series = [
+        one
+        async for one in ReservationSeries.objects.overlapping(
+            start, end, list(intervals)
+        )
+    ]
+    return collect_intervals(
+        intervals,
+        rows,
+        ReservationSeries.objects.expand(series, set(intervals), start, end),
+    )
+
+
+def clip_timelines(
+    intervals: dict[int, list[Interval]], start: datetime, end: datetime
+) -> dict[int, list[Interval]]:
+    """Merge the sorted intervals of the reservables and clip them to the window."""
+    return {
+        reservable_id: merge_intervals(
+            (max(interval_start, start), min(interval_end, end))
+            for interval_start, interval_end in reservable_intervals
+        )
+        for reservable_id, reservable_intervals in intervals.items()
+    }
+
+
+def busy_timelines(
+    reservable_ids: Iterable[int], start: datetime, end: datetime
+) -> dict[int, list[Interval]]:
+    """Get the merged busy intervals of reservables clipped to the window."""
+    return clip_timelines(existing_intervals(reservable_ids, start, end), start, end)
+
+
+def describe_timelines(
+    slugs: dict[int, str],
+    timelines: dict[int, list[Interval]],
+    start: datetime,
+    end: datetime,
+) -> list[dict]:
+    """Get the busy and free intervals of the reservables from their timelines."""
+    return [
+        {
+            "reservable": slugs[pk],
+            "start": start,
+            "end": end,
+            "busy": [{"start": s, "end": e} for s, e in busy],
+            "free": [
+                {"start": s, "end": e} for s, e in free_intervals(busy, start, end)
+            ],
+        }
+        for pk, busy in timelines.items()
+    ]
+
+
+def availability(
+    reservables: Iterable[tuple[int, str]], start: datetime, end: datetime
+) -> list[dict]:
+    """Get the busy and free intervals of the (pk, slug) reservables in the window."""
+    slugs = dict(reservables)
+    return describe_timelines(slugs, busy_timelines(slugs, start, end), start, end)
+
+
+async def aavailability(
+    reservables: models.QuerySet, start: datetime, end: datetime
+) -> list[dict]:
+    """Get the busy and free intervals of the reservables asynchronously.
+
+    :param reservables: the values list query of the (pk, slug) pairs.
+    """
+    slugs = {pk: slug async for pk, slug in reservables}
+    intervals = await aexisting_intervals(slugs, start, end)
+    return describe_timelines(slugs, clip_timelines(intervals, start, end), start, end)
+
+
+def candidate_starts(
+    busy: list[Interval], start: datetime, end: datetime, duration: timedelta
+) -> Iterator[datetime]:
+    """Get the starts of the free intervals long enough for the duration."""
+    for free_start, free_end in free_intervals(busy, start, end):
+        if free_end - free_start >= duration:
+            yield free_start
+
+
+def earliest_slots(
+    reservables: Iterable[tuple[int, str]],
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+    limit: int,
+) -> list[dict]:
+    """Get the earliest slots of the given duration on the (pk, slug) reservables.
+
+    The candidate slots of every reservable are generated lazily from its busy
+    timeline and the earliest ones are picked using a priority queue.
+    """
+    slugs = dict(reservables)
+    candidates = {
+        pk: candidate_starts(busy, start, end, duration)
+        for pk, busy in busy_timelines(slugs, start, end).items()
+    }
+    queue = []
+    for pk, starts in candidates.items():
+        first = next(starts, None)
+        if first is not None:
+            queue.append((first, slugs[pk], pk))
+    heapify(queue)
+
+    slots = []
+    while queue and len(slots) < limit:
+        slot_start, slug, pk = heappop(queue)
+        slots.append(
+            {"reservable": slug, "start": slot_start, "end": slot_start + duration}
+        )
+        following = next(candidates[pk], None)
+        if following is not None:
+            heappush(queue, (following, slug, pk))
+    return slots
@@ -0,0 +1,1083 @@
+"""Performance benchmarks for the reservations application.
+
+The benchmarks are run by the ``benchmark`` management command. Every benchmark
+generates its own data which is rolled back once the benchmark is finished, except
+for the benchmarks serving requests from other threads, which commit their data and
+delete it themselves.
+
+The results can be written as JSON together with the versions and the database
+they were measured on, and compared with the results of a previous release: the
+results are matched by the benchmark, the scale and the other text values (the
+request, the mode, ...) and the median times are compared.
+"""
+
+import asyncio
+import io
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import metadata
+from typing import Callable, Iterator
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import resolve
+from django.utils import timezone
+
+from rest_framework.request import Request
+from rest_framework.reverse import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from reservations import analytics, search
+from reservations.archive import archive, delete_rows
+from reservations.availability import availability
+from reservations.bulk import overlapped_reservables
+from reservations.generate import Generator
+from reservations.models import (
+    NRequirements,
+    NResources,
+    Reservable,
+    ReservablePermission,
+    ReservableSet,
+    Reservation,
+    ReservationReservable,
+    ReservationSeries,
+    Resource,
+)
+from reservations.renderers import ReservationCSVRenderer, ReservationICSRenderer
+from reservations.serializers import FlatReservationSerializer, ReservationSerializer
+
+#: Registered benchmarks by name.
+BENCHMARKS: dict[str, Callable[..., Iterator[dict]]] = {}
+
+#: The number of objects created by a single bulk insert.
+BATCH_SIZE = 10_000
+
+#: The number of threads of the WSGI server in the concurrency benchmark.
+WSGI_THREADS = 32
+
+
+def benchmark(name: str, rollback: bool = True):
+    """Register the decorated generator function as a benchmark.
+
+    The function is called with the list of scales and the number of repetitions and
+    yields one result per scale.
+
+    :param rollback: run the benchmark in a transaction which is rolled back,
+        otherwise the benchmark must delete its data.
+    """
+
+    def register(function):
+        function.rollback = rollback
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Get the nearest-rank percentile of the sorted values."""
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    """Call the function repeatedly and return the timing summary in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+    }
+
+
+def environment() -> dict:
+    """Describe the environment the benchmarks run in."""
+    try:
+        version = metadata.version("reservations")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "version": version,
+        "time": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": (
+            f"{connection.vendor} {connection.Database.sqlite_version}"
+            if connection.vendor == "sqlite"
+            else connection.vendor
+        ),
+        "machine": platform.machine(),
+    }
+
+
+def result_key(name: str, result: dict) -> tuple:
+    """Get the key matching the results of the benchmark between the runs."""
+    return (
+        name,
+        result.get("scale"),
+        *sorted(
+            (key, value) for key, value in result.items() if isinstance(value, str)
+        ),
+    )
+
+
+def regressions(results: list[dict], baseline: list[dict], threshold: float) -> list:
+    """Find the results slower than the baseline.
+
+    :param results: the results with the name of their ``benchmark``.
+    :param threshold: the allowed slowdown of the median time in percent.
+    :returns: the (result, baseline result, slowdown in percent) triples.
+    """
+    previous = {
+        result_key(result["benchmark"], result): result
+        for result in baseline
+        if result.get("median_ms")
+    }
+    found = []
+    for result in results:
+        before = previous.get(result_key(result["benchmark"], result))
+        if before is None or result.get("median_ms") is None:
+            continue
+        slowdown = (result["median_ms"] / before["median_ms"] - 1) * 100
+        if slowdown > threshold:
+            found.append((result, before, round(slowdown, 1)))
+    return found
+
+
+def api_request(path: str) -> Request:
+    """Build a GET request for the path on a host allowed by the settings."""
+    return Request(APIRequestFactory().get(path, HTTP_HOST=api_host()))
+
+
+def api_host() -> str:
+    """Get a host allowed by the settings."""
+    return next(
+        (host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"),
+        "localhost",
+    )
+
+
+def create_reservables(count: int, prefix: str = "bench") -> list[Reservable]:
+    """Create the given number of reservables."""
+    return Reservable.objects.bulk_create(
+        Reservable(slug=f"{prefix}-{i}", type=prefix, name=f"{prefix} {i}")
+        for i in range(count)
+    )
+
+
+def create_reservations(intervals: list[tuple], reason: str = "benchmark"):
+    """Create reservations from the list of (start, end, reservables) tuples."""
+    for offset in range(0, len(intervals), BATCH_SIZE):
+        batch = intervals[offset : offset + BATCH_SIZE]
+        reservations = Reservation.objects.bulk_create(
+            Reservation(reason=reason, start=start, end=end) for start, end, _ in batch
+        )
+        ReservationReservable.objects.bulk_create(
+            ReservationReservable(
+                reservation=reservation, reservable=reservable, start=start, end=end
+            )
+            for reservation, (start, end, reservables) in zip(
+                reservations, batch, strict=True
+            )
+            for reservable in reservables
+        )
+
+
+@benchmark("overlap")
+def overlap(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the latency of the overlap check for the growing reservation history.
+
+    Every reservable gets a fixed number of upcoming reservations while the number of
+    past reservations grows with the scale. The overlap checks are performed in the
+    upcoming week, as they are on the write path.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(200)
+    rng = random.Random(0)
+
+    # Upcoming reservations: every reservable is booked for 50 of the next 200 hours.
+    create_reservations(
+        [
+            (now + i * 4 * hour, now + (i * 4 + 1) * hour, [reservable])
+            for reservable in reservables
+            for i in range(50)
+        ]
+    )
+    created = 50 * len(reservables)
+
+    for scale in sorted(scales):
+        # Extend the history further to the past.
+        past = []
+        for i in range(created, scale):
+            slot = i // len(reservables)
+            start = now - (slot + 1) * 2 * hour
+            past.append((start, start + hour, [reservables[i % len(reservables)]]))
+        create_reservations(past)
+        created = max(created, scale)
+
+        def check():
+            start = now + rng.randrange(7 * 24) * hour
+            Reservation.objects.overlapping(
+                start, start + hour, rng.sample(reservables, 3)
+            ).exists()
+
+        yield {"scale": created, **measure(check, repeat)}
+
+
+@benchmark("serialization")
+def serialization(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the serialization time of 1000 reservations.
+
+    Every reservation has two owners, two reservables and a requirement. The
+    hyperlinked serializer is measured with and without the prefetching, and
+    compared with the flat serializer.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100)
+    resource = Resource.objects.create(slug="bench-resource", type="bench")
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"bench-{i}") for i in range(100)
+    )
+    create_reservations(
+        [
+            (now + i * hour, now + (i + 1) * hour, reservables[i % 100 : i % 100 + 2])
+            for i in range(1000)
+        ]
+    )
+    reservations = Reservation.objects.filter(reason="benchmark").order_by("pk")
+    Reservation.owners.through.objects.bulk_create(
+        Reservation.owners.through(reservation_id=pk, user=users[(i + j) % 100])
+        for i, pk in enumerate(reservations.values_list("pk", flat=True))
+        for j in range(2)
+    )
+    NRequirements.objects.bulk_create(
+        NRequirements(reservation_id=pk, resource=resource, n=1)
+        for pk in reservations.values_list("pk", flat=True)
+    )
+    request = api_request("/api/reservations/")
+
+    cases = {
+        "hyperlinked": (ReservationSerializer, reservations),
+        "hyperlinked-prefetched": (
+            ReservationSerializer,
+            ReservationSerializer.setup_eager_loading(reservations),
+        ),
+        "flat-prefetched": (
+            FlatReservationSerializer,
+            FlatReservationSerializer.setup_eager_loading(reservations),
+        ),
+    }
+    for mode, (serializer_class, queryset) in cases.items():
+
+        def serialize(serializer_class=serializer_class, queryset=queryset) -> list:
+            serializer = serializer_class(
+                queryset.all(), many=True, context={"request": request}
+            )
+            return serializer.data
+
+        yield {"scale": 1000, "mode": mode, **measure(serialize, repeat)}
+
+
+@benchmark("export")
+def export(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the streamed CSV and iCalendar exports of the growing reservations.
+
+    The peak memory allocated while streaming is reported next to the timing, it
+    should not grow with the scale.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100)
+    created = 0
+    for scale in scales:
+        create_reservations(
+            [
+                (now + i * hour, now + (i + 1) * hour, [reservables[i % 100]])
+                for i in range(created, scale)
+            ]
+        )
+        created = max(created, scale)
+        for renderer in (ReservationCSVRenderer(), ReservationICSRenderer()):
+            queryset = Reservation.objects.filter(reason="benchmark").order_by(
+                "start", "id"
+            )
+            request = api_request("/api/reservations/")
+
+            def stream(renderer=renderer, queryset=queryset, request=request):
+                for _chunk in renderer.stream([queryset], request):
+                    pass
+
+            tracemalloc.start()
+            stream()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            yield {
+                "scale": scale,
+                "format": renderer.format,
+                "peak_kib": peak // 1024,
+                **measure(stream, repeat),
+            }
+
+
+@benchmark("availability")
+def availability_window(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the availability of 500 reservables over a 30 day window.
+
+    Every reservable has four reservations per day.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    reservables = create_reservables(500)
+    create_reservations(
+        [
+            (start, start + 2 * hour, [reservable])
+            for reservable in reservables
+            for day in range(30)
+            for start in (now + day * 24 * hour + h * hour for h in (8, 10, 13, 15))
+        ]
+    )
+    pairs = [(reservable.pk, reservable.slug) for reservable in reservables]
+
+    def compute():
+        availability(pairs, now, now + 30 * 24 * hour)
+
+    yield {"scale": len(pairs), **measure(compute, repeat)}
+
+
+@benchmark("bulk")
+def bulk(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Compare the throughput of the sequential and the bulk reservation creation.
+
+    The sequential creation posts at most 1000 reservations one by one, the bulk
+    creation posts all the reservations of the scale in a single request.
+    """
+    from reservations.views import ReservationViewSet
+
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100)
+    user = get_user_model().objects.create_superuser("bench-admin")
+    factory = APIRequestFactory()
+    host = api_host()
+    create = ReservationViewSet.as_view({"post": "create"})
+    create_bulk = ReservationViewSet.as_view({"post": "bulk"})
+
+    def post(view, path: str, data):
+        request = factory.post(path, data, format="json", HTTP_HOST=host)
+        force_authenticate(request, user)
+        response = view(request)
+        assert response.status_code == 201, response.data
+
+    offset = 0
+    for scale in sorted(scales):
+        items = [
+            {
+                "reason": "benchmark",
+                "start": now + (offset + i) * hour,
+                "end": now + (offset + i + 1) * hour,
+                "owners": [user.pk],
+                "reservables": [reservables[i % 100].pk],
+            }
+            for i in range(scale)
+        ]
+        offset += scale
+        started = time.perf_counter()
+        post(create_bulk, "/api/reservations/bulk/", items)
+        bulk_rate = scale / (time.perf_counter() - started)
+
+        sequential = items[:1000]
+        started = time.perf_counter()
+        for item in sequential:
+            url = reverse("reservable-detail", args=[item["reservables"][0]])
+            item = item | {
+                "start": item["start"] + scale * hour,
+                "end": item["end"] + scale * hour,
+                "reservables": [f"http://{host}{url}"],
+            }
+            post(create, "/api/reservations/", item)
+        sequential_rate = len(sequential) / (time.perf_counter() - started)
+        offset += len(sequential)
+
+        yield {
+            "scale": scale,
+            "sequential_per_s": round(sequential_rate, 1),
+            "bulk_per_s": round(bulk_rate, 1),
+            "speedup": round(bulk_rate / sequential_rate, 1),
+        }
+
+
+@benchmark("catalog")
+def catalog(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the latency of the reservable list with and without the cache.
+
+    There are 500 reservables with five resources each. The list is requested with
+    an empty cache (miss), with the response in the cache (hit) and with the current
+    ETag (not-modified).
+    """
+    from reservations.views import ReservableViewSet
+
+    reservables = create_reservables(500)
+    resources = Resource.objects.bulk_create(
+        Resource(slug=f"bench-resource-{i}", type="bench") for i in range(5)
+    )
+    NResources.objects.bulk_create(
+        NResources(reservable=reservable, resource=resource, n=1)
+        for reservable in reservables
+        for resource in resources
+    )
+    # Move the catalog version as the signals would.
+    resources[0].save()
+    cache = caches[getattr(settings, "RESERVATIONS_CACHE", DEFAULT_CACHE_ALIAS)]
+    factory = APIRequestFactory()
+    view = ReservableViewSet.as_view({"get": "list"})
+    host = api_host()
+
+    def get(**headers):
+        response = view(factory.get("/api/reservables/", HTTP_HOST=host, **headers))
+        if response.status_code == 200:
+            response.render()
+        return response
+
+    def miss():
+        cache.clear()
+        get()
+
+    etag = get()["ETag"]
+    cases = {
+        "miss": miss,
+        "hit": get,
+        "not-modified": lambda: get(HTTP_IF_NONE_MATCH=etag),
+    }
+    for mode, function in cases.items():
+        yield {"scale": len(reservables), "mode": mode, **measure(function, repeat)}
+
+
+@benchmark("search")
+def user_search(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the typeahead latency of the user search over 100,000 users.
+
+    The 30 first matches of a random three letter term are read with the table scan
+    (``icontains``) and through the search index, after the index is built.
+    """
+    User = get_user_model()
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def word(length: int) -> str:
+        return "".join(rng.choice(letters) for _ in range(length))
+
+    for offset in range(0, 100_000, BATCH_SIZE):
+        User.objects.bulk_create(
+            User(
+                username=f"bench-{offset + i}",
+                first_name=word(6),
+                last_name=word(8),
+                email=f"{word(6)}@example.com",
+            )
+            for i in range(BATCH_SIZE)
+        )
+    fields = ("first_name", "last_name", "username", "email")
+    search.INDEXES.pop(User._meta.label, None)
+    started = time.perf_counter()
+    search.find(User, fields, "abc")
+    build_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def scan():
+        term = word(3)
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f"{field}__icontains": term})
+        list(User.objects.filter(condition)[:30])
+
+    def indexed():
+        found = search.find(User, fields, word(3))
+        list(User.objects.filter(pk__in=found)[:30])
+
+    for mode, function in (("scan", scan), ("index", indexed)):
+        yield {
+            "scale": 100_000,
+            "mode": mode,
+            "build_ms": build_ms,
+            **measure(function, repeat),
+        }
+    search.INDEXES.pop(User._meta.label, None)
+
+
+@benchmark("utilisation")
+def utilisation(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Compare the 30 day hourly utilisation heat map of 500 reservables of a type.
+
+    The heat map is read from the rollups and computed from the reservation intervals
+    for comparison. The rollups are rebuilt once, the rebuild time is reported.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    reservables = create_reservables(500)
+    create_reservations(
+        [
+            (start, start + 2 * hour, [reservable])
+            for reservable in reservables
+            for day in range(-335, 30)
+            for start in (now + day * 24 * hour + h * hour for h in (8, 10, 13, 15))
+        ]
+    )
+    started = time.perf_counter()
+    analytics.rebuild(reservables)
+    rebuild_ms = round((time.perf_counter() - started) * 1000, 3)
+    end = now + 30 * 24 * hour
+
+    def raw():
+        totals = dict.fromkeys(range(30 * 24), 0)
+        for start, finish in ReservationReservable.objects.filter(
+            reservable__in=reservables, end__gt=now, start__lt=end
+        ).values_list("start", "end"):
+            for bucket, seconds in analytics.bucket_seconds(
+                int(max(start, now).timestamp()), int(min(finish, end).timestamp())
+            ):
+                totals[bucket - int(now.timestamp()) // analytics.BUCKET] += seconds
+
+    def rollups():
+        analytics.utilisation(
+            Reservable.objects.filter(pk__in=[r.pk for r in reservables]),
+            "type",
+            now,
+            end,
+        )
+
+    for mode, function in (("raw", raw), ("rollups", rollups)):
+        yield {
+            "scale": len(reservables),
+            "mode": mode,
+            "rebuild_ms": rebuild_ms,
+            **measure(function, repeat),
+        }
+
+
+@benchmark("archive")
+def archive_history(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Compare the reservation list queries of the current reservations before and
+    after the history is archived.
+
+    There are 100 reservables with a reservation every other hour for the next 30
+    days and the scaled number of past reservations. The reservations of a
+    reservable ending in the future and all the reservations in the next week are
+    listed. The archival time is reported. The history of every scale is added to
+    the archive of the previous scales.
+    """
+    from reservations.views import ReservationViewSet
+
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100)
+    create_reservations(
+        [
+            (now + i * 2 * hour, now + (i * 2 + 1) * hour, [reservables[i % 100]])
+            for i in range(30 * 12)
+        ]
+    )
+    factory = APIRequestFactory()
+    view = ReservationViewSet.as_view({"get": "list"})
+    host = api_host()
+    queries = {
+        "reservable": {"reservables__slug": "bench-0", "end__gt": now.isoformat()},
+        "week": {
+            "start__gte": now.isoformat(),
+            "start__lt": (now + 7 * 24 * hour).isoformat(),
+            "flat": "true",
+        },
+    }
+
+    def get(query: dict):
+        view(factory.get("/api/reservations/", query, HTTP_HOST=host)).render()
+
+    created = 0
+    for scale in scales:
+        # The history of the previous scales is archived, older history is added.
+        create_reservations(
+            [
+                (
+                    now - (i + 1) * 2 * hour,
+                    now - (i * 2 + 1) * hour,
+                    [reservables[i % 100]],
+                )
+                for i in range(created, created + scale)
+            ]
+        )
+        created += scale
+        for name, query in queries.items():
+            yield {
+                "scale": scale,
+                "query": name,
+                "mode": "current",
+                **measure(lambda query=query: get(query), repeat),
+            }
+        started = time.perf_counter()
+        archived = archive(now)
+        archive_ms = round((time.perf_counter() - started) * 1000, 3)
+        for name, query in queries.items():
+            yield {
+                "scale": scale,
+                "query": name,
+                "mode": "archived",
+                "archive_ms": archive_ms,
+                "archived": archived,
+                **measure(lambda query=query: get(query), repeat),
+            }
+
+
+def run_clients(
+    call: Callable, paths: list[str], concurrency: int, repeat: int
+) -> dict:
+    """Send the requests of the concurrent clients and summarize the throughput and
+    the latencies.
+
+    Every client sends its next request once the previous one is served.
+
+    :param call: the coroutine function serving the request for the path.
+    """
+
+    async def client(index: int) -> list[float]:
+        latencies = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            await call(paths[(index + i) % len(paths)])
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def run() -> list[list[float]]:
+        return await asyncio.gather(*(client(i) for i in range(concurrency)))
+
+    started = time.perf_counter()
+    latencies = sorted(latency for client in asyncio.run(run()) for latency in client)
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "median_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def wsgi_get(application: Callable, path: str) -> bytes:
+    """Serve the GET request for the path by the WSGI application."""
+    host = api_host()
+    path, _sep, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SCRIPT_NAME": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+    }
+    response = application(environ, lambda status, headers: None)
+    try:
+        return b"".join(response)
+    finally:
+        response.close()
+
+
+def serve_wsgi(paths: list[str], concurrency: int, repeat: int) -> dict:
+    """Serve the requests by the WSGI application in a pool of :data:`WSGI_THREADS`
+    threads, like a threaded WSGI server.
+
+    The requests wait for a free thread like the connections of the server, so the
+    latencies include the waiting time.
+    """
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def handle(path: str):
+        wsgi_get(application, path)
+
+    with ThreadPoolExecutor(min(concurrency, WSGI_THREADS)) as executor:
+
+        async def call(path: str):
+            await asyncio.get_running_loop().run_in_executor(executor, handle, path)
+
+        return run_clients(call, paths, concurrency, repeat)
+
+
+def serve_asgi(paths: list[str], concurrency: int, repeat: int) -> dict:
+    """Serve the requests by the ASGI application in the event loop."""
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+    host = api_host()
+
+    async def send(message):
+        pass
+
+    async def call(path: str):
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The client stays connected until the response is sent.
+            return await asyncio.Future()
+
+        path, _sep, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", host.encode())],
+            "server": (host, 80),
+        }
+        await application(scope, receive, send)
+
+    return run_clients(call, paths, concurrency, repeat)
+
+
+@benchmark("concurrency", rollback=False)
+def concurrency(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Compare the throughput of the WSGI and the ASGI deployments with the scaled
+    number of concurrent clients.
+
+    Every client polls the availability of one of 100 reservables over the next week
+    ``repeat`` times, the WSGI application is served by the synchronous REST views
+    and the ASGI application by the asynchronous ones. Every reservable has four
+    reservations per day. The data is committed, so the threads serving the requests
+    can read it, and deleted afterwards.
+    """
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100, prefix="bench-concurrency")
+    try:
+        create_reservations(
+            [
+                (start, start + 2 * hour, [reservable])
+                for reservable in reservables
+                for day in range(7)
+                for start in (now + day * 24 * hour + h * hour for h in (8, 10, 13, 15))
+            ],
+            reason="bench-concurrency",
+        )
+        query = urlencode(
+            {"start": now.isoformat(), "end": (now + 7 * 24 * hour).isoformat()}
+        )
+        for scale in scales:
+            for mode, prefix, serve in (
+                ("wsgi", "/api", serve_wsgi),
+                ("asgi", "/api/async", serve_asgi),
+            ):
+                paths = [
+                    f"{prefix}/reservables/{reservable.slug}/availability/?{query}"
+                    for reservable in reservables
+                ]
+                yield {
+                    "scale": scale,
+                    "mode": mode,
+                    **serve(paths, scale, repeat),
+                }
+    finally:
+        pks = list(
+            Reservation.objects.filter(reason="bench-concurrency").values_list(
+                "pk", flat=True
+            )
+        )
+        for offset in range(0, len(pks), BATCH_SIZE):
+            batch = pks[offset : offset + BATCH_SIZE]
+            delete_rows(ReservationReservable, "reservation", batch)
+            delete_rows(Reservation, "id", batch)
+        delete_rows(Reservable, "id", [reservable.pk for reservable in reservables])
+
+
+@benchmark("instrumentation")
+def instrumentation(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the overhead of the metrics middleware.
+
+    The requests are served by the WSGI handler with and without the
+    :class:`~reservations.metrics.MetricsMiddleware`, alternately in both orders.
+    There are the scaled number of reservations on 100 reservables, a page of 100
+    reservations, the reservable list and the availability of a reservable over a
+    week are read.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.signals import request_finished, request_started
+    from django.db import close_old_connections
+    from django.test import override_settings
+
+    middleware = "reservations.metrics.MetricsMiddleware"
+    handlers = {}
+    for mode, stack in (
+        ("plain", [name for name in settings.MIDDLEWARE if name != middleware]),
+        ("measured", [middleware, *settings.MIDDLEWARE]),
+    ):
+        with override_settings(MIDDLEWARE=list(dict.fromkeys(stack))):
+            handlers[mode] = WSGIHandler()
+
+    hour = timedelta(hours=1)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservables = create_reservables(100)
+    week = urlencode(
+        {"start": now.isoformat(), "end": (now + 7 * 24 * hour).isoformat()}
+    )
+    paths = {
+        "reservations": "/api/reservations/?flat=true&page_size=100",
+        "reservables": "/api/reservables/",
+        "availability": f"/api/reservables/bench-0/availability/?{week}",
+    }
+    # The connection must stay open in the transaction of the benchmark.
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        created = 0
+        for scale in scales:
+            create_reservations(
+                [
+                    (now + i * hour, now + (i + 1) * hour, [reservables[i % 100]])
+                    for i in range(created, scale)
+                ]
+            )
+            created = max(created, scale)
+            for name, path in paths.items():
+                timings = {mode: [] for mode in handlers}
+                for i in range(repeat):
+                    for mode in sorted(handlers, reverse=i % 2 == 1):
+                        handler = handlers[mode]
+                        started = time.perf_counter()
+                        wsgi_get(handler, path)
+                        timings[mode].append(time.perf_counter() - started)
+                medians = {
+                    mode: statistics.median(values) for mode, values in timings.items()
+                }
+                yield {
+                    "scale": scale,
+                    "request": name,
+                    "repeat": repeat,
+                    **{
+                        f"{mode}_median_ms": round(median * 1000, 3)
+                        for mode, median in medians.items()
+                    },
+                    "overhead_pct": round(
+                        (medians["measured"] / medians["plain"] - 1) * 100, 2
+                    ),
+                }
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+@benchmark("endpoints")
+def endpoints(scales: list[int], repeat: int) -> Iterator[dict]:
+    """Measure the endpoints on a generated dataset with the scaled number of
+    reservations.
+
+    The list and the detail of every router endpoint are read (the reservations and
+    the series in pages of 100), filtered lists of the reservations and the
+    reservables are read, a reservation is created and updated by a user with the
+    object permissions through :class:`~reservations.permissions.ReservationPermission`
+    and the overlaps are checked for a single reservation and a batch of 100. The
+    dataset of :mod:`reservations.generate` has 200 reservables in 5 sets,
+    10 resources and 1000 users in 20 groups, 20 weekly series are added. Every
+    scale is generated from scratch.
+    """
+    factory = APIRequestFactory()
+    host = api_host()
+    hour = timedelta(hours=1)
+
+    def call(method: str, path: str, user=None, data=None, **query):
+        """Serve the request by the view resolved from the path."""
+        if method == "get":
+            request = factory.get(path, query, HTTP_HOST=host)
+        else:
+            request = getattr(factory, method)(
+                path, data, format="json", HTTP_HOST=host
+            )
+        if user is not None:
+            force_authenticate(request, user)
+        match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        response.render()
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {path}: {response.content[:200]}")
+        return response
+
+    for scale in scales:
+        with transaction.atomic():
+            Generator(prefix=f"bench-endpoints-{scale}").generate(
+                sets=5,
+                reservables=200,
+                resources=10,
+                users=1000,
+                groups=20,
+                reservations=scale,
+                days=180,
+            )
+            reservables = list(
+                Reservable.objects.filter(slug__startswith=f"bench-endpoints-{scale}-")
+            )
+            now = timezone.now().replace(minute=0, second=0, microsecond=0)
+            for i, reservable in enumerate(reservables[:20]):
+                series = ReservationSeries.objects.create(
+                    reason="benchmark",
+                    start=now.replace(hour=6) + i * 24 * hour,
+                    end=now.replace(hour=7) + i * 24 * hour,
+                    until=now + 365 * 24 * hour,
+                )
+                series.reservables.add(reservable)
+            grant = (
+                ReservablePermission.objects.filter(
+                    codename="reserve", reservable__in=reservables
+                )
+                .exclude(user__reservable_permissions__codename="manage_reservations")
+                .select_related("user", "reservable")
+                .first()
+            )
+            user, reservable = grant.user, grant.reservable
+            user.user_permissions.add(
+                *Permission.objects.filter(
+                    codename__in=("add_reservation", "change_reservation")
+                )
+            )
+            reservation = Reservation.objects.filter(reservables=reservable).first()
+            week = {
+                "start__gte": now.isoformat(),
+                "start__lt": (now + 7 * 24 * hour).isoformat(),
+            }
+            reservable_set = ReservableSet.objects.filter(
+                reservables=reservable
+            ).first()
+            resource = NResources.objects.filter(reservable=reservable).first().resource
+            requests = {
+                "reservations list": ("/api/reservations/", {"page_size": 100}),
+                "reservations detail": (f"/api/reservations/{reservation.pk}/", {}),
+                "series list": ("/api/series/", {"page_size": 100}),
+                "series detail": (f"/api/series/{series.pk}/", {}),
+                "reservations of reservable": (
+                    "/api/reservations/",
+                    {"reservables__slug": reservable.slug, "flat": "true", **week},
+                ),
+                "reservations of set": (
+                    "/api/reservations/",
+                    {
+                        "reservables__reservableset_set__slug": reservable_set.slug,
+                        "flat": "true",
+                        **week,
+                    },
+                ),
+                "reservations of owner": (
+                    "/api/reservations/",
+                    {"owners__username": user.username, "page_size": 100},
+                ),
+                "reservations by reason": (
+                    "/api/reservations/",
+                    {"reason__icontains": "exam", "page_size": 100},
+                ),
+                "reservables by type": ("/api/reservables/", {"type": "lab"}),
+                "reservables by resources": (
+                    "/api/reservables/",
+                    {"resources": f"{resource.slug}:2"},
+                ),
+            }
+            for name, model in (
+                ("resources", Resource),
+                ("reservables", Reservable),
+                ("sets", ReservableSet),
+                ("nresources", NResources),
+            ):
+                requests[f"{name} list"] = (f"/api/{name}/", {})
+                requests[f"{name} detail"] = (
+                    f"/api/{name}/{model.objects.order_by('pk').last().pk}/",
+                    {},
+                )
+            for name, (path, query) in sorted(requests.items()):
+                yield {
+                    "scale": scale,
+                    "request": name,
+                    **measure(
+                        lambda path=path, query=query: call("get", path, **query),
+                        repeat,
+                    ),
+                }
+
+            # Far in the future, so the created reservations do not overlap.
+            future = now + 10 * 365 * 24 * hour
+            data = {
+                "reason": "benchmark",
+                "owners": [user.pk],
+                "reservables": [f"http://{host}/api/reservables/{reservable.pk}/"],
+            }
+            created = []
+
+            def create(created=created, future=future, data=data, user=user):
+                start = future + len(created) * hour
+                response = call(
+                    "post",
+                    "/api/reservations/",
+                    user,
+                    {**data, "start": start, "end": start + hour},
+                )
+                created.append(response.data["id"])
+
+            yield {"scale": scale, "request": "create", **measure(create, repeat)}
+
+            def update(created=created, future=future, data=data, user=user):
+                start = future - 2 * hour
+                call(
+                    "put",
+                    f"/api/reservations/{created[0]}/",
+                    user,
+                    {**data, "start": start, "end": start + hour},
+                )
+
+            yield {"scale": scale, "request": "update", **measure(update, repeat)}
+
+            busy = reservation.start, reservation.end
+            yield {
+                "scale": scale,
+                "request": "overlap",
+                **measure(
+                    lambda busy=busy, reservable=reservable: (
+                        Reservation.objects.overlapping(*busy, [reservable]).exists()
+                    ),
+                    repeat,
+                ),
+            }
+            items = [
+                {
+                    "start": now + i * 7 * hour,
+                    "end": now + (i * 7 + 2) * hour,
+                    "reservables": [reservables[i % len(reservables)].pk],
+                }
+                for i in range(100)
+            ]
+            yield {
+                "scale": scale,
+                "request": "overlap batch",
+                **measure(lambda items=items: overlapped_reservables(items), repeat),
+            }
+            transaction.set_rollback(True)
@@ -0,0 +1,215 @@
+"""Bulk creation of reservations.
+
+All the reservations in a batch are checked together: the permissions on all the
+reservables are prefetched once, the existing reservations and series occurrences
+on the reservables are read once for the whole batch window, the requirements are
+compared with the summed resources of the reservables, and the overlaps with
+the existing reservations and within the batch are found by sweeping over the
+intervals sorted by their start. The batch is inserted in a single transaction only
+when every reservation in it is valid. All the reservations in the batch share one
+change sequence number.
+"""
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from reservations.analytics import apply_intervals
+from reservations.availability import existing_intervals, find_overlaps
+from reservations.models import (
+    ChangeSequence,
+    NRequirements,
+    NResources,
+    Reservable,
+    Reservation,
+    ReservationReservable,
+    Resource,
+    missing_resources,
+)
+from reservations.permissions import ReservationPermission
+
+#: The number of objects created by a single insert query.
+BATCH_SIZE = 1000
+
+
+def overlapped_reservables(items: list[dict]) -> dict[int, set[int]]:
+    """Get the primary keys of the reservables every reservation overlaps on.
+
+    The reservations are checked against the existing reservations and series
+    occurrences and against each other.
+
+    :param items: the reservations, the reservables given by the objects or their
+        primary keys.
+    :returns: the overlapped reservables by the index of the reservation.
+    """
+    reservable_ids = [
+        [getattr(reservable, "pk", reservable) for reservable in item["reservables"]]
+        for item in items
+    ]
+    overlapped = defaultdict(set)
+    if not items:
+        return overlapped
+    # Read the existing intervals on the reservables in the batch window.
+    intervals = {
+        reservable_id: [(start, end, None) for start, end in reservable_intervals]
+        for reservable_id, reservable_intervals in existing_intervals(
+            {pk for pks in reservable_ids for pk in pks},
+            min(item["start"] for item in items),
+            max(item["end"] for item in items),
+        ).items()
+    }
+    for index, (item, pks) in enumerate(zip(items, reservable_ids, strict=True)):
+        for pk in pks:
+            intervals[pk].append((item["start"], item["end"], index))
+
+    for reservable_id, reservable_intervals in intervals.items():
+        reservable_intervals.sort(key=lambda interval: (interval[0], interval[1]))
+        for index in find_overlaps(reservable_intervals):
+            overlapped[index].add(reservable_id)
+    return overlapped
+
+
+def check_reservations(items: list[dict], user) -> list[dict]:
+    """Check the validated reservations and return the errors per reservation.
+
+    The related objects given by their primary keys (slugs for the requirements)
+    are replaced by the objects in place.
+    """
+    errors: list[dict] = [{} for _item in items]
+    reservables = Reservable.objects.in_bulk(
+        {pk for item in items for pk in item["reservables"]}
+    )
+    owners = get_user_model().objects.in_bulk(
+        {pk for item in items for pk in item["owners"]}
+    )
+    resources = Resource.objects.in_bulk(
+        {slug for item in items for slug in item["requirements"]}, field_name="slug"
+    )
+    for item, item_errors in zip(items, errors, strict=True):
+        for field, objects in (
+            ("reservables", reservables),
+            ("owners", owners),
+            ("requirements", resources),
+        ):
+            missing = [key for key in item[field] if key not in objects]
+            if missing:
+                item_errors[field] = [
+                    _("Invalid keys: {}.").format(", ".join(map(str, missing)))
+                ]
+        if not item_errors:
+            item["reservables"] = [reservables[pk] for pk in item["reservables"]]
+            item["owners"] = [owners[pk] for pk in item["owners"]]
+            item["requirements"] = {
+                resources[slug]: n for slug, n in item["requirements"].items()
+            }
+    if any(errors) or not items:
+        return errors
+
+    # Compare the requirements with the summed resources of the reservables.
+    capacities = defaultdict(dict)
+    for reservable_id, resource_id, n in NResources.objects.filter(
+        reservable__in=list(reservables),
+        resource__in=[resource.pk for resource in resources.values()],
+    ).values_list("reservable", "resource", "n"):
+        capacities[reservable_id][resource_id] = (
+            capacities[reservable_id].get(resource_id, 0) + n
+        )
+    for item, item_errors in zip(items, errors, strict=True):
+        capacity = defaultdict(int)
+        for reservable in item["reservables"]:
+            for resource_id, n in capacities[reservable.pk].items():
+                capacity[resource_id] += n
+        missing = missing_resources(
+            {resource.pk: n for resource, n in item["requirements"].items()}, capacity
+        )
+        if missing:
+            item_errors["requirements"] = [
+                _("Insufficient resources: {}.").format(
+                    ", ".join(
+                        resource.slug
+                        for resource in item["requirements"]
+                        if resource.pk in missing
+                    )
+                )
+            ]
+    if any(errors):
+        return errors
+
+    overlapped = overlapped_reservables(items)
+
+    permission = ReservationPermission()
+    checker = permission.get_permission_checker(reservables.values(), user)
+    for index, item in enumerate(items):
+        if permission.check_manage_permissions(item["reservables"], user, checker):
+            continue
+        if not all(
+            checker.has_perm("reserve", reservable)
+            for reservable in item["reservables"]
+        ):
+            errors[index]["reservables"] = [
+                _("Insufficient privileges on reservables.")
+            ]
+        elif not all(
+            checker.has_perm("double_reserve", reservable)
+            for reservable in item["reservables"]
+            if reservable.pk in overlapped[index]
+        ):
+            errors[index]["reservables"] = [_("No double booking permission.")]
+    return errors
+
+
+@transaction.atomic
+def insert_reservations(items: list[dict]) -> list[Reservation]:
+    """Insert the checked reservations with their related objects."""
+    sequence = ChangeSequence.next()
+    reservations = Reservation.objects.bulk_create(
+        (
+            Reservation(
+                reason=item["reason"],
+                start=item["start"],
+                end=item["end"],
+                sequence=sequence,
+            )
+            for item in items
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ReservationReservable.objects.bulk_create(
+        (
+            ReservationReservable(
+                reservation=reservation,
+                reservable=reservable,
+                start=reservation.start,
+                end=reservation.end,
+            )
+            for reservation, item in zip(reservations, items, strict=True)
+            for reservable in item["reservables"]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    # The related managers are bypassed, so the rollups are updated here.
+    apply_intervals(
+        (reservable.pk, reservation.start, reservation.end)
+        for reservation, item in zip(reservations, items, strict=True)
+        for reservable in item["reservables"]
+    )
+    Owner = Reservation.owners.through
+    Owner.objects.bulk_create(
+        (
+            Owner(reservation=reservation, user=owner)
+            for reservation, item in zip(reservations, items, strict=True)
+            for owner in item["owners"]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    NRequirements.objects.bulk_create(
+        (
+            NRequirements(reservation=reservation, resource=resource, n=n)
+            for reservation, item in zip(reservations, items, strict=True)
+            for resource, n in item["requirements"].items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return reservations
@@ -1,14 +1,28 @@
 """Filters for REST ViewSets in views namespace."""
 
+import operator
+from datetime import datetime, timedelta
+from heapq import merge
+from typing import Iterable, Iterator, Optional
+
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from django.db import models
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
 
+from reservations.archive import LOWER_BOUNDS, reads_archive
 from reservations.models import (
+    ArchivedReservation,
     NResources,
     Reservable,
     ReservableSet,
     Reservation,
+    ReservationSeries,
     Resource,
 )
+from reservations.serializers import parse_requirements
 
 # Base lookup types.
 NUMBER_LOOKUPS = [
@@ -59,11 +73,14 @@ class CheckQueryParamsMixin:
     """Custom query params validation."""
 
     ALLOWED_ARGUMENTS = (
+        "cursor",
         "fields",
+        "flat",
         "format",
         "limit",
         "offset",
         "ordering",
+        "page_size",
     )
 
     def validate_query_parameters(self):
@@ -108,7 +125,17 @@ class BaseFilter(CheckQueryParamsMixin, filters.FilterSet):
 
 
 class ReservableFilter(BaseFilter):
-    """Reservable filter."""
+    """Reservable filter.
+
+    The ``resources`` parameter given as comma separated ``slug:n`` pairs selects the
+    reservables having at least n resources of every given slug.
+    """
+
+    resources = filters.CharFilter(method="filter_resources")
+
+    def filter_resources(self, queryset, name, value):
+        """Get the reservables with at least the given numbers of resources."""
+        return queryset.with_resources(parse_requirements(value))
 
     class Meta:
         """Set the model and the filterable fields."""
@@ -123,9 +150,36 @@ class ReservableFilter(BaseFilter):
         }
 
 
+class ReservableAvailabilityFilter(ReservableFilter):
+    """Reservable filter accepting the availability time window.
+
+    The window is validated and used by the view, it does not filter reservables.
+    """
+
+    start = filters.IsoDateTimeFilter(method="filter_window")
+    end = filters.IsoDateTimeFilter(method="filter_window")
+
+    def filter_window(self, queryset, name, value):
+        """Leave the queryset unchanged."""
+        return queryset
+
+
+class ReservableUtilisationFilter(ReservableAvailabilityFilter):
+    """Reservable filter accepting the utilisation query.
+
+    The grouping and the resolution are validated and used by the view.
+    """
+
+    group = filters.CharFilter(method="filter_window")
+    resolution = filters.CharFilter(method="filter_window")
+
+
 class ReservationFilter(BaseFilter):
     """Reservation filter."""
 
+    # Reservations with several reservables in the set are listed once.
+    reservables__reservableset_set__slug = filters.CharFilter(distinct=True)
+
     class Meta:
         """Set the model and the filterable fields."""
 
@@ -137,12 +191,204 @@ class ReservationFilter(BaseFilter):
             "owners__first_name": TEXT_LOOKUPS,
             "owners__last_name": TEXT_LOOKUPS,
             "owners__email": TEXT_LOOKUPS,
+            "owners__username": SLUG_LOOKUPS,
             "reservables__name": TEXT_LOOKUPS,
             "reservables__slug": SLUG_LOOKUPS,
             "id": NUMBER_LOOKUPS[:],
         }
 
 
+class ArchivedReservationFilter(ReservationFilter):
+    """Archived reservation filter accepting the same parameters."""
+
+    class Meta(ReservationFilter.Meta):
+        """Set the model."""
+
+        model = ArchivedReservation
+
+    @classmethod
+    def filter_archive(
+        cls, request, horizon: Optional[datetime]
+    ) -> Optional[models.QuerySet]:
+        """Get the filtered archived reservations if the query can match any.
+
+        The query parameters are validated by the filter of the current reservations.
+
+        :param horizon: the horizon of the archive.
+        """
+        filterset = cls(
+            request.query_params,
+            queryset=ArchivedReservation.objects.all(),
+            request=request,
+        )
+        if not filterset.is_valid() or not reads_archive(
+            {name: filterset.form.cleaned_data.get(name) for name in LOWER_BOUNDS},
+            horizon,
+        ):
+            return None
+        return filterset.qs
+
+
+class ReservationChangesFilter(ReservationFilter):
+    """Reservation filter accepting the change feed token.
+
+    The token is validated and used by the view, it does not filter reservations.
+    """
+
+    since = filters.NumberFilter(method="filter_since")
+
+    def filter_since(self, queryset, name, value):
+        """Leave the queryset unchanged."""
+        return queryset
+
+
+#: The time lookups of the reservation filter applied to the series occurrences.
+OCCURRENCE_LOOKUPS = {
+    "exact": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "date": lambda value, date: timezone.localtime(value).date() == date,
+    "time": lambda value, time: timezone.localtime(value).time() == time,
+    "isnull": lambda value, isnull: not isnull,
+}
+
+
+class ReservationSeriesExportFilter(ReservationFilter):
+    """Reservation filter selecting the series occurrences exported with the
+    reservations.
+
+    The series are filtered by the reason, the owners and the reservables like the
+    reservations, the time lookups are applied to their occurrences. The series have
+    no occurrences matching the lookups of the reservation primary keys.
+    """
+
+    class Meta(ReservationFilter.Meta):
+        """Set the model."""
+
+        model = ReservationSeries
+
+    def time_lookups(self) -> list[tuple[str, str, object]]:
+        """Get the (field, lookup, value) of the given time lookups."""
+        lookups = []
+        for name, value in self.form.cleaned_data.items():
+            field, _sep, lookup = name.partition(LOOKUP_SEP)
+            if field in ("start", "end") and value not in EMPTY_VALUES:
+                lookups.append((field, lookup or "exact", value))
+        return lookups
+
+    def window(self) -> tuple[Optional[datetime], Optional[datetime]]:
+        """Get the window containing the occurrences matching the time lookups.
+
+        The occurrences end after the start of the window and start before its end.
+        """
+        tick = timedelta(microseconds=1)
+        lower, upper = [], []
+        for field, lookup, value in self.time_lookups():
+            if lookup in ("exact", "gte") and field == "end":
+                lower.append(value - tick)
+            elif lookup in ("exact", "gt", "gte"):
+                lower.append(value)
+            if lookup in ("exact", "lte") and field == "start":
+                upper.append(value + tick)
+            elif lookup in ("exact", "lt", "lte"):
+                upper.append(value)
+        return max(lower, default=None), min(upper, default=None)
+
+    def filter_queryset(self, queryset: models.QuerySet) -> models.QuerySet:
+        """Filter the series by the other fields and by the window."""
+        for name, value in self.form.cleaned_data.items():
+            field = name.partition(LOOKUP_SEP)[0]
+            if field == "id" and value not in EMPTY_VALUES:
+                return queryset.none()
+            if field not in ("start", "end"):
+                queryset = self.filters[name].filter(queryset, value)
+        # The series on several of the reservables are exported once.
+        return queryset.occurring(*self.window()).distinct()
+
+    def occurrences(
+        self, series: Iterable[ReservationSeries], since: Optional[datetime] = None
+    ) -> Iterator[tuple[ReservationSeries, datetime, datetime]]:
+        """Generate the (series, start, end) occurrences of the filtered series
+        matching the time lookups, ordered by the start and the series.
+
+        :param since: skip the occurrences ending before it.
+        """
+        start, end = self.window()
+        if since is not None:
+            start = since if start is None else max(start, since)
+        lookups = [
+            (field == "end", OCCURRENCE_LOOKUPS[lookup], value)
+            for field, lookup, value in self.time_lookups()
+        ]
+
+        def matching(one: ReservationSeries):
+            for occurrence in one.occurrences(start, end):
+                if all(
+                    compare(occurrence[is_end], value)
+                    for is_end, compare, value in lookups
+                ):
+                    yield one, *occurrence
+
+        return merge(
+            *map(matching, series),
+            key=lambda occurrence: (occurrence[1], -occurrence[0].pk),
+        )
+
+
+class ReservationSeriesChangesFilter(
+    ReservationChangesFilter, ReservationSeriesExportFilter
+):
+    """Reservation change feed filter selecting the changed series.
+
+    The series are selected like the exported series.
+    """
+
+
+class ReservationSeriesFilter(BaseFilter):
+    """Reservation series filter."""
+
+    class Meta:
+        """Set the model and the filterable fields."""
+
+        model = ReservationSeries
+        fields = {
+            "reason": TEXT_LOOKUPS,
+            "frequency": SLUG_LOOKUPS,
+            "start": DATETIME_LOOKUPS,
+            "until": DATETIME_LOOKUPS,
+            "owners__first_name": TEXT_LOOKUPS,
+            "owners__last_name": TEXT_LOOKUPS,
+            "reservables__slug": SLUG_LOOKUPS,
+            "id": NUMBER_LOOKUPS[:],
+        }
+
+
+class SeriesOccurrenceFilter(BaseFilter):
+    """Reservation series filter accepting the occurrence time window.
+
+    The window is validated and used by the view, it does not filter the series.
+    """
+
+    start = filters.IsoDateTimeFilter(method="filter_window")
+    end = filters.IsoDateTimeFilter(method="filter_window")
+
+    class Meta:
+        """Set the model and the filterable fields."""
+
+        model = ReservationSeries
+        fields = {
+            "reason": TEXT_LOOKUPS,
+            "reservables__slug": SLUG_LOOKUPS,
+            "owners__username": SLUG_LOOKUPS,
+        }
+
+    def filter_window(self, queryset, name, value):
+        """Leave the queryset unchanged."""
+        return queryset
+
+
 class ResourceFilter(BaseFilter):
     """Resource filter."""
 
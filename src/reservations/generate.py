@@ -0,0 +1,465 @@
+"""Generation of synthetic data for the benchmarks and the load tests.
+
+The generated catalog resembles the one of a faculty: reservables of a few types
+grouped into sets, with some resources each, and users in groups holding guardian
+permissions on the reservables. Every reservable is reserved in the working hours
+from the given number of days ago onwards, without overlaps, so the reservations of
+the busy reservables reach into the future. Some reservations require a resource
+of their reservable.
+
+The catalog, the users and the groups are inserted by bulk creates, the larger
+tables (the memberships, the permissions and the reservations with their relations)
+by plain inserts in batches. The signal handlers are bypassed: the catalog objects
+get a new catalog change sequence number, every batch of the reservations shares a
+reservation change sequence number, the permission map rows are derived from the
+generated permissions and the occupancy rollups of the reservables are rebuilt at
+the end.
+
+The generation is repeatable for the same seed. The generated objects are named by
+the prefix, so several datasets can be generated into a database.
+"""
+
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from guardian.utils import get_group_obj_perms_model, get_user_obj_perms_model
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from reservations import analytics
+from reservations.models import (
+    ArchivedReservation,
+    ChangeSequence,
+    NRequirements,
+    NResources,
+    Reservable,
+    ReservablePermission,
+    ReservableSet,
+    Reservation,
+    ReservationReservable,
+    Resource,
+)
+
+#: The number of objects inserted at once.
+BATCH_SIZE = 5000
+
+#: The types of the reservables.
+RESERVABLE_TYPES = ("classroom", "lecture-hall", "lab", "office", "equipment")
+
+#: The types of the resources.
+RESOURCE_TYPES = ("seat", "computer", "projector", "board", "microphone")
+
+#: The reasons of the reservations.
+REASONS = ("Lecture", "Tutorial", "Lab work", "Exam", "Seminar", "Meeting")
+
+#: The first and the last names of the users.
+FIRST_NAMES = ("Ana", "Luka", "Maja", "Jan", "Eva", "Nejc", "Nina", "Žiga", "Sara")
+LAST_NAMES = ("Novak", "Horvat", "Kovačič", "Krajnc", "Zupančič", "Potočnik")
+
+#: The first and the last hour of the reservations in a day.
+WORKING_HOURS = (7, 21)
+
+
+class Generator:
+    """Generate the catalog, the users and the reservations."""
+
+    def __init__(
+        self,
+        prefix: str = "gen",
+        seed: int = 0,
+        progress: Optional[Callable[[str, int], None]] = None,
+    ):
+        """
+        :param prefix: the prefix of the slugs, the names and the usernames.
+        :param progress: called with the name of the generated objects and their
+            number after every batch.
+        """
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.progress = progress or (lambda name, count: None)
+        #: The numbers of the generated objects by name.
+        self.counts: dict[str, int] = {}
+
+    def report(self, name: str, count: int):
+        """Count the generated objects."""
+        self.counts[name] = self.counts.get(name, 0) + count
+        self.progress(name, self.counts[name])
+
+    def insert(
+        self, name: str, model: type[models.Model], fields: tuple, rows: Iterable
+    ):
+        """Insert the rows of the field values in batches with plain inserts.
+
+        The model instances are not constructed, which dominates the time of the bulk
+        create. Only the datetimes are adapted, the other values must be given as
+        stored.
+        """
+        quote = connection.ops.quote_name
+        adapt = connection.ops.adapt_datetimefield_value
+        model_fields = [model._meta.get_field(name) for name in fields]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(model._meta.db_table),
+            ", ".join(quote(field.column) for field in model_fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        dates = [
+            index
+            for index, field in enumerate(model_fields)
+            if isinstance(field, models.DateTimeField)
+        ]
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while batch := [list(row) for row in islice(rows, BATCH_SIZE)]:
+                for row in batch:
+                    for index in dates:
+                        row[index] = adapt(row[index])
+                cursor.executemany(sql, batch)
+                self.report(name, len(batch))
+
+    def bulk_create(self, name: str, model: type[models.Model], objects: list) -> list:
+        """Insert the objects in batches."""
+        created = []
+        for offset in range(0, len(objects), BATCH_SIZE):
+            created += model.objects.bulk_create(objects[offset : offset + BATCH_SIZE])
+            self.report(name, len(objects[offset : offset + BATCH_SIZE]))
+        return created
+
+    def generate(
+        self,
+        sets: int = 10,
+        reservables: int = 500,
+        resources: int = 20,
+        users: int = 5000,
+        groups: int = 50,
+        reservations: int = 100_000,
+        days: int = 365,
+    ) -> dict[str, int]:
+        """Generate the data.
+
+        :param days: how many days ago the reservations start.
+        :returns: the numbers of the generated objects by name.
+        """
+        with transaction.atomic():
+            reservable_objects, capacities = self.generate_catalog(
+                sets, reservables, resources
+            )
+            user_objects = self.generate_users(users, groups, reservable_objects)
+        self.generate_reservations(
+            reservations, days, reservable_objects, capacities, user_objects
+        )
+        return self.counts
+
+    def generate_catalog(
+        self, sets: int, reservables: int, resources: int
+    ) -> tuple[list[Reservable], dict[int, dict[Resource, int]]]:
+        """Generate the resources, the reservables in the sets and their resources.
+
+        :returns: the reservables and their resources with the numbers by the
+            reservable key.
+        """
+        prefix, rng = self.prefix, self.random
+        sequence = ChangeSequence.next(ChangeSequence.CATALOG)
+        resource_objects = self.bulk_create(
+            "resources",
+            Resource,
+            [
+                Resource(
+                    slug=f"{prefix}-resource-{i}",
+                    type=RESOURCE_TYPES[i % len(RESOURCE_TYPES)],
+                    name=f"{RESOURCE_TYPES[i % len(RESOURCE_TYPES)]} {i}",
+                    sequence=sequence,
+                )
+                for i in range(resources)
+            ],
+        )
+        reservable_objects = self.bulk_create(
+            "reservables",
+            Reservable,
+            [
+                Reservable(
+                    slug=f"{prefix}-{i}",
+                    type=RESERVABLE_TYPES[i % len(RESERVABLE_TYPES)],
+                    name=f"{prefix.upper()} {i // 100 + 1}.{i % 100:02d}",
+                    sequence=sequence,
+                )
+                for i in range(reservables)
+            ],
+        )
+        set_objects = self.bulk_create(
+            "sets",
+            ReservableSet,
+            [
+                ReservableSet(
+                    slug=f"{prefix}-set-{i}",
+                    name=f"{prefix.upper()} building {i + 1}",
+                    sequence=sequence,
+                )
+                for i in range(sets)
+            ],
+        )
+        if set_objects:
+            # Every reservable is in its building and some in a second set.
+            Member = ReservableSet.reservables.through
+            members = {
+                (set_objects[i % len(set_objects)].pk, reservable.pk)
+                for i, reservable in enumerate(reservable_objects)
+            }
+            members.update(
+                (rng.choice(set_objects).pk, reservable.pk)
+                for reservable in rng.sample(
+                    reservable_objects, len(reservable_objects) // 5
+                )
+            )
+            self.bulk_create(
+                "set members",
+                Member,
+                [
+                    Member(reservableset_id=set_pk, reservable_id=reservable_pk)
+                    for set_pk, reservable_pk in sorted(members)
+                ],
+            )
+        capacities: dict[int, dict[Resource, int]] = {}
+        nresources = []
+        for reservable in reservable_objects:
+            capacity = {
+                resource: rng.choice((1, 2, 4, 16, 30, 60))
+                for resource in rng.sample(
+                    resource_objects, min(len(resource_objects), rng.randint(1, 4))
+                )
+            }
+            capacities[reservable.pk] = capacity
+            nresources += [
+                NResources(reservable=reservable, resource=resource, n=n)
+                for resource, n in capacity.items()
+            ]
+        self.bulk_create("nresources", NResources, nresources)
+        return reservable_objects, capacities
+
+    def generate_users(
+        self, users: int, groups: int, reservables: list[Reservable]
+    ) -> list:
+        """Generate the users in the groups and their permissions.
+
+        Every group may reserve a tenth of the reservables, a few of the groups manage
+        their reservations. Some users may reserve and double book a reservable
+        directly.
+        """
+        prefix, rng = self.prefix, self.random
+        User = get_user_model()
+        password = make_password(None)
+        user_objects = self.bulk_create(
+            "users",
+            User,
+            [
+                User(
+                    username=f"{prefix}-user-{i}",
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    email=f"{prefix}-user-{i}@example.com",
+                    password=password,
+                )
+                for i in range(users)
+            ],
+        )
+        group_objects = self.bulk_create(
+            "groups",
+            Group,
+            [Group(name=f"{prefix}-group-{i}") for i in range(groups)],
+        )
+        members: dict[int, list[int]] = {}
+        if group_objects:
+            members = {
+                user.pk: [
+                    group.pk
+                    for group in rng.sample(
+                        group_objects, min(len(group_objects), rng.randint(1, 3))
+                    )
+                ]
+                for user in user_objects
+            }
+            self.insert(
+                "group members",
+                User.groups.through,
+                ("user", "group"),
+                (
+                    (user_pk, group_pk)
+                    for user_pk, group_pks in members.items()
+                    for group_pk in group_pks
+                ),
+            )
+        if not reservables:
+            return user_objects
+        content_type = ContentType.objects.get_for_model(Reservable)
+        permissions = dict(
+            Permission.objects.filter(
+                content_type=content_type,
+                codename__in=ReservablePermission.CODENAMES,
+            ).values_list("codename", "pk")
+        )
+        share = max(1, len(reservables) // 10)
+        group_grants = {
+            group.pk: [
+                (reservable.pk, codename)
+                for reservable in rng.sample(reservables, share)
+                for codename in (
+                    ("reserve", "manage_reservations") if i % 10 == 0 else ("reserve",)
+                )
+            ]
+            for i, group in enumerate(group_objects)
+        }
+        user_grants = {
+            user.pk: [
+                (reservable.pk, codename)
+                for reservable in [rng.choice(reservables)]
+                for codename in ("reserve", "double_reserve")
+            ]
+            for user in rng.sample(user_objects, len(user_objects) // 20)
+        }
+        for name, model, owner, grants in (
+            ("group permissions", get_group_obj_perms_model(), "group", group_grants),
+            ("user permissions", get_user_obj_perms_model(), "user", user_grants),
+        ):
+            self.insert(
+                name,
+                model,
+                (owner, "permission", "content_type", "object_pk"),
+                (
+                    (pk, permissions[codename], content_type.pk, str(reservable_pk))
+                    for pk, pairs in grants.items()
+                    for reservable_pk, codename in pairs
+                ),
+            )
+        # The permission map, as refreshed by the signal handlers.
+        granted = {
+            (user_pk, reservable_pk, codename)
+            for user_pk, group_pks in members.items()
+            for group_pk in group_pks
+            for reservable_pk, codename in group_grants[group_pk]
+        }
+        granted.update(
+            (user_pk, reservable_pk, codename)
+            for user_pk, pairs in user_grants.items()
+            for reservable_pk, codename in pairs
+        )
+        self.insert(
+            "permission map rows",
+            ReservablePermission,
+            ("user", "reservable", "codename"),
+            sorted(granted),
+        )
+        return user_objects
+
+    def generate_reservations(
+        self,
+        count: int,
+        days: int,
+        reservables: list[Reservable],
+        capacities: dict[int, dict[Resource, int]],
+        owners: list,
+    ):
+        """Generate the reservations of the reservables in the working hours.
+
+        The reservables are reserved in turns, every reservation starts after the
+        previous one of its reservable, on a working day within the working hours.
+        Every tenth reservation requires a resource of its reservable. The primary
+        keys follow the greatest key of the current and the archived reservations,
+        the sequence of the primary keys is reset afterwards.
+        """
+        if not reservables or not count:
+            return
+        rng = self.random
+        hour = timedelta(hours=1)
+        origin = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - timedelta(days=days)
+        cursors = [origin] * len(reservables)
+        first = 1 + max(
+            model.objects.aggregate(last=Max("pk"))["last"] or 0
+            for model in (Reservation, ArchivedReservation)
+        )
+        rows = []
+        for i in range(count):
+            index = i % len(reservables)
+            reservable = reservables[index]
+            start = cursors[index] + rng.randint(0, 2) * hour
+            duration = rng.randint(1, 3) * hour
+            start = self.working_time(start, duration)
+            cursors[index] = start + duration
+            requirement = None
+            if i % 10 == 0 and capacities[reservable.pk]:
+                resource, n = rng.choice(list(capacities[reservable.pk].items()))
+                requirement = (resource.pk, rng.randint(1, n))
+            owner = rng.choice(owners).pk if owners else None
+            rows.append(
+                (
+                    first + i,
+                    rng.choice(REASONS),
+                    start,
+                    start + duration,
+                    reservable.pk,
+                    owner,
+                    requirement,
+                )
+            )
+            if len(rows) == BATCH_SIZE or i == count - 1:
+                self.insert_reservations(rows)
+                rows = []
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Reservation]):
+                cursor.execute(sql)
+        analytics.rebuild(reservables)
+
+    @transaction.atomic
+    def insert_reservations(self, rows: list[tuple]):
+        """Insert the reservations given by the (id, reason, start, end, reservable,
+        owner, requirement) rows with their relations."""
+        sequence = ChangeSequence.next()
+        self.insert(
+            "reservations",
+            Reservation,
+            ("id", "reason", "start", "end", "sequence"),
+            ((pk, reason, start, end, sequence) for pk, reason, start, end, *_ in rows),
+        )
+        self.insert(
+            "reservation reservables",
+            ReservationReservable,
+            ("reservation", "reservable", "start", "end"),
+            (
+                (pk, reservable, start, end)
+                for pk, _, start, end, reservable, *_ in rows
+            ),
+        )
+        self.insert(
+            "reservation owners",
+            Reservation.owners.through,
+            ("reservation", "user"),
+            ((row[0], row[5]) for row in rows if row[5] is not None),
+        )
+        self.insert(
+            "requirements",
+            NRequirements,
+            ("reservation", "resource", "n"),
+            ((row[0], *row[6]) for row in rows if row[6] is not None),
+        )
+
+    @staticmethod
+    def working_time(start: datetime, duration: timedelta) -> datetime:
+        """Move the start to the working hours of a working day."""
+        first, last = WORKING_HOURS
+        while True:
+            day = start.replace(hour=0)
+            if start.hour < first:
+                start = day.replace(hour=first)
+            if start.weekday() >= 5 or start + duration > day.replace(hour=last):
+                start = (day + timedelta(days=1)).replace(hour=first)
+                continue
+            return start
@@ -0,0 +1,372 @@
+"""Import of reservations from files.
+
+The rows are parsed lazily from CSV, JSON lines or iCalendar input, so the input is
+never loaded whole. The reservables, the owners and the resources are resolved with
+lookup dicts loaded once per import. The rows are imported in batches: every batch
+is checked for overlaps with a single read of the existing intervals and inserted
+with the bulk inserts of :mod:`reservations.bulk` in its own transaction.
+
+The CSV columns are ``reason``, ``start``, ``end``, ``reservables`` (slugs
+separated by spaces or commas) and the optional ``owners`` (usernames) and
+``requirements`` (comma separated ``slug:n`` pairs), so the CSV export of the API
+can be imported back. The JSON lines contain objects with the same keys, the lists
+can be given as JSON arrays of strings and the requirements as an object of positive
+integers. The iCalendar events
+give the reason in the SUMMARY and the reservables in the LOCATION.
+"""
+
+import csv
+import json
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rest_framework import serializers
+
+from reservations.bulk import insert_reservations, overlapped_reservables
+from reservations.models import NResources, Reservable, Resource, missing_resources
+from reservations.serializers import parse_requirements
+
+#: Separates the slugs and the usernames in the text values.
+LIST_SEPARATOR = re.compile(r"[\s,]+")
+
+
+class InvalidRow(ValueError):
+    """The row can not be imported."""
+
+
+#: The line number and the values of the row, or the reason it can not be read.
+Values = tuple[int, dict | InvalidRow]
+
+
+def split(value, field: str) -> list[str]:
+    """Get the list of the slugs or the usernames from the text or the list.
+
+    :raises InvalidRow: if the value is neither a text nor a list of texts.
+    """
+    if isinstance(value, str):
+        return [item for item in LIST_SEPARATOR.split(value) if item]
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise InvalidRow(f"Invalid {field}: {json.dumps(value)}.")
+    return value
+
+
+def parse_time(value) -> datetime:
+    """Parse the ISO 8601 datetime, the naive ones are in the current time zone."""
+    try:
+        parsed = parse_datetime(value or "")
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None:
+        raise InvalidRow(f"Invalid datetime: {value}.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_row(line: int, values: dict) -> dict:
+    """Convert the values read from the input into the row to import.
+
+    :raises InvalidRow: if the values are not valid.
+    """
+    requirements = values.get("requirements") or {}
+    if isinstance(requirements, str):
+        try:
+            requirements = parse_requirements(requirements)
+        except serializers.ValidationError as error:
+            raise InvalidRow(error.detail[0]) from error
+    if not isinstance(requirements, dict) or not all(
+        isinstance(slug, str) and type(n) is int and n > 0
+        for slug, n in requirements.items()
+    ):
+        raise InvalidRow(f"Invalid requirements: {json.dumps(requirements)}.")
+    return {
+        "line": line,
+        "reason": values.get("reason") or "",
+        "start": parse_time(values.get("start")),
+        "end": parse_time(values.get("end")),
+        "reservables": split(values.get("reservables"), "reservables"),
+        "owners": split(values.get("owners"), "owners"),
+        "requirements": requirements,
+    }
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Values]:
+    """Read the rows from the CSV with the header."""
+    reader = csv.DictReader(lines)
+    for values in reader:
+        yield reader.line_num, values
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Values]:
+    """Read the rows from the JSON objects given one per line."""
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            values = json.loads(text)
+        except ValueError as error:
+            values = InvalidRow(f"Invalid JSON: {error}.")
+        if not isinstance(values, (dict, InvalidRow)):
+            values = InvalidRow("Expected a JSON object.")
+        yield line, values
+
+
+def read_ics(lines: Iterable[str]) -> Iterator[Values]:
+    """Read the rows from the events of the iCalendar.
+
+    The line numbers are counted in the unfolded lines.
+    """
+    event: Optional[dict] = None
+    for line, content in enumerate(unfold(lines), 1):
+        name, params, value = parse_content_line(content)
+        if name == "BEGIN" and value == "VEVENT":
+            event = {"line": line}
+        elif name == "END" and value == "VEVENT" and event is not None:
+            try:
+                yield event["line"], parse_event(event)
+            except InvalidRow as error:
+                yield event["line"], error
+            event = None
+        elif event is not None:
+            event[name] = (params, value)
+
+
+def unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join the folded iCalendar content lines."""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def parse_content_line(content: str) -> tuple[str, dict[str, str], str]:
+    """Split the iCalendar content line into the name, the parameters and the value."""
+    head, _sep, value = content.partition(":")
+    name, *params = head.split(";")
+    return (
+        name.upper(),
+        dict(param.partition("=")[::2] for param in params),
+        value,
+    )
+
+
+def parse_event(event: dict) -> dict:
+    """Get the values of the row from the iCalendar event."""
+    values = {"reason": ical_unescape(event.get("SUMMARY", ({}, ""))[1])}
+    for name, key in (("DTSTART", "start"), ("DTEND", "end")):
+        if name not in event:
+            raise InvalidRow(f"Missing {name}.")
+        values[key] = parse_ical_time(*event[name])
+    values["reservables"] = ical_unescape(event.get("LOCATION", ({}, ""))[1])
+    return values
+
+
+def parse_ical_time(params: dict[str, str], value: str) -> str:
+    """Convert the iCalendar date-time into the ISO 8601 datetime."""
+    try:
+        if params.get("VALUE") == "DATE" or len(value) == 8:
+            parsed = datetime.strptime(value, "%Y%m%d")
+        else:
+            parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+        if value.endswith("Z"):
+            parsed = parsed.replace(tzinfo=ZoneInfo("UTC"))
+        elif "TZID" in params:
+            parsed = parsed.replace(tzinfo=ZoneInfo(params["TZID"]))
+    except (KeyError, ValueError) as error:
+        raise InvalidRow(f"Invalid date-time: {value}.") from error
+    return parsed.isoformat()
+
+
+def ical_unescape(value: str) -> str:
+    """Unescape the iCalendar text value."""
+    return re.sub(
+        r"\\(.)",
+        lambda match: "\n" if match.group(1) in "nN" else match.group(1),
+        value,
+    )
+
+
+#: The readers of the input formats.
+READERS: dict[str, Callable[[Iterable[str]], Iterator[Values]]] = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+    "ics": read_ics,
+}
+
+
+class Importer:
+    """Import the reservations in batches."""
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        dry_run: bool = False,
+        allow_overlaps: bool = False,
+        owners: Iterable[str] = (),
+    ):
+        """Load the lookups of the reservables, the users, the resources and the
+        resources of the reservables.
+
+        :param dry_run: only check the rows and report the problems.
+        :param allow_overlaps: import the reservations overlapping other ones.
+        :param owners: the usernames of the owners added to every reservation.
+        """
+        User = get_user_model()
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.allow_overlaps = allow_overlaps
+        self.reservables = Reservable.objects.only("slug").in_bulk(field_name="slug")
+        self.users = User.objects.only(User.USERNAME_FIELD).in_bulk(
+            field_name=User.USERNAME_FIELD
+        )
+        self.resources = Resource.objects.only("slug").in_bulk(field_name="slug")
+        self.slugs = {
+            reservable.pk: slug for slug, reservable in self.reservables.items()
+        }
+        self.capacities: dict[int, dict[int, int]] = defaultdict(dict)
+        for reservable_id, resource_id, n in NResources.objects.values_list(
+            "reservable", "resource", "n"
+        ):
+            self.capacities[reservable_id][resource_id] = (
+                self.capacities[reservable_id].get(resource_id, 0) + n
+            )
+        self.owners = self.lookup(self.users, owners, "owners")
+        #: The number of the imported (or importable) reservations.
+        self.imported = 0
+        #: The number of the invalid rows.
+        self.invalid = 0
+        #: The number of the rows overlapping other reservations.
+        self.overlapping = 0
+        #: The problems by the line number.
+        self.problems: list[tuple[int, str]] = []
+
+    def lookup(self, objects: dict, keys: Iterable[str], field: str) -> list:
+        """Get the objects with the keys.
+
+        :raises InvalidRow: if some of the objects do not exist.
+        """
+        missing = [key for key in keys if key not in objects]
+        if missing:
+            raise InvalidRow("Unknown {}: {}.".format(field, ", ".join(missing)))
+        return [objects[key] for key in keys]
+
+    def resolve(self, row: dict) -> dict:
+        """Replace the slugs and the usernames in the row by the objects."""
+        if not row["reservables"]:
+            raise InvalidRow("No reservables.")
+        if row["start"] >= row["end"]:
+            raise InvalidRow("The start must be before the end.")
+        reservables = self.lookup(
+            self.reservables, dict.fromkeys(row["reservables"]), "reservables"
+        )
+        requirements = dict(
+            zip(
+                self.lookup(self.resources, row["requirements"], "resources"),
+                row["requirements"].values(),
+                strict=True,
+            )
+        )
+        capacity = defaultdict(int)
+        for reservable in reservables:
+            for resource_id, n in self.capacities[reservable.pk].items():
+                capacity[resource_id] += n
+        missing = missing_resources(
+            {resource.pk: n for resource, n in requirements.items()}, capacity
+        )
+        if missing:
+            raise InvalidRow(
+                "Insufficient resources: {}.".format(
+                    ", ".join(
+                        resource.slug
+                        for resource in requirements
+                        if resource.pk in missing
+                    )
+                )
+            )
+        return {
+            **row,
+            "reservables": reservables,
+            "owners": list(
+                {
+                    owner.pk: owner
+                    for owner in (
+                        *self.owners,
+                        *self.lookup(self.users, row["owners"], "owners"),
+                    )
+                }.values()
+            ),
+            "requirements": requirements,
+        }
+
+    def run(
+        self,
+        rows: Iterable[Values],
+        progress: Optional[Callable[["Importer"], None]] = None,
+    ) -> "Importer":
+        """Import the rows read by a reader.
+
+        :param progress: called after every batch.
+        """
+        batch: list[dict] = []
+        for line, values in rows:
+            try:
+                if isinstance(values, InvalidRow):
+                    raise values
+                batch.append(self.resolve(parse_row(line, values)))
+            except InvalidRow as error:
+                self.report(line, str(error))
+                self.invalid += 1
+            if len(batch) == self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if progress is not None:
+                    progress(self)
+        if batch:
+            self.import_batch(batch)
+        if progress is not None:
+            progress(self)
+        return self
+
+    def import_batch(self, items: list[dict]):
+        """Check the batch for overlaps and insert the valid reservations."""
+        with transaction.atomic():
+            Reservable.objects.lock(
+                reservable for item in items for reservable in item["reservables"]
+            )
+            overlapped = overlapped_reservables(items)
+            for index, reservable_ids in sorted(overlapped.items()):
+                self.report(
+                    items[index]["line"],
+                    "Overlaps other reservations on {}.".format(
+                        ", ".join(sorted(self.slugs[pk] for pk in reservable_ids))
+                    ),
+                )
+            self.overlapping += len(overlapped)
+            if not self.allow_overlaps:
+                items = [
+                    item for index, item in enumerate(items) if index not in overlapped
+                ]
+            if not self.dry_run and items:
+                insert_reservations(items)
+            self.imported += len(items)
+
+    def report(self, line: int, problem: str):
+        """Record the problem with the row on the line."""
+        self.problems.append((line, problem))
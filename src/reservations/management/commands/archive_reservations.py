@@ -0,0 +1,58 @@
+"""Move past reservations into the archive."""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reservations.archive import BATCH_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the reservations which ended before the cutoff, with their owners, "
+        "reservables and requirements, into the archive tables. The archived "
+        "reservations stay readable through the API."
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument(
+            "--before",
+            help="The cutoff as an ISO 8601 date or datetime.",
+        )
+        cutoff.add_argument(
+            "--days",
+            type=int,
+            default=3 * 365,
+            help="Archive the reservations which ended this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of reservations moved in a transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be positive.")
+        if options["before"] is None:
+            before = timezone.now() - timedelta(days=options["days"])
+        else:
+            try:
+                before = parse_datetime(options["before"])
+            except ValueError:
+                before = None
+            if before is None:
+                raise CommandError(f"Invalid cutoff: {options['before']}.")
+            if timezone.is_naive(before):
+                before = timezone.make_aware(before)
+
+        def progress(count: int):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{count} reservations archived.")
+
+        count = archive(before, options["batch_size"], progress)
+        self.stdout.write(f"Archived {count} reservations which ended before {before}.")
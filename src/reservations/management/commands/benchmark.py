@@ -0,0 +1,120 @@
+"""Run the performance benchmarks."""
+
+import json
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reservations.benchmarks import BENCHMARKS, environment, regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the performance benchmarks. The data created by the benchmarks is "
+        "rolled back or deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "benchmarks",
+            nargs="*",
+            metavar="benchmark",
+            help="Benchmarks to run, one of: {}. All by default.".format(
+                ", ".join(BENCHMARKS)
+            ),
+        )
+        parser.add_argument(
+            "--scale",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="The dataset sizes to run the benchmarks with.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=100,
+            help="The number of measurements per scale.",
+        )
+        parser.add_argument(
+            "--json",
+            metavar="path",
+            help="Write the results with the environment as JSON into the file.",
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="path",
+            help="Compare the median times with the JSON results of a previous run "
+            "and fail on the regressions.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10,
+            help="The slowdown in percent reported as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["benchmarks"] or list(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            self.stderr.write("Unknown benchmark(s): {}.".format(", ".join(unknown)))
+            return
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as baseline_file:
+                    baseline = json.load(baseline_file)["results"]
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Invalid baseline: {error}.") from error
+
+        results = []
+        for name in names:
+            function = BENCHMARKS[name]
+            with transaction.atomic() if function.rollback else nullcontext():
+                for result in function(options["scale"], options["repeat"]):
+                    results.append({"benchmark": name, **result})
+                    self.stdout.write(
+                        "{0}: {1}".format(
+                            name,
+                            ", ".join(
+                                f"{key}={value}" for key, value in result.items()
+                            ),
+                        )
+                    )
+                if function.rollback:
+                    transaction.set_rollback(True)
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as output:
+                json.dump(
+                    {
+                        "environment": environment(),
+                        "scale": options["scale"],
+                        "repeat": options["repeat"],
+                        "results": results,
+                    },
+                    output,
+                    indent=2,
+                )
+        if baseline is not None:
+            found = regressions(results, baseline, options["threshold"])
+            for result, before, slowdown in found:
+                self.stderr.write(
+                    "{}: {} median {} ms, was {} ms ({:+}%).".format(
+                        result["benchmark"],
+                        ", ".join(
+                            f"{key}={value}"
+                            for key, value in result.items()
+                            if key == "scale" or isinstance(value, str)
+                            if key != "benchmark"
+                        ),
+                        result["median_ms"],
+                        before["median_ms"],
+                        slowdown,
+                    )
+                )
+            if found:
+                raise CommandError(f"{len(found)} regressions.")
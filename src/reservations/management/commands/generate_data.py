@@ -0,0 +1,69 @@
+"""Generate a synthetic dataset."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.generate import Generator
+from reservations.models import Reservable
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset of the given size: reservable sets, "
+        "reservables, resources, users in groups with object permissions and "
+        "reservations in the working hours. Meant for the benchmarks and the load "
+        "tests, never run it on a production database."
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help in (
+            ("sets", 10, "Number of reservable sets."),
+            ("reservables", 500, "Number of reservables."),
+            ("resources", 20, "Number of resources."),
+            ("users", 5000, "Number of users."),
+            ("groups", 50, "Number of user groups."),
+            ("reservations", 100_000, "Number of reservations."),
+            ("days", 365, "How many days ago the reservations start."),
+            ("seed", 0, "Seed of the random generator."),
+        ):
+            parser.add_argument(f"--{name}", type=int, default=default, help=help)
+        parser.add_argument(
+            "--prefix",
+            default="gen",
+            help="Prefix of the slugs, the names and the usernames.",
+        )
+
+    def handle(self, *args, **options):
+        counts = [
+            options[name]
+            for name in ("sets", "reservables", "resources", "users", "groups")
+        ]
+        if min(counts + [options["reservations"], options["days"]]) < 0:
+            raise CommandError("The numbers must not be negative.")
+        prefix = options["prefix"]
+        if Reservable.objects.filter(slug__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Data with the prefix {prefix} already exists.")
+
+        def progress(name: str, count: int):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{count} {name} generated.")
+
+        generator = Generator(prefix, options["seed"], progress)
+        counts = generator.generate(
+            **{
+                name: options[name]
+                for name in (
+                    "sets",
+                    "reservables",
+                    "resources",
+                    "users",
+                    "groups",
+                    "reservations",
+                    "days",
+                )
+            }
+        )
+        self.stdout.write(
+            "Generated {}.".format(
+                ", ".join(f"{count} {name}" for name, count in counts.items())
+            )
+        )
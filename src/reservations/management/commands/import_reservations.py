@@ -0,0 +1,96 @@
+"""Import reservations from a CSV, JSON lines or iCalendar file."""
+
+import os
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.imports import READERS, Importer, InvalidRow
+
+
+class Command(BaseCommand):
+    help = (
+        "Import reservations from a CSV, JSON lines or iCalendar file. The rows "
+        "overlapping existing reservations are reported and skipped unless overlaps "
+        "are allowed. The dry run checks every batch against the existing "
+        "reservations only, so it does not report the overlaps between the batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the file, - for the standard input.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Format of the file. Guessed from the extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of reservations checked and inserted at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only check the rows and report the problems.",
+        )
+        parser.add_argument(
+            "--allow-overlaps",
+            action="store_true",
+            help="Import the reservations overlapping other ones.",
+        )
+        parser.add_argument(
+            "--owner",
+            action="append",
+            default=[],
+            metavar="username",
+            help="Add the user as an owner of every reservation. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        path = options["path"]
+        format = options["format"]
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".").lower()
+            format = {"json": "jsonl", "ical": "ics"}.get(format, format)
+            if format not in READERS:
+                raise CommandError("Unknown format, use --format.")
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be positive.")
+        try:
+            importer = Importer(
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+                allow_overlaps=options["allow_overlaps"],
+                owners=options["owner"],
+            )
+        except InvalidRow as error:
+            raise CommandError(error) from error
+
+        with (
+            nullcontext(sys.stdin)
+            if path == "-"
+            else open(path, newline="", encoding="utf-8")
+        ) as lines:
+            importer.run(READERS[format](lines), progress=self.progress)
+
+        for line, problem in sorted(importer.problems):
+            self.stderr.write(f"Line {line}: {problem}")
+        self.stdout.write(
+            "{} {} reservations, {} invalid rows, {} overlapping.".format(
+                "Checked" if importer.dry_run else "Imported",
+                importer.imported,
+                importer.invalid,
+                importer.overlapping,
+            )
+        )
+
+    def progress(self, importer: Importer):
+        """Write the counts after every batch."""
+        if self.verbosity > 1:
+            self.stdout.write(
+                f"{importer.imported} reservations, {importer.invalid} invalid rows, "
+                f"{importer.overlapping} overlapping."
+            )
@@ -0,0 +1,39 @@
+"""Delete the reservations without reservables."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.prune import BATCH_SIZE, prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the reservations without reservables, with their owners and "
+        "requirements, in short transactions. The deletions are recorded in the "
+        "change feed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of reservations deleted in a transaction.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            help="Stop after this many seconds, the next run continues the pruning.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be positive.")
+        if options["budget"] is not None and options["budget"] <= 0:
+            raise CommandError("The time budget must be positive.")
+
+        def progress(count: int):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{count} reservations deleted.")
+
+        count = prune(options["batch_size"], options["budget"], progress)
+        self.stdout.write(f"Deleted {count} reservations without reservables.")
@@ -0,0 +1,28 @@
+"""Rebuild the occupancy rollups of the reservables."""
+
+from django.core.management.base import BaseCommand
+
+from reservations.analytics import rebuild
+from reservations.models import Reservable
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hourly occupancy rollups from the reservations. Needed after "
+        "the reservation intervals were changed without the signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "reservables",
+            nargs="*",
+            metavar="slug",
+            help="Slugs of the reservables to rebuild. All by default.",
+        )
+
+    def handle(self, *args, **options):
+        reservables = None
+        if options["reservables"]:
+            reservables = Reservable.objects.filter(slug__in=options["reservables"])
+        count = rebuild(reservables)
+        self.stdout.write(f"Rebuilt {count} occupancy buckets.")
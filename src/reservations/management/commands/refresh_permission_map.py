@@ -0,0 +1,32 @@
+"""Refresh the reservable permission map."""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from reservations.models import ReservablePermission
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the map of the object permissions of the users on the "
+        "reservables from guardian. Needed after the permissions were assigned or "
+        "removed in bulk without reservations.shortcuts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "users",
+            nargs="*",
+            metavar="username",
+            help="Usernames of the users to refresh. All by default.",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options["users"]:
+            users = get_user_model().objects.filter(
+                **{f"{get_user_model().USERNAME_FIELD}__in": options["users"]}
+            )
+        ReservablePermission.objects.refresh(users)
+        count = ReservablePermission.objects.count()
+        self.stdout.write(f"The permission map has {count} entries.")
@@ -0,0 +1,379 @@
+"""Performance instrumentation of the endpoints.
+
+The :class:`MetricsMiddleware` measures every request served by a view of the
+application: the number and the total time of the database queries, the time spent
+serializing and validating, the time of the permission checks by the method of the
+permission class and the size of the response. The measurements are aggregated into
+histograms labelled by the view and the action (for instance ``ReservationViewSet``
+and ``list``) and exposed in the Prometheus text format by the :func:`metrics` view
+to the staff users and the clients from ``INTERNAL_IPS``.
+
+The requests taking longer than ``RESERVATIONS_SLOW_REQUEST`` seconds (one second by
+default) are logged by the ``reservations.metrics`` logger with their first
+``SLOW_LOG_QUERIES`` SQL statements, without the parameters. Only these statements
+are kept while the request is measured, the other queries are only counted.
+
+The histograms are kept in the memory of the process, so every process of the
+deployment exposes its own. The time of the nested permission checks is included in
+the time of the calling checks. The streamed exports are serialized after the
+request is measured, their serialization time and size are not recorded.
+"""
+
+import logging
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from typing import Callable, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+
+logger = logging.getLogger(__name__)
+
+#: The upper bounds of the buckets of the durations in seconds.
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+#: The upper bounds of the buckets of the query counts.
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+#: The upper bounds of the buckets of the response sizes in bytes.
+SIZE_BUCKETS = tuple(256 * 4**i for i in range(9))
+
+#: The help texts and the buckets of the histograms by name.
+HISTOGRAMS = {
+    "reservations_request_duration_seconds": (
+        "Time spent serving the request.",
+        TIME_BUCKETS,
+    ),
+    "reservations_db_queries": (
+        "Number of database queries of the request.",
+        COUNT_BUCKETS,
+    ),
+    "reservations_db_duration_seconds": (
+        "Time spent executing the database queries of the request.",
+        TIME_BUCKETS,
+    ),
+    "reservations_serializer_duration_seconds": (
+        "Time spent serializing and validating the data of the request.",
+        TIME_BUCKETS,
+    ),
+    "reservations_permission_duration_seconds": (
+        "Time spent in the method of the permission class.",
+        TIME_BUCKETS,
+    ),
+    "reservations_response_size_bytes": (
+        "Size of the response content.",
+        SIZE_BUCKETS,
+    ),
+}
+
+#: The number of the SQL statements written to the slow request log.
+SLOW_LOG_QUERIES = 100
+
+
+class Histogram:
+    """Counts of the observed values by the bucket, with their sum."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        #: The counts of the values in the buckets, the last one is unbounded.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Count the value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """The histograms of the process by the name and the labels."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+
+    def observe(self, values: list[tuple[str, tuple, float]]):
+        """Count the values given by the name of the histogram and the labels."""
+        with self.lock:
+            for name, labels, value in values:
+                histogram = self.histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self.histograms[name, labels] = Histogram(
+                        HISTOGRAMS[name][1]
+                    )
+                histogram.observe(value)
+
+    def clear(self):
+        """Forget the observed values."""
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """Get the histograms in the Prometheus text exposition format."""
+        with self.lock:
+            histograms = sorted(
+                (key, histogram.counts.copy(), histogram.sum)
+                for key, histogram in self.histograms.items()
+            )
+        lines = []
+        previous = None
+        for (name, labels), counts, total in histograms:
+            if name != previous:
+                lines.append(f"# HELP {name} {HISTOGRAMS[name][0]}")
+                lines.append(f"# TYPE {name} histogram")
+                previous = name
+            text = ",".join(f'{key}="{escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip(
+                (*HISTOGRAMS[name][1], "+Inf"), counts, strict=True
+            ):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{text},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{text}}} {total}")
+            lines.append(f"{name}_count{{{text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    """Escape the label value."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+#: The histograms of the process.
+REGISTRY = Registry()
+
+
+class Measurement:
+    """The measurements of a request."""
+
+    def __init__(self):
+        self.query_count = 0
+        #: The first SLOW_LOG_QUERIES statements with their durations.
+        self.queries: list[tuple[str, float]] = []
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.permissions: dict[str, float] = defaultdict(float)
+
+    def __call__(self, execute: Callable, sql: str, params, many: bool, context):
+        """Measure the query, used as the execute wrapper of the connections."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.query_count += 1
+            if self.query_count <= SLOW_LOG_QUERIES:
+                self.queries.append((sql, duration))
+
+
+#: The measurement of the current request.
+current: ContextVar[Optional[Measurement]] = ContextVar("measurement", default=None)
+
+
+def timed(method: Callable) -> Callable:
+    """Add the time of the decorated permission method to the current request."""
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        measurement = current.get()
+        if measurement is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            measurement.permissions[name] += time.perf_counter() - started
+
+    return wrapper
+
+
+class MeasuredSerializerMixin:
+    """Add the time of the outermost serializer to the current request.
+
+    The related objects which are not prefetched are read while serializing, so the
+    time of their queries is included.
+    """
+
+    def measured(self, method: Callable, *args):
+        """Call the method of the serializer and measure it."""
+        measurement = current.get()
+        if measurement is None or measurement.serializing:
+            return method(*args)
+        measurement.serializing = True
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            measurement.serializer_time += time.perf_counter() - started
+            measurement.serializing = False
+
+    def to_representation(self, instance):
+        """Serialize the instance."""
+        return self.measured(super().to_representation, instance)
+
+    def run_validation(self, *args):
+        """Validate the data."""
+        return self.measured(super().run_validation, *args)
+
+
+def view_labels(request: HttpRequest) -> Optional[tuple]:
+    """Get the labels of the view serving the request, None if it was not resolved.
+
+    The viewsets are labelled by their class and the action of the method, the other
+    views by their name.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    view = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    actions = getattr(match.func, "actions", None) or {}
+    name = view.__name__ if view is not None else match.view_name
+    return (
+        ("view", name),
+        ("action", actions.get(request.method.lower(), request.method.lower())),
+    )
+
+
+class MetricsMiddleware:
+    """Measure the requests served by the views.
+
+    Under ASGI the queries of the async views run in the thread of the request, see
+    :func:`asgiref.sync.sync_to_async`, so the measurement is installed on the
+    connections of that thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        measurement = Measurement()
+        token = current.set(measurement)
+        wrapped = self.install(measurement)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.uninstall(wrapped)
+            current.reset(token)
+        self.finish(request, response, measurement, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        measurement = Measurement()
+        token = current.set(measurement)
+        wrapped = await sync_to_async(self.install)(measurement)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(self.uninstall)(wrapped)
+            current.reset(token)
+        self.finish(request, response, measurement, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def install(measurement: Measurement) -> list:
+        """Install the measurement on the connections of the current thread.
+
+        :returns: the connections to uninstall it from.
+        """
+        # The wrappers are installed directly, as by connection.execute_wrapper().
+        wrapped = connections.all()
+        for connection in wrapped:
+            connection.execute_wrappers.append(measurement)
+        return wrapped
+
+    @staticmethod
+    def uninstall(wrapped: list):
+        """Remove the measurement installed by :meth:`install`."""
+        for connection in wrapped:
+            connection.execute_wrappers.pop()
+
+    def finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponseBase,
+        measurement: Measurement,
+        duration: float,
+    ):
+        """Record the measurements of a request served by a view."""
+        labels = view_labels(request)
+        if labels is not None:
+            self.record(request, response, measurement, labels, duration)
+
+    def record(
+        self,
+        request: HttpRequest,
+        response: HttpResponseBase,
+        measurement: Measurement,
+        labels: tuple,
+        duration: float,
+    ):
+        """Observe the measurements and log the slow request."""
+        values = [
+            ("reservations_request_duration_seconds", labels, duration),
+            ("reservations_db_queries", labels, measurement.query_count),
+            ("reservations_db_duration_seconds", labels, measurement.db_time),
+            (
+                "reservations_serializer_duration_seconds",
+                labels,
+                measurement.serializer_time,
+            ),
+        ]
+        values += [
+            ("reservations_permission_duration_seconds", (*labels, ("check", name)), t)
+            for name, t in measurement.permissions.items()
+        ]
+        if not response.streaming:
+            values.append(
+                ("reservations_response_size_bytes", labels, len(response.content))
+            )
+        REGISTRY.observe(values)
+        if duration > getattr(settings, "RESERVATIONS_SLOW_REQUEST", 1):
+            logger.warning(
+                "Slow request %s %s (%s.%s): %.3f s, %d queries in %.3f s, "
+                "serializer %.3f s.\n%s",
+                request.method,
+                request.get_full_path(),
+                labels[0][1],
+                labels[1][1],
+                duration,
+                measurement.query_count,
+                measurement.db_time,
+                measurement.serializer_time,
+                "\n".join(
+                    f"{query_time:.4f} s: {sql}"
+                    for sql, query_time in measurement.queries
+                ),
+            )
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Expose the histograms to the staff users and the clients from INTERNAL_IPS."""
+    user = getattr(request, "user", None)
+    if not getattr(user, "is_staff", False) and request.META.get(
+        "REMOTE_ADDR"
+    ) not in getattr(settings, "INTERNAL_IPS", ()):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
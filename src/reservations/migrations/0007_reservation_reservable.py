@@ -0,0 +1,88 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_intervals(apps, schema_editor):
+    """Copy the reservation intervals to the reservation reservables."""
+    Reservation = apps.get_model("reservations", "Reservation")
+    ReservationReservable = apps.get_model("reservations", "ReservationReservable")
+    reservations = Reservation.objects.filter(pk=OuterRef("reservation_id"))
+    ReservationReservable.objects.update(
+        start=Subquery(reservations.values("start")[:1]),
+        end=Subquery(reservations.values("end")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0006_remove_userprofile_sort_order_and_more"),
+    ]
+
+    operations = [
+        # Reuse the table of the automatically created through model.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="ReservationReservable",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "reservable",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="reservations.reservable",
+                            ),
+                        ),
+                        (
+                            "reservation",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="reservations.reservation",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "reservations_reservation_reservables",
+                        "unique_together": {("reservation", "reservable")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="reservation",
+                    name="reservables",
+                    field=models.ManyToManyField(
+                        related_name="reservations",
+                        through="reservations.ReservationReservable",
+                        to="reservations.reservable",
+                        verbose_name="reservables",
+                    ),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name="reservationreservable",
+            name="start",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="reservationreservable",
+            name="end",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_intervals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="reservationreservable",
+            index=models.Index(
+                fields=["reservable", "end", "start"], name="reservations_overlap_idx"
+            ),
+        ),
+    ]
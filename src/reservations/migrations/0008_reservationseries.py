@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0007_reservation_reservable"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        max_length=255, verbose_name="A reason for the reservation."
+                    ),
+                ),
+                (
+                    "start",
+                    models.DateTimeField(
+                        verbose_name="A start time of the first occurrence"
+                    ),
+                ),
+                (
+                    "end",
+                    models.DateTimeField(
+                        verbose_name="An end time of the first occurrence"
+                    ),
+                ),
+                (
+                    "frequency",
+                    models.CharField(
+                        choices=[("daily", "Daily"), ("weekly", "Weekly")],
+                        default="weekly",
+                        max_length=16,
+                    ),
+                ),
+                ("interval", models.PositiveIntegerField(default=1)),
+                ("until", models.DateTimeField(verbose_name="The end of the series")),
+                ("exceptions", models.JSONField(blank=True, default=list)),
+                (
+                    "owners",
+                    models.ManyToManyField(
+                        related_name="reservation_series",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="The reservation owners",
+                    ),
+                ),
+                (
+                    "reservables",
+                    models.ManyToManyField(
+                        related_name="reservation_series",
+                        to="reservations.reservable",
+                        verbose_name="reservables",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "reservation series",
+            },
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="series",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="detached_reservations",
+                to="reservations.reservationseries",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservationseries",
+            index=models.Index(
+                fields=["until", "start"], name="reservations_series_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reservationseries",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("start__lt", models.F("end"))),
+                name="reservations_reservationseries_start_before_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reservationseries",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("interval__gt", 0)),
+                name="reservations_reservationseries_interval_positive",
+            ),
+        ),
+    ]
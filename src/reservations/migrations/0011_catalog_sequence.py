@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0010_reservation_changes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changesequence",
+            name="time",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="reservable",
+            name="sequence",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="reservableset",
+            name="sequence",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="resource",
+            name="sequence",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_permission_map(apps, schema_editor):
+    """Map the existing guardian object permissions on the reservables."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    Reservable = apps.get_model("reservations", "Reservable")
+    ReservablePermission = apps.get_model("reservations", "ReservablePermission")
+    content_type = ContentType.objects.filter(
+        app_label="reservations", model="reservable"
+    ).first()
+    if content_type is None:
+        return
+    codenames = ("reserve", "double_reserve", "manage_reservations")
+    granted = {
+        *apps.get_model("guardian", "UserObjectPermission")
+        .objects.filter(content_type=content_type, permission__codename__in=codenames)
+        .values_list("user", "object_pk", "permission__codename"),
+        *apps.get_model("guardian", "GroupObjectPermission")
+        .objects.filter(
+            content_type=content_type,
+            permission__codename__in=codenames,
+            group__user__isnull=False,
+        )
+        .values_list("group__user", "object_pk", "permission__codename"),
+    }
+    existing = set(Reservable.objects.values_list("pk", flat=True))
+    ReservablePermission.objects.bulk_create(
+        (
+            ReservablePermission(
+                user_id=user, reservable_id=int(object_pk), codename=codename
+            )
+            for user, object_pk, codename in granted
+            if int(object_pk) in existing
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0011_catalog_sequence"),
+        (
+            "guardian",
+            "0003_remove_groupobjectpermission_guardian_gr_content_ae6aec_idx_and_more",
+        ),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservablePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "codename",
+                    models.CharField(
+                        choices=[
+                            ("reserve", "reserve"),
+                            ("double_reserve", "double_reserve"),
+                            ("manage_reservations", "manage_reservations"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "reservable",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="user_permissions",
+                        to="reservations.reservable",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservable_permissions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "codename", "reservable")},
+            },
+        ),
+        migrations.RunPython(fill_permission_map, migrations.RunPython.noop),
+    ]
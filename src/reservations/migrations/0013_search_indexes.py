@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def trigram_indexes(apps) -> list[tuple[str, str, str]]:
+    """Get the (index, table, column) triples of the trigram indexes."""
+    tables = {
+        apps.get_model("reservations", "Reservable")._meta.db_table: ("slug", "name"),
+        apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table: (
+            "first_name",
+            "last_name",
+            "username",
+            "email",
+        ),
+    }
+    return [
+        (f"{table}_{column}_trgm", table, column)
+        for table, columns in tables.items()
+        for column in columns
+    ]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index the upper case texts searched by the case-insensitive lookups."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index, table, column in trigram_indexes(apps):
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(index)} ON {quote(table)} "
+            f"USING gin (UPPER({quote(column)}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    """Drop the trigram indexes, the extension is kept."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index, _table, _column in trigram_indexes(apps):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(index)}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0012_reservable_permission_map"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
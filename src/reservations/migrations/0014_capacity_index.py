@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0013_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="nresources",
+            index=models.Index(
+                fields=["resource", "n", "reservable"], name="reservations_capacity_idx"
+            ),
+        ),
+    ]
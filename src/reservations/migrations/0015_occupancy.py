@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:38
+
+from collections import defaultdict
+from datetime import UTC, datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the helpers in reservations.analytics as of this migration.
+BUCKET = 3600
+
+
+def bucket_start(bucket):
+    """Get the start of the bucket."""
+    return datetime.fromtimestamp(bucket * BUCKET, tz=UTC)
+
+
+def rollup(intervals):
+    """Sum the reserved seconds of the (reservable, start, end) intervals."""
+    totals = defaultdict(int)
+    for reservable_id, start, end in intervals:
+        if start is None or end is None:
+            continue
+        start, end = int(start.timestamp()), int(end.timestamp())
+        bucket = start // BUCKET
+        while bucket * BUCKET < end:
+            totals[reservable_id, bucket] += min(end, (bucket + 1) * BUCKET) - max(
+                start, bucket * BUCKET
+            )
+            bucket += 1
+    return (
+        (reservable_id, bucket, seconds)
+        for (reservable_id, bucket), seconds in totals.items()
+    )
+
+
+def fill_occupancy(apps, schema_editor):
+    """Roll up the existing reservations."""
+    Occupancy = apps.get_model("reservations", "Occupancy")
+    ReservationReservable = apps.get_model("reservations", "ReservationReservable")
+    Occupancy.objects.bulk_create(
+        (
+            Occupancy(
+                reservable_id=reservable_id, start=bucket_start(bucket), seconds=seconds
+            )
+            for reservable_id, bucket, seconds in rollup(
+                ReservationReservable.objects.order_by("start")
+                .values_list("reservable", "start", "end")
+                .iterator(chunk_size=10_000)
+            )
+            if seconds
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0014_capacity_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Occupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start", models.DateTimeField()),
+                ("seconds", models.IntegerField(default=0)),
+                (
+                    "reservable",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy",
+                        to="reservations.reservable",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "occupancy",
+                "unique_together": {("reservable", "start")},
+            },
+        ),
+        migrations.RunPython(fill_occupancy, migrations.RunPython.noop),
+    ]
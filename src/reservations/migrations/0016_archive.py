@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0015_occupancy"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedNRequirements",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("n", models.IntegerField()),
+                (
+                    "resource",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="reservations.resource",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedReservation",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("reason", models.CharField(max_length=255)),
+                ("start", models.DateTimeField()),
+                ("end", models.DateTimeField()),
+                ("sequence", models.PositiveBigIntegerField(default=0)),
+                ("archived", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "owners",
+                    models.ManyToManyField(
+                        related_name="archived_reservations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "requirements",
+                    models.ManyToManyField(
+                        related_name="+",
+                        through="reservations.ArchivedNRequirements",
+                        to="reservations.resource",
+                    ),
+                ),
+                (
+                    "reservables",
+                    models.ManyToManyField(
+                        related_name="archived_reservations",
+                        to="reservations.reservable",
+                    ),
+                ),
+                (
+                    "series",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_reservations",
+                        to="reservations.reservationseries",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="archivednrequirements",
+            name="reservation",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservations.archivedreservation",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(
+                fields=["start", "id"], name="reservations_archive_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreservation",
+            index=models.Index(fields=["end"], name="reservations_archive_end_idx"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reservations", "0016_archive"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reservationtombstone",
+            name="reservation_id",
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
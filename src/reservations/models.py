@@ -1,10 +1,19 @@
 """Models for the reservations application."""
 
-from datetime import datetime
-from typing import Iterable, Optional
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+from guardian.utils import (
+    get_anonymous_user,
+    get_group_obj_perms_model,
+    get_user_obj_perms_model,
+)
 
 from django.conf import settings
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -37,6 +46,9 @@ class ReservableSet(models.Model):
     #: The reservables in this set.
     reservables = models.ManyToManyField("Reservable", related_name="reservableset_set")
 
+    #: The catalog change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0, editable=False)
+
     def __str__(self) -> str:
         """Return the human readable representation."""
         return self.name
@@ -54,11 +66,47 @@ class Resource(models.Model):
     #: The name of the resource.
     name = models.CharField(max_length=255, default="")
 
+    #: The catalog change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0, editable=False)
+
     def __str__(self) -> str:
         """Return the human readable representation."""
         return self.slug
 
 
+class NResourcesQuerySet(models.QuerySet):
+    """Custom queryset for the numbers of resources."""
+
+    def capacity(self, reservables: Iterable["Reservable"]) -> dict[int, int]:
+        """Get the summed number of resources of the reservables.
+
+        :returns: the number of resources by the resource primary key.
+        """
+        pks = {getattr(reservable, "pk", reservable) for reservable in reservables}
+        return dict(
+            self.filter(reservable__in=pks)
+            .order_by()
+            .values("resource")
+            .annotate(total=models.Sum("n"))
+            .values_list("resource", "total")
+        )
+
+
+def missing_resources(
+    requirements: dict[int, int], capacity: dict[int, int]
+) -> list[int]:
+    """Get the resources the capacity does not satisfy the requirements for.
+
+    :param requirements: the required number of resources by the resource key.
+    :param capacity: the available number of resources by the resource key.
+    """
+    return [
+        resource
+        for resource, n in requirements.items()
+        if n > capacity.get(resource, 0)
+    ]
+
+
 class NResources(models.Model):
     """Represent the number of resources the reservable has."""
 
@@ -71,11 +119,91 @@ class NResources(models.Model):
     #: How many resources the reservable has.
     n = models.IntegerField()
 
+    objects = NResourcesQuerySet.as_manager()
+
+    class Meta:
+        # Answers the reservables with at least n resources from the index alone.
+        indexes = [
+            models.Index(
+                fields=["resource", "n", "reservable"],
+                name="reservations_capacity_idx",
+            )
+        ]
+
     def __str__(self):
         """Return the human readable representation."""
         return "{0} <= {1} x {2}".format(self.reservable, self.resource, self.n)
 
 
+class ReservableQuerySet(models.QuerySet):
+    """Custom queryset for reservables."""
+
+    def with_resources(self, requirements: dict[str, int]) -> models.QuerySet:
+        """Get the reservables having at least the given number of resources.
+
+        The numbers of the same resource are summed, as by
+        :meth:`NResourcesQuerySet.capacity`. The reservables are found by a single
+        grouped subquery on the capacity index instead of joining the resources once
+        per requirement.
+
+        :param requirements: the minimal number of resources by the resource slug.
+        """
+        if not requirements:
+            return self
+        totals = {
+            f"total_{i}": models.Sum("n", filter=models.Q(resource__slug=slug))
+            for i, slug in enumerate(requirements)
+        }
+        return self.filter(
+            pk__in=NResources.objects.filter(resource__slug__in=list(requirements))
+            .order_by()
+            .values("reservable")
+            .annotate(**totals)
+            .filter(
+                **{f"total_{i}__gte": n for i, n in enumerate(requirements.values())}
+            )
+            .values("reservable")
+        )
+
+    def lock(self, reservables: Iterable["Reservable"]):
+        """Lock the reservables until the end of the current transaction.
+
+        Reservations on the same reservables are checked and written while holding
+        the lock, so concurrent requests can not both pass the overlap check. The rows
+        are locked in the primary key order to avoid deadlocks. Backends without
+        SELECT ... FOR UPDATE (SQLite) serialize the writing transactions instead and
+        reject the concurrent writers, the views answer them with 503 Service
+        Unavailable.
+        """
+        pks = sorted(
+            {getattr(reservable, "pk", reservable) for reservable in reservables}
+        )
+        list(
+            self.select_for_update()
+            .filter(pk__in=pks)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def permitted(self, user, codename: str) -> models.QuerySet:
+        """Get the reservables the user has the object permission on.
+
+        The permissions are read from the reservable permission map. Superusers and
+        users with the global permission get all the reservables.
+
+        :param codename: one of the codenames in the reservable permission map.
+        """
+        if not user.is_authenticated:
+            user = get_anonymous_user()
+        if user.is_superuser or user.has_perm(f"reservations.{codename}"):
+            return self
+        return self.filter(
+            pk__in=ReservablePermission.objects.filter(
+                user=user, codename=codename
+            ).values("reservable_id")
+        )
+
+
 class Reservable(models.Model):
     """The reservable object.
 
@@ -94,6 +222,11 @@ class Reservable(models.Model):
     #: The reservable resources.
     resources = models.ManyToManyField("Resource", through="NResources")
 
+    #: The catalog change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = ReservableQuerySet.as_manager()
+
     class Meta:
         permissions = (
             ("reserve", "Create a reservation using this reservable"),
@@ -119,23 +252,147 @@ class NRequirements(models.Model):
     #: How many resources the reservatien requires.
     n = models.IntegerField()
 
+    def clean(self):
+        """Make sure the reservables of the reservation have enough resources."""
+        if self.reservation_id is None or self.resource_id is None:
+            return
+        capacity = NResources.objects.capacity(
+            self.reservation.reservables.values_list("pk", flat=True)
+        )
+        if missing_resources({self.resource_id: self.n}, capacity):
+            raise ValidationError(
+                {"n": _("The reservables do not have enough resources.")}
+            )
+
+
+class ReservationReservableQuerySet(models.QuerySet):
+    """Custom queryset of reservation reservables."""
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        """Delete the rows and subtract their reserved time from the rollups at once.
+
+        The reservables removed from a reservation are deleted by this method, so the
+        rollups are updated once per removal instead of once per row.
+        """
+        from reservations import analytics
+
+        with transaction.atomic(using=self.db):
+            intervals = list(self.values_list("reservable", "start", "end"))
+            deleted = super().delete()
+            analytics.apply_intervals(intervals, -1)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class ReservationReservable(models.Model):
+    """Represent a reservable contained in a reservation.
+
+    The interval of the reservation is copied to this table so the overlap checks for
+    a reservable can be answered from a single index on (reservable, end, start)
+    without joining the reservation table. The index is ordered by the end first:
+    only reservations ending after the checked start are scanned, so the cost of the
+    check depends on the number of future reservations of the reservable and not on
+    the length of its history.
+    """
+
+    #: The reservation.
+    reservation = models.ForeignKey("Reservation", on_delete=models.CASCADE)
+
+    #: The reservable.
+    reservable = models.ForeignKey("Reservable", on_delete=models.CASCADE)
+
+    #: Copy of the reservation start.
+    start = models.DateTimeField(null=True)
+
+    #: Copy of the reservation end.
+    end = models.DateTimeField(null=True)
+
+    objects = ReservationReservableQuerySet.as_manager()
+
+    class Meta:
+        db_table = "reservations_reservation_reservables"
+        unique_together = (("reservation", "reservable"),)
+        indexes = [
+            models.Index(
+                fields=["reservable", "end", "start"], name="reservations_overlap_idx"
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        """Copy the reservation interval before saving."""
+        if self.start is None or self.end is None:
+            self.start = self.reservation.start
+            self.end = self.reservation.end
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        """Return the human readable representation."""
+        return "{0} @ {1}".format(self.reservation_id, self.reservable)
+
+
+class ReservationQuerySet(models.QuerySet):
+    """Custom queryset of reservations."""
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        """Delete the reservations and leave their tombstones in the change feed.
+
+        The reserved time of all the reservations is subtracted from the rollups at
+        once.
+        """
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            ReservationReservable.objects.filter(reservation__in=pks).delete()
+            deleted = super().delete()
+            ReservationTombstone.objects.record(pks)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class ReservationManager(models.Manager):
     """Custom model manager for reservations."""
 
+    def get_queryset(self) -> ReservationQuerySet:
+        """Get the queryset recording the deletions in the change feed."""
+        return ReservationQuerySet(self.model, using=self._db)
+
     def owned_by_user(self, user) -> models.QuerySet:
         """Get the queryset of reservations (co)owned by the given user."""
-        return self.get_query_set().filter(owners=user)
+        return self.get_queryset().filter(owners=user)
+
+    def prune(self, **kwargs) -> int:
+        """Delete all reservations without reservables.
+
+        The deletions are recorded in the change feed. The reservations are deleted
+        in batches, see :func:`reservations.prune.prune` for the arguments.
+
+        :returns: the number of the deleted reservations.
+        """
+        from reservations.prune import prune
+
+        return prune(**kwargs)
 
-    def prune(self):
-        """Delete all reservations without reservables."""
-        self.get_queryset().filter(reservables__isnull=True).delete()
+    def overlapping(
+        self,
+        start: datetime,
+        end: datetime,
+        reservables: Iterable[Reservable],
+    ) -> models.QuerySet:
+        """Return the set of overlapping reservations for reservables.
 
-    def overlapping(self, start: datetime, end: datetime, reservables: models.QuerySet):
-        """Return the set of overlapping reservations for reservables."""
-        return Reservation.objects.filter(
-            start__lt=end, end=start, reservables__in=reservables.all()
+        The lookup is performed on the (reservable, end, start) index of the
+        reservation-reservable table and every reservation is returned only once.
+        """
+        if hasattr(reservables, "all"):
+            # Querysets and related managers are used as subqueries.
+            reservables = reservables.all()
+        intervals = ReservationReservable.objects.filter(
+            reservable__in=reservables, end__gt=start, start__lt=end
         )
+        return self.get_queryset().filter(pk__in=intervals.values("reservation_id"))
 
 
 class Reservation(models.Model):
@@ -159,7 +416,10 @@ class Reservation(models.Model):
 
     #: Reservables in the reservation.
     reservables = models.ManyToManyField(
-        "Reservable", verbose_name=_("reservables"), related_name="reservations"
+        "Reservable",
+        through="ReservationReservable",
+        verbose_name=_("reservables"),
+        related_name="reservations",
     )
 
     #: Requirements for the reservation.
@@ -170,11 +430,23 @@ class Reservation(models.Model):
         help_text=_("Reservation requirements"),
     )
 
+    #: The series the reservation was detached from.
+    series = models.ForeignKey(
+        "ReservationSeries",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="detached_reservations",
+    )
+
+    #: The change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0, editable=False)
+
     # Override the default object manager.
     objects = ReservationManager()
 
     class Meta:
-        """Add constraints to the database."""
+        """Add constraints and indexes to the database."""
 
         constraints = [
             models.CheckConstraint(
@@ -182,6 +454,11 @@ class Reservation(models.Model):
                 check=models.Q(start__lt=models.F("end")),
             )
         ]
+        indexes = [
+            # The keyset used to paginate the reservations.
+            models.Index(fields=["start", "id"], name="reservations_keyset_idx"),
+            models.Index(fields=["sequence"], name="reservations_sequence_idx"),
+        ]
 
     def overlapping_reservations(
         self, reservables: Optional[Iterable[Reservable]] = None
@@ -193,10 +470,663 @@ class Reservation(models.Model):
         """
         if reservables is None:
             reservables = self.reservables
-        return Reservation.objects.filter(
-            start__lt=self.end, end__gt=self.start, reservables__in=reservables.all()
+        return Reservation.objects.overlapping(
+            self.start, self.end, reservables
         ).exclude(pk=self.pk)
 
+    def save(self, *args, **kwargs):
+        """Save the reservation and keep the copied intervals up to date.
+
+        Note that updating the interval through QuerySet.update bypasses this method.
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            # The change is numbered in its own transaction.
+            self.sequence = ChangeSequence.next()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "sequence"}
+            super().save(*args, **kwargs)
+            if not adding:
+                ReservationReservable.objects.filter(reservation=self).update(
+                    start=self.start, end=self.end
+                )
+
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        """Delete the reservation and leave its tombstone in the change feed."""
+        pk = self.pk
+        with transaction.atomic():
+            ReservationReservable.objects.filter(reservation=self).delete()
+            deleted = super().delete(*args, **kwargs)
+            ReservationTombstone.objects.record([pk])
+        return deleted
+
     def __str__(self) -> str:
         """Return human readable representation."""
         return f"{self.start} <-> {self.end}, {self.reason}"
+
+
+class ReservablePermissionManager(models.Manager):
+    """Custom model manager for the reservable permission map."""
+
+    def refresh(
+        self,
+        users: Optional[Iterable] = None,
+        reservables: Optional[Iterable] = None,
+    ):
+        """Recompute the map of the users on the reservables from guardian.
+
+        :param users: the users or their primary keys, all users by default.
+        :param reservables: the reservables or their primary keys, all by default.
+        """
+        rows = self.get_queryset()
+        user_permissions = get_user_obj_perms_model().objects.filter(
+            content_type=ContentType.objects.get_for_model(Reservable),
+            permission__codename__in=ReservablePermission.CODENAMES,
+        )
+        group_permissions = get_group_obj_perms_model().objects.filter(
+            content_type=ContentType.objects.get_for_model(Reservable),
+            permission__codename__in=ReservablePermission.CODENAMES,
+        )
+        if users is not None:
+            users = [getattr(user, "pk", user) for user in users]
+            rows = rows.filter(user__in=users)
+            user_permissions = user_permissions.filter(user__in=users)
+            group_permissions = group_permissions.filter(group__user__in=users)
+        if reservables is not None:
+            reservables = [getattr(r, "pk", r) for r in reservables]
+            object_pks = [str(pk) for pk in reservables]
+            rows = rows.filter(reservable__in=reservables)
+            user_permissions = user_permissions.filter(object_pk__in=object_pks)
+            group_permissions = group_permissions.filter(object_pk__in=object_pks)
+
+        granted = {
+            *user_permissions.values_list("user", "object_pk", "permission__codename"),
+            *group_permissions.values_list(
+                "group__user", "object_pk", "permission__codename"
+            ),
+        }
+        granted = {
+            (user, int(object_pk), codename)
+            for user, object_pk, codename in granted
+            if user is not None
+        }
+        # Guardian keeps the permissions on the deleted objects.
+        existing = Reservable.objects.all()
+        if reservables is not None:
+            existing = existing.filter(pk__in=reservables)
+        existing = set(existing.values_list("pk", flat=True))
+        with transaction.atomic():
+            rows.delete()
+            self.bulk_create(
+                (
+                    ReservablePermission(
+                        user_id=user, reservable_id=reservable, codename=codename
+                    )
+                    for user, reservable, codename in granted
+                    if reservable in existing
+                ),
+                ignore_conflicts=True,
+            )
+
+
+class ReservablePermission(models.Model):
+    """The materialised object permissions of the users on the reservables.
+
+    Every row says that the user has the permission on the reservable, either
+    directly or through a group. The map is derived from the guardian object
+    permissions and refreshed by the signal handlers when the permissions or the
+    group memberships change, so the reservables a user may use are found with a
+    single lookup on the (user, codename, reservable) index. The bulk assignments of
+    guardian send no signals, they are made with :mod:`reservations.shortcuts` or
+    followed by the ``refresh_permission_map`` command.
+    """
+
+    #: The mapped reservable permissions.
+    CODENAMES = ("reserve", "double_reserve", "manage_reservations")
+
+    #: The user having the permission.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="reservable_permissions",
+    )
+
+    #: The reservable the permission is on.
+    reservable = models.ForeignKey(
+        "Reservable", on_delete=models.CASCADE, related_name="user_permissions"
+    )
+
+    #: The codename of the permission.
+    codename = models.CharField(
+        max_length=32, choices=[(codename, codename) for codename in CODENAMES]
+    )
+
+    objects = ReservablePermissionManager()
+
+    class Meta:
+        """Make the map lookups indexed."""
+
+        unique_together = ("user", "codename", "reservable")
+
+
+class ChangeSequence(models.Model):
+    """A counter of a change sequence.
+
+    The reservations and the catalog (resources, reservables and their sets) are
+    counted separately, there is one row per counter. The reservation changes are
+    numbered in the transaction making them and the change feed only returns the
+    changes below the :meth:`committed` mark, so a client never skips a change which
+    is committed later. On PostgreSQL the reservation changes are numbered by the ID
+    of their transaction: the concurrent writes do not wait for each other and every
+    transaction with a lower ID is finished once it is below the oldest running
+    transaction. The other backends count the reservation changes in the row of the
+    counter, which stays locked until the end of the transaction: SQLite serializes
+    the writing transactions anyway. The catalog changes are always counted in the
+    row, they are rare and only their time and fingerprints are used.
+    """
+
+    #: The counter of the reservation changes.
+    RESERVATIONS = 1
+
+    #: The counter of the catalog changes.
+    CATALOG = 2
+
+    #: The last used sequence number.
+    value = models.PositiveBigIntegerField(default=0)
+
+    #: When the last sequence number was used.
+    time = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def next(cls, counter: int = RESERVATIONS) -> int:
+        """Get the next sequence number of the counter.
+
+        The reservation changes share the number of their transaction on PostgreSQL.
+
+        :raises TransactionManagementError: if a reservation change is numbered
+            outside of a transaction.
+        """
+        if counter == cls.RESERVATIONS:
+            if not connection.in_atomic_block:
+                raise transaction.TransactionManagementError(
+                    "The reservation changes must be numbered in their transaction."
+                )
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_current_xact_id()::text::bigint")
+                    return cursor.fetchone()[0]
+        now = timezone.now()
+        with transaction.atomic():
+            if not cls.objects.filter(pk=counter).update(
+                value=models.F("value") + 1, time=now
+            ):
+                cls.objects.create(pk=counter, value=1, time=now)
+            return cls.current(counter)
+
+    @classmethod
+    def current(cls, counter: int = RESERVATIONS) -> int:
+        """Get the last used sequence number of the counter."""
+        counters = cls.objects.filter(pk=counter)
+        return counters.values_list("value", flat=True).first() or 0
+
+    @classmethod
+    def committed(cls) -> int:
+        """Get the mark below which all the reservation changes are committed.
+
+        The changes numbered afterwards get the mark or a higher number.
+        """
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+                )
+                return cursor.fetchone()[0]
+        return cls.current() + 1
+
+    @classmethod
+    def state(cls, counter: int = RESERVATIONS) -> tuple[int, Optional[datetime]]:
+        """Get the last used sequence number of the counter and when it was used."""
+        state = cls.objects.filter(pk=counter).values_list("value", "time").first()
+        return state or (0, None)
+
+
+class ReservationTombstoneManager(models.Manager):
+    """Custom model manager for the tombstones."""
+
+    def record(self, pks: list[int]):
+        """Leave the tombstones of the deleted reservations or series, sharing a
+        number.
+
+        Must be called in the transaction deleting them.
+        """
+        if not pks:
+            return
+        sequence = ChangeSequence.next()
+        self.bulk_create(
+            [
+                self.model(sequence=sequence, **{self.model.object_field: pk})
+                for pk in pks
+            ]
+        )
+
+
+class ReservationTombstone(models.Model):
+    """A record of a deleted reservation for the change feed."""
+
+    #: The change sequence number of the deletion.
+    sequence = models.PositiveBigIntegerField(db_index=True)
+
+    #: The primary key of the deleted reservation.
+    reservation_id = models.PositiveBigIntegerField()
+
+    #: When the reservation was deleted.
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    #: The field holding the primary key of the deleted object.
+    object_field = "reservation_id"
+
+    objects = ReservationTombstoneManager()
+
+
+class ReservationSeriesTombstone(models.Model):
+    """A record of a deleted reservation series for the change feed."""
+
+    #: The change sequence number of the deletion.
+    sequence = models.PositiveBigIntegerField(db_index=True)
+
+    #: The primary key of the deleted series.
+    series_id = models.PositiveBigIntegerField()
+
+    #: When the series was deleted.
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    #: The field holding the primary key of the deleted object.
+    object_field = "series_id"
+
+    objects = ReservationTombstoneManager()
+
+
+class Occupancy(models.Model):
+    """The reserved time of a reservable in an hour.
+
+    The rollups are kept up to date by the signal handlers and can be rebuilt with
+    the ``rebuild_occupancy`` command, see :mod:`reservations.analytics`.
+    """
+
+    #: The reservable.
+    reservable = models.ForeignKey(
+        "Reservable", on_delete=models.CASCADE, related_name="occupancy"
+    )
+
+    #: The start of the hour (UTC).
+    start = models.DateTimeField()
+
+    #: The number of reserved seconds in the hour, summed over the reservations.
+    seconds = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("reservable", "start")
+        verbose_name_plural = _("occupancy")
+
+
+class ReservationSeriesQuerySet(models.QuerySet):
+    """Custom queryset of reservation series."""
+
+    def delete(self) -> tuple[int, dict[str, int]]:
+        """Delete the series and leave their tombstones in the change feed."""
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            deleted = super().delete()
+            ReservationSeriesTombstone.objects.record(pks)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def occurring(
+        self, start: Optional[datetime], end: Optional[datetime]
+    ) -> "ReservationSeriesQuerySet":
+        """Get the series which may have occurrences overlapping the window.
+
+        The last occurrence starts before the end of the series and may last past it.
+        The window is unbounded on the side of the omitted start or end.
+        """
+        queryset = self
+        if end is not None:
+            queryset = queryset.filter(start__lt=end)
+        if start is not None:
+            queryset = queryset.filter(
+                until__gt=models.ExpressionWrapper(
+                    models.Value(start) - (models.F("end") - models.F("start")),
+                    output_field=models.DateTimeField(),
+                )
+            )
+        return queryset
+
+
+class ReservationSeriesManager(models.Manager):
+    """Custom model manager for reservation series."""
+
+    def get_queryset(self) -> ReservationSeriesQuerySet:
+        """Get the queryset of the series."""
+        return ReservationSeriesQuerySet(self.model, using=self._db)
+
+    def occurrences(
+        self,
+        start: datetime,
+        end: datetime,
+        reservables: Iterable[Reservable],
+        exclude: Optional[int] = None,
+    ) -> Iterator[tuple[int, datetime, datetime, int]]:
+        """Generate the occurrences of series on reservables overlapping the window.
+
+        The occurrences are (reservable id, start, end, series id) tuples.
+
+        :param exclude: the primary key of the series to leave out.
+        """
+        if hasattr(reservables, "all"):
+            reservable_ids = set(reservables.all().values_list("pk", flat=True))
+        else:
+            reservable_ids = {getattr(r, "pk", r) for r in reservables}
+        return self.expand(
+            self.overlapping(start, end, reservable_ids, exclude),
+            reservable_ids,
+            start,
+            end,
+        )
+
+    def overlapping(
+        self,
+        start: datetime,
+        end: datetime,
+        reservable_ids: Iterable[int],
+        exclude: Optional[int] = None,
+    ) -> models.QuerySet:
+        """Get the series on the reservables which may occur in the window.
+
+        The primary keys of the reservables of the series are prefetched.
+        """
+        queryset = (
+            self.get_queryset()
+            .occurring(start, end)
+            .filter(reservables__in=reservable_ids)
+            .distinct()
+            .prefetch_related(
+                models.Prefetch("reservables", queryset=Reservable.objects.only("pk"))
+            )
+        )
+        if exclude is not None:
+            queryset = queryset.exclude(pk=exclude)
+        return queryset
+
+    @staticmethod
+    def expand(
+        series: Iterable["ReservationSeries"],
+        reservable_ids: set[int],
+        start: datetime,
+        end: datetime,
+    ) -> Iterator[tuple[int, datetime, datetime, int]]:
+        """Generate the occurrences of the series with prefetched reservables."""
+        for one in series:
+            series_reservables = [
+                reservable.pk
+                for reservable in one.reservables.all()
+                if reservable.pk in reservable_ids
+            ]
+            for occurrence_start, occurrence_end in one.occurrences(start, end):
+                for reservable_id in series_reservables:
+                    yield reservable_id, occurrence_start, occurrence_end, one.pk
+
+
+class ReservationSeries(models.Model):
+    """A series of recurring reservations.
+
+    The occurrences are not stored, they are expanded lazily in the current time zone
+    so the series keeps its wall clock time across daylight saving time changes.
+    """
+
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    FREQUENCIES = ((DAILY, _("Daily")), (WEEKLY, _("Weekly")))
+
+    #: Why the reservations were made.
+    reason = models.CharField(
+        max_length=255, verbose_name=_("A reason for the reservation.")
+    )
+
+    #: Start of the first occurrence.
+    start = models.DateTimeField(verbose_name=_("A start time of the first occurrence"))
+
+    #: End of the first occurrence.
+    end = models.DateTimeField(verbose_name=_("An end time of the first occurrence"))
+
+    #: How often the reservation repeats.
+    frequency = models.CharField(max_length=16, choices=FREQUENCIES, default=WEEKLY)
+
+    #: The number of days or weeks between the occurrences.
+    interval = models.PositiveIntegerField(default=1)
+
+    #: No occurrence starts at or after this time.
+    until = models.DateTimeField(verbose_name=_("The end of the series"))
+
+    #: The ISO formatted dates of the skipped occurrences.
+    exceptions = models.JSONField(default=list, blank=True)
+
+    #: Owners of the reservations.
+    owners = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("The reservation owners"),
+        related_name="reservation_series",
+    )
+
+    #: Reservables in the reservations.
+    reservables = models.ManyToManyField(
+        "Reservable", verbose_name=_("reservables"), related_name="reservation_series"
+    )
+
+    #: The change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = ReservationSeriesManager()
+
+    class Meta:
+        """Add constraints and indexes to the database."""
+
+        constraints = [
+            models.CheckConstraint(
+                name="%(app_label)s_%(class)s_start_before_end",
+                check=models.Q(start__lt=models.F("end")),
+            ),
+            models.CheckConstraint(
+                name="%(app_label)s_%(class)s_interval_positive",
+                check=models.Q(interval__gt=0),
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["until", "start"], name="reservations_series_idx"),
+            models.Index(fields=["sequence"], name="reservations_series_seq_idx"),
+        ]
+        verbose_name_plural = _("reservation series")
+
+    def save(self, *args, **kwargs):
+        """Save the series numbering the change in its transaction."""
+        with transaction.atomic():
+            self.sequence = ChangeSequence.next()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "sequence"}
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs) -> tuple[int, dict[str, int]]:
+        """Delete the series and leave its tombstone in the change feed."""
+        pk = self.pk
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            ReservationSeriesTombstone.objects.record([pk])
+        return deleted
+
+    def occurrences(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Iterator[tuple[datetime, datetime]]:
+        """Generate the (start, end) occurrences overlapping the optional window."""
+        first = timezone.localtime(self.start)
+        duration = self.end - self.start
+        step = self.interval * (7 if self.frequency == self.WEEKLY else 1)
+        skipped = set(self.exceptions)
+
+        index = 0
+        if start is not None:
+            # Skip the occurrences ending before the window starts.
+            days = (timezone.localtime(start).date() - first.date()).days
+            index = max(0, (days - duration.days) // step - 1)
+
+        while True:
+            day = first.date() + timedelta(days=index * step)
+            occurrence_start = datetime.combine(day, first.time(), first.tzinfo)
+            if occurrence_start >= self.until or (
+                end is not None and occurrence_start >= end
+            ):
+                return
+            occurrence_end = occurrence_start + duration
+            if day.isoformat() not in skipped and (
+                start is None or occurrence_end > start
+            ):
+                yield occurrence_start, occurrence_end
+            index += 1
+
+    def detach(self, day: date) -> Reservation:
+        """Replace the occurrence on the given day with a standalone reservation.
+
+        The returned reservation can be modified independently of the series.
+        """
+        for occurrence_start, occurrence_end in self.occurrences(
+            timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        ):
+            if timezone.localtime(occurrence_start).date() == day:
+                break
+        else:
+            raise ValueError(f"No occurrence on {day}.")
+        reservation = Reservation.objects.create(
+            reason=self.reason,
+            start=occurrence_start,
+            end=occurrence_end,
+            series=self,
+        )
+        reservation.owners.set(self.owners.all())
+        reservation.reservables.set(self.reservables.all())
+        self.exceptions = [*self.exceptions, day.isoformat()]
+        self.save(update_fields=["exceptions"])
+        return reservation
+
+    def __str__(self) -> str:
+        """Return human readable representation."""
+        return f"{self.start} <-> {self.end} ({self.frequency}), {self.reason}"
+
+
+class Occurrence:
+    """An occurrence of a reservation series listed with the reservations.
+
+    The occurrences are not stored. The id of the occurrence is the negated primary
+    key of its series, so the occurrences are merged into the (start, id) keyset of
+    the reservations without colliding with them and precede the reservations
+    starting at the same time.
+    """
+
+    def __init__(self, series: ReservationSeries, start: datetime, end: datetime):
+        """Remember the series and the interval of the occurrence."""
+        self.series = series
+        self.start = start
+        self.end = end
+        self.id = -series.pk
+
+
+class ArchivedReservationManager(models.Manager):
+    """Custom model manager for archived reservations."""
+
+    def horizon(self) -> Optional[datetime]:
+        """Get the latest end of the archived reservations.
+
+        No archived reservation ends after it, so the queries of the later times do not
+        have to read the archive.
+        """
+        return self.get_queryset().aggregate(horizon=models.Max("end"))["horizon"]
+
+    async def ahorizon(self) -> Optional[datetime]:
+        """Get the latest end of the archived reservations asynchronously."""
+        horizon = await self.get_queryset().aaggregate(horizon=models.Max("end"))
+        return horizon["horizon"]
+
+
+class ArchivedReservation(models.Model):
+    """A past reservation moved out of the reservation table.
+
+    The archived reservations keep their primary keys and relations, but not the
+    copied intervals of the reservables which are only needed by the overlap checks.
+    They are read-only and listed by the reservation endpoint together with the
+    current reservations, see :mod:`reservations.archive`.
+    """
+
+    #: The primary key of the reservation.
+    id = models.BigIntegerField(primary_key=True)
+
+    #: Why the reservation was made.
+    reason = models.CharField(max_length=255)
+
+    #: Start of the reservation.
+    start = models.DateTimeField()
+
+    #: End of the reservation.
+    end = models.DateTimeField()
+
+    #: Owners of the reservation.
+    owners = models.ManyToManyField(
+        settings.AUTH_USER_MODEL, related_name="archived_reservations"
+    )
+
+    #: Reservables in the reservation.
+    reservables = models.ManyToManyField(
+        "Reservable", related_name="archived_reservations"
+    )
+
+    #: Requirements for the reservation.
+    requirements = models.ManyToManyField(
+        "Resource", through="ArchivedNRequirements", related_name="+"
+    )
+
+    #: The series the reservation was detached from.
+    series = models.ForeignKey(
+        "ReservationSeries",
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_reservations",
+    )
+
+    #: The change sequence number of the last modification.
+    sequence = models.PositiveBigIntegerField(default=0)
+
+    #: When the reservation was archived.
+    archived = models.DateTimeField(default=timezone.now)
+
+    objects = ArchivedReservationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["start", "id"], name="reservations_archive_keyset"),
+            models.Index(fields=["end"], name="reservations_archive_end_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """Return human readable representation."""
+        return f"{self.start} <-> {self.end}, {self.reason} (archived)"
+
+
+class ArchivedNRequirements(models.Model):
+    """A requirement of an archived reservation."""
+
+    #: The required resource.
+    resource = models.ForeignKey("Resource", on_delete=models.CASCADE)
+
+    #: The archived reservation.
+    reservation = models.ForeignKey("ArchivedReservation", on_delete=models.CASCADE)
+
+    #: The required number of resources.
+    n = models.IntegerField()
@@ -0,0 +1,203 @@
+"""Pagination for REST ViewSets in views namespace."""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from heapq import merge
+from itertools import dropwhile, islice
+from typing import Awaitable, Callable, Iterable, Iterator, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    """Forward keyset (cursor) pagination.
+
+    The results are ordered by the ``keyset_ordering`` fields of the view, which must
+    be unique together. The cursor holds the values of these fields for the last
+    result of the page and the next page is selected by comparing with them, so every
+    page costs the same regardless of its depth and rows inserted meanwhile do not
+    shift the following pages.
+
+    The pagination is only used when the cursor or the page size is given in the
+    query, otherwise all results are returned as before.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 100
+    max_page_size = 1000
+
+    def paginate_queryset(
+        self, queryset: models.QuerySet, request: Request, view=None
+    ) -> Optional[list]:
+        """Get the page of the queryset selected by the cursor."""
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(
+        self,
+        querysets: Iterable[models.QuerySet],
+        request: Request,
+        view=None,
+        entries: Optional[Callable[[Optional[tuple]], Iterator]] = None,
+    ) -> Optional[list]:
+        """Get the page of the querysets merged by the keyset.
+
+        The querysets must not contain the same keys. The page is read from every
+        queryset and the pages are merged.
+
+        :param entries: the function generating the entries which are not stored in
+            the querysets, ordered by the keyset. It is given the key of the cursor,
+            or None on the first page, and the entries up to the cursor are skipped.
+        """
+        pages = self.get_pages(querysets, request, view)
+        if pages is None:
+            return None
+        if entries is not None:
+            pages.append(self.following(entries(self.cursor)))
+        return self.merge_pages(pages)
+
+    async def apaginate_querysets(
+        self,
+        querysets: Iterable[models.QuerySet],
+        request: Request,
+        view=None,
+        entries: Optional[Callable[[Optional[tuple]], Awaitable[Iterator]]] = None,
+    ) -> Optional[list]:
+        """Get the page of the querysets merged by the keyset asynchronously.
+
+        :param entries: the coroutine function getting the entries like the function
+            given to :meth:`paginate_querysets`.
+        """
+        pages = self.get_pages(querysets, request, view)
+        if pages is None:
+            return None
+        results = []
+        for page in pages:
+            results.append([item async for item in page])
+        if entries is not None:
+            results.append(self.following(await entries(self.cursor)))
+        return self.merge_pages(results)
+
+    def following(self, entries: Iterator) -> Iterator:
+        """Skip the entries up to the cursor."""
+        if self.cursor is None:
+            return entries
+        return dropwhile(lambda entry: self.key(entry) <= self.cursor, entries)
+
+    def get_pages(
+        self, querysets: Iterable[models.QuerySet], request: Request, view=None
+    ) -> Optional[list[models.QuerySet]]:
+        """Get the querysets of the pages selected by the cursor.
+
+        :returns: None if the results are not paginated.
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and (
+            self.page_size_query_param not in params
+        ):
+            return None
+
+        self.request = request
+        self.fields = tuple(getattr(view, "keyset_ordering", ("pk",)))
+        self.page_size = self.get_page_size(request)
+        querysets = list(querysets)
+        self.model = querysets[0].model
+        cursor = params.get(self.cursor_query_param)
+        self.cursor = tuple(self.decode(self.model, cursor)) if cursor else None
+        pages = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*self.fields)
+            if cursor:
+                queryset = queryset.filter(self.after(queryset.model, cursor))
+            pages.append(queryset[: self.page_size + 1])
+        return pages
+
+    def merge_pages(self, pages: Iterable[Iterable[models.Model]]) -> list:
+        """Merge the pages read from the querysets into the page."""
+        results = list(islice(merge(*pages, key=self.key), self.page_size + 1))
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.last = results[-1] if results else None
+        return results
+
+    def key(self, instance: models.Model) -> tuple:
+        """Get the values of the ordering fields of the instance."""
+        return tuple(getattr(instance, field) for field in self.fields)
+
+    def get_page_size(self, request: Request) -> int:
+        """Get the page size from the query, limited to the maximal page size."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode(self, model: type[models.Model], cursor: str) -> list:
+        """Get the values of the ordering fields from the cursor.
+
+        :raises NotFound: when the cursor is invalid.
+        """
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values, strict=True)
+            ]
+        except (BinasciiError, TypeError, ValueError, ValidationError) as error:
+            raise NotFound(_("Invalid cursor.")) from error
+
+    def after(self, model: type[models.Model], cursor: str) -> models.Q:
+        """Get the condition selecting the rows after the cursor.
+
+        The rows are compared lexicographically by the ordering fields. The
+        comparisons are also bounded by the first field, so the database seeks the
+        index to the cursor instead of scanning it from the beginning.
+
+        :raises NotFound: when the cursor is invalid.
+        """
+        values = self.decode(model, cursor)
+        condition = models.Q(pk__in=[])
+        for i, field in enumerate(self.fields):
+            condition |= models.Q(
+                **dict(zip(self.fields[:i], values[:i], strict=True)),
+                **{f"{field}__gt": values[i]},
+            )
+        return models.Q(**{f"{self.fields[0]}__gte": values[0]}) & condition
+
+    def get_next_link(self) -> Optional[str]:
+        """Get the link to the next page."""
+        if not self.has_next:
+            return None
+        # The last result is not necessarily an instance of the model.
+        values = [
+            self.model._meta.get_field(field).value_to_string(self.last)
+            for field in self.fields
+        ]
+        cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        """Wrap the page with the link to the next one."""
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        """Describe the paginated response."""
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
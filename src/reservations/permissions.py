@@ -3,18 +3,26 @@
 Used by Django REST framework.
 """
 
-from typing import Optional
+from typing import Iterable, Optional
 
 from guardian.core import ObjectPermissionChecker
 
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 from rest_framework import exceptions, permissions
 from rest_framework.request import Request
 from rest_framework.views import View
 
-from reservations.models import Reservable, Reservation
-from reservations.serializers import ReservationSerializer
+from reservations.availability import existing_intervals, find_overlaps
+from reservations.metrics import timed
+from reservations.models import (
+    Reservable,
+    Reservation,
+    ReservationReservable,
+    ReservationSeries,
+)
+from reservations.serializers import ReservationSerializer, ReservationSeriesSerializer
 
 
 class ReservationPermission(permissions.DjangoModelPermissionsOrAnonReadOnly):
@@ -28,21 +36,48 @@ class ReservationPermission(permissions.DjangoModelPermissionsOrAnonReadOnly):
 
     Since we always allow read-only access the permission filter is actually currently
     not necessary.
+
+    The time of the checks is measured by the method, see :mod:`reservations.metrics`.
     """
 
+    #: The serializer used to validate the modifications.
+    serializer_class = ReservationSerializer
+
+    @timed
+    def has_permission(self, request: Request, view: View) -> bool:
+        """Check the model permissions."""
+        return super().has_permission(request, view)
+
+    @timed
+    def get_permission_checker(
+        self, reservables: Iterable[Reservable], user
+    ) -> ObjectPermissionChecker:
+        """Get the permission checker with prefetched permissions on reservables.
+
+        The user and group permissions on all the reservables are loaded in two
+        queries, so the subsequent checks on the reservables do not hit the database.
+        """
+        checker = ObjectPermissionChecker(user)
+        reservables = list(reservables)
+        if reservables and user.is_active and not user.is_superuser:
+            checker.prefetch_perms(reservables)
+        return checker
+
+    @timed
     def can_create_update(
-        self, validated_data, user, reservation: Optional[Reservation]
+        self, validated_data, user, reservation: Optional[Reservation] = None
     ):
         """Check if the reservation from the given data can be created.
 
         :raises PermissionDenied: when reservation can not be created / updated.
         """
-        reservables = validated_data["reservables"]
+        reservables = list(validated_data["reservables"])
+        checker = self.get_permission_checker(reservables, user)
         # Users with manage permission on reservables can always reserve them.
-        if self.check_manage_permissions(reservables, user):
+        if self.check_manage_permissions(reservables, user, checker):
             return
 
-        self.has_reservables_permissions(reservables, user)
+        self.has_reservables_permissions(reservables, user, checker)
 
         start = validated_data["start"]
         end = validated_data["end"]
@@ -57,11 +92,26 @@ class ReservationPermission(permissions.DjangoModelPermissionsOrAnonReadOnly):
                 )
 
             # Remove the existing reservation from the overlapping set.
-            overlapping_reservations.exclude(pk=reservation.pk)
+            overlapping_reservations = overlapping_reservations.exclude(
+                pk=reservation.pk
+            )
 
-        if overlapping_reservations.exists():
-            self.can_overlap(overlapping_reservations, reservables, user)
+        overlapping_series = {
+            reservable_id
+            for reservable_id, *_occurrence in ReservationSeries.objects.occurrences(
+                start, end, reservables
+            )
+        }
+        if overlapping_series or overlapping_reservations.exists():
+            self.can_overlap(
+                overlapping_reservations,
+                reservables,
+                user,
+                checker,
+                overlapping_series,
+            )
 
+    @timed
     def has_object_permission(
         self, request: Request, view: View, reservation: Reservation
     ) -> bool:
@@ -72,38 +122,52 @@ class ReservationPermission(permissions.DjangoModelPermissionsOrAnonReadOnly):
 
         # The user must be authenticated at this point or has_permission on the parent
         # object would fail.
-        serializer = ReservationSerializer(data=request.data, instance=reservation)
+        serializer = self.serializer_class(data=request.data, instance=reservation)
         serializer.is_valid(raise_exception=True)
         self.can_create_update(serializer.validated_data, request.user, reservation)
         return True
 
-    def has_reservables_permissions(self, reservables: models.QuerySet, user):
+    @timed
+    def has_reservables_permissions(
+        self,
+        reservables: Iterable[Reservable],
+        user,
+        checker: Optional[ObjectPermissionChecker] = None,
+    ):
         """Does user have reserve permissions on all reservables.
 
         :raise PermissionDenied: when user has no permission on at least one reservable.
         """
-        checker = ObjectPermissionChecker(user)
+        checker = checker or self.get_permission_checker(reservables, user)
         if any(
-            not checker.has_perm("manage_reservations", reservable)
-            for reservable in reservables.all()
+            not checker.has_perm("reserve", reservable) for reservable in reservables
         ):
             raise exceptions.PermissionDenied(
                 detail=_("Insufficient privileges on reservables.")
             )
 
-    def check_manage_permissions(self, reservables: models.QuerySet, user) -> bool:
+    @timed
+    def check_manage_permissions(
+        self,
+        reservables: Iterable[Reservable],
+        user,
+        checker: Optional[ObjectPermissionChecker] = None,
+    ) -> bool:
         """Does user have manage permissions on all reservables."""
-        checker = ObjectPermissionChecker(user)
+        checker = checker or self.get_permission_checker(reservables, user)
         return all(
             checker.has_perm("manage_reservations", reservable)
-            for reservable in reservables.all()
+            for reservable in reservables
         )
 
+    @timed
     def can_overlap(
         self,
         overlapping_reservations: models.QuerySet,
-        reservables: models.QuerySet,
+        reservables: Iterable[Reservable],
         user,
+        checker: Optional[ObjectPermissionChecker] = None,
+        overlapping_series: Iterable[int] = (),
     ):
         """
         Check if user can create the given revervation.
@@ -111,21 +175,88 @@ class ReservationPermission(permissions.DjangoModelPermissionsOrAnonReadOnly):
         In case the new reservation is overlapping with existing ones check that the
         user has permission to create overlapping reservations.
 
+        :param overlapping_series: the primary keys of the reservables on which the
+            reservation overlaps with the occurrences of reservation series.
+
         :raises PermissionDenied: when the reservation would overlap with existing ones
             on reservables user has no 'double_reserve' permission on.
         """
-        checker = ObjectPermissionChecker(user)
+        reservables = list(reservables)
+        checker = checker or self.get_permission_checker(reservables, user)
         # We have to check the reservables that are contained in the intersection of
         # the overlapping reservations and given reservables.
-        reservables_to_check = (
-            Reservable.objects.filter(reservation__in=overlapping_reservations)
-            .filter(pk__in=reservables.values("pk"))
-            .distinct()
+        overlapped = set(
+            ReservationReservable.objects.filter(
+                reservation__in=overlapping_reservations, reservable__in=reservables
+            ).values_list("reservable_id", flat=True)
         )
+        overlapped.update(overlapping_series)
 
-        # The iterator is used to not construct all the reservable objects.
         if any(
             not checker.has_perm("double_reserve", reservable)
-            for reservable in reservables_to_check.iterator()
+            for reservable in reservables
+            if reservable.pk in overlapped
+        ):
+            raise exceptions.PermissionDenied(detail=_("No double booking permission."))
+
+
+class ReservationSeriesPermission(ReservationPermission):
+    """Check the permissions when retrieving / modifying reservation series.
+
+    Every occurrence of the series is checked against the existing reservations and
+    the occurrences of the other series.
+    """
+
+    serializer_class = ReservationSeriesSerializer
+
+    @timed
+    def can_create_update(
+        self, validated_data, user, series: Optional[ReservationSeries] = None
+    ):
+        """Check if the series from the given data can be created.
+
+        :raises PermissionDenied: when series can not be created / updated.
+        """
+        reservables = list(validated_data["reservables"])
+        checker = self.get_permission_checker(reservables, user)
+        if self.check_manage_permissions(reservables, user, checker):
+            return
+
+        self.has_reservables_permissions(reservables, user, checker)
+
+        if series is not None and not series.owners.filter(pk=user.pk).exists():
+            raise exceptions.PermissionDenied(_("Must be owner to modify the series."))
+
+        candidate = ReservationSeries(
+            **{
+                field: value
+                for field, value in validated_data.items()
+                if field not in ("owners", "reservables")
+            }
+        )
+        occurrences = list(candidate.occurrences())
+        if not occurrences:
+            return
+        intervals = existing_intervals(
+            [reservable.pk for reservable in reservables],
+            occurrences[0][0],
+            occurrences[-1][1],
+            exclude_series=series.pk if series is not None else None,
+        )
+        overlapped = {
+            reservable_id
+            for reservable_id, reservable_intervals in intervals.items()
+            if find_overlaps(
+                sorted(
+                    [(start, end, None) for start, end in reservable_intervals]
+                    + [(start, end, 0) for start, end in occurrences],
+                    key=lambda interval: (interval[0], interval[1]),
+                )
+            )
+        }
+        if any(
+            not checker.has_perm("double_reserve", reservable)
+            for reservable in reservables
+            if reservable.pk in overlapped
         ):
             raise exceptions.PermissionDenied(detail=_("No double booking permission."))
@@ -0,0 +1,104 @@
+"""Pruning of the reservations without reservables.
+
+The orphaned reservations are found with an anti-join on the reservation
+reservables in batches ordered by the primary key, so no batch is read twice and the
+whole table is never loaded at once. Every batch is deleted in its own short
+transaction with plain DELETE statements of the owners, the requirements and the
+reservations, and a tombstone of every deleted reservation is written to the change
+feed with a single INSERT ... SELECT statement. The signal handlers are bypassed: the
+orphans have no reservation reservables, so there is nothing to subtract from the
+occupancy rollups.
+
+The pruning can be limited by a time budget, it stops after the batch exceeding it
+and is resumed by the next run.
+"""
+
+import time
+from typing import Callable, Optional
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from reservations.archive import copy_rows, delete_rows
+from reservations.models import (
+    ChangeSequence,
+    NRequirements,
+    Reservation,
+    ReservationReservable,
+    ReservationTombstone,
+)
+
+#: The number of reservations deleted at once.
+BATCH_SIZE = 1000
+
+
+def orphans() -> QuerySet:
+    """Get the queryset of the reservations without reservables."""
+    return Reservation.objects.exclude(
+        Exists(ReservationReservable.objects.filter(reservation=OuterRef("pk")))
+    )
+
+
+def prune_batch(pks: list[int]):
+    """Delete the reservations with their owners and requirements.
+
+    The tombstones of the reservations share a sequence number.
+    """
+    copy_rows(
+        Reservation,
+        ReservationTombstone,
+        {"id": "reservation_id"},
+        "id",
+        pks,
+        {"sequence": ChangeSequence.next(), "deleted": timezone.now()},
+    )
+    for model in (Reservation.owners.through, NRequirements):
+        delete_rows(model, "reservation", pks)
+    delete_rows(Reservation, "id", pks)
+
+
+def prune(
+    batch_size: int = BATCH_SIZE,
+    budget: Optional[float] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Delete the reservations without reservables.
+
+    Every batch is locked and checked again in its own transaction, so the
+    reservations getting reservables meanwhile are kept.
+
+    :param budget: the number of seconds after which no more batches are started,
+        unlimited by default.
+    :param progress: called with the number of deleted reservations after every
+        batch.
+    :returns: the number of the deleted reservations.
+    """
+    started = time.monotonic()
+    count = 0
+    last = 0
+    while budget is None or time.monotonic() - started < budget:
+        with transaction.atomic():
+            candidates = list(
+                orphans()
+                .select_for_update()
+                .filter(pk__gt=last)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not candidates:
+                break
+            # The reservables added before the rows were locked are seen now.
+            pks = list(
+                orphans()
+                .filter(pk__in=candidates)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if pks:
+                prune_batch(pks)
+        count += len(pks)
+        last = candidates[-1]
+        if progress is not None:
+            progress(count)
+    return count
@@ -0,0 +1,264 @@
+"""Renderers of the reservation exports.
+
+The exports are streamed by the reservation view set: the reservations are read in
+chunks with the reservables and the owners prefetched per chunk and every chunk is
+written out before the next one is read, so the memory used does not depend on the
+number of exported reservations. The current and the archived reservations and the
+occurrences of the reservation series are merged by their start. The occurrences are
+expanded from all the matching series, which are read before the first occurrence.
+"""
+
+import abc
+import csv
+import io
+from datetime import UTC, datetime
+from heapq import merge
+from typing import Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+from rest_framework import renderers
+
+from reservations.models import (
+    ArchivedNRequirements,
+    ArchivedReservation,
+    NRequirements,
+    Reservable,
+    Reservation,
+    ReservationSeries,
+)
+
+#: The reservation or the series with the start and the end of the exported interval.
+Entry = tuple[models.Model, datetime, datetime]
+
+
+class ReservationExportRenderer(renderers.BaseRenderer, abc.ABC):
+    """Base renderer of the streamed reservation exports."""
+
+    charset = "utf-8"
+
+    #: The number of reservations read and prefetched at once.
+    chunk_size = 2000
+
+    def entries(
+        self, querysets: Iterable[models.QuerySet], series=None
+    ) -> Iterator[Entry]:
+        """Read the reservations and the series occurrences ordered by the start.
+
+        The querysets must be ordered by the start and the primary key.
+
+        :param series: the :class:`~reservations.filters.ReservationSeriesExportFilter`
+            of the exported series, none are exported by default.
+        """
+        entries = [
+            (
+                (reservation, reservation.start, reservation.end)
+                for reservation in self.read(queryset)
+            )
+            for queryset in querysets
+        ]
+        if series is not None:
+            entries.append(series.occurrences(self.read(series.qs.order_by("pk"))))
+        # The occurrences precede the reservations starting at the same time, like in
+        # the listing of the reservations.
+        return merge(
+            *entries,
+            key=lambda entry: (
+                entry[1],
+                -entry[0].pk
+                if isinstance(entry[0], ReservationSeries)
+                else entry[0].pk,
+            ),
+        )
+
+    def prefetches(self, model: type[models.Model]) -> list[models.Prefetch]:
+        """Get the prefetches of the exported relations of the model."""
+        User = get_user_model()
+        return [
+            models.Prefetch("reservables", queryset=Reservable.objects.only("slug")),
+            models.Prefetch("owners", queryset=User.objects.only(User.USERNAME_FIELD)),
+        ]
+
+    def read(self, queryset: models.QuerySet) -> Iterator[models.Model]:
+        """Read the objects of the queryset in chunks."""
+        return (
+            queryset.prefetch_related(None)
+            .prefetch_related(*self.prefetches(queryset.model))
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    @abc.abstractmethod
+    def stream(
+        self, querysets: Iterable[models.QuerySet], request, series=None
+    ) -> Iterator[bytes]:
+        """Render the reservations and the series occurrences piece by piece.
+
+        :param series: the filter of the exported series, see :meth:`entries`.
+        """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render the responses which are not streamed, that is the errors."""
+        if isinstance(data, dict):
+            data = [f"{key}: {value}" for key, value in data.items()]
+        elif not isinstance(data, list):
+            data = [data]
+        return "\n".join(map(str, data)).encode(self.charset)
+
+
+class ReservationCSVRenderer(ReservationExportRenderer):
+    """Export the reservations as comma separated values.
+
+    The columns are those read by the ``import_reservations`` command, so the export
+    can be imported back. The occurrences of the series are the rows without the id.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+
+    #: The exported columns.
+    header = ("id", "reason", "start", "end", "reservables", "owners", "requirements")
+
+    #: The relations and the models of the requirements by the model.
+    requirements = {
+        Reservation: ("nrequirements_set", NRequirements),
+        ArchivedReservation: ("archivednrequirements_set", ArchivedNRequirements),
+    }
+
+    def prefetches(self, model: type[models.Model]) -> list[models.Prefetch]:
+        """Prefetch the requirements with the slugs of their resources too."""
+        prefetches = super().prefetches(model)
+        if model in self.requirements:
+            relation, requirement = self.requirements[model]
+            prefetches.append(
+                models.Prefetch(
+                    relation,
+                    queryset=requirement.objects.select_related("resource").only(
+                        "reservation", "n", "resource__slug"
+                    ),
+                )
+            )
+        return prefetches
+
+    def stream(
+        self, querysets: Iterable[models.QuerySet], request, series=None
+    ) -> Iterator[bytes]:
+        """Render the header and a row per reservation or occurrence."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        for count, (entry, start, end) in enumerate(self.entries(querysets, series), 1):
+            is_series = isinstance(entry, ReservationSeries)
+            writer.writerow(
+                (
+                    "" if is_series else entry.pk,
+                    entry.reason,
+                    start.isoformat(),
+                    end.isoformat(),
+                    " ".join(reservable.slug for reservable in entry.reservables.all()),
+                    " ".join(owner.get_username() for owner in entry.owners.all()),
+                    (
+                        ""
+                        if is_series
+                        else ",".join(
+                            f"{requirement.resource.slug}:{requirement.n}"
+                            for requirement in getattr(
+                                entry, self.requirements[type(entry)][0]
+                            ).all()
+                        )
+                    ),
+                )
+            )
+            if count % self.chunk_size == 0:
+                yield flush(buffer).encode(self.charset)
+        yield flush(buffer).encode(self.charset)
+
+
+class ReservationICSRenderer(ReservationExportRenderer):
+    """Export the reservations as an iCalendar (RFC 5545) calendar.
+
+    Every occurrence of a series is exported as an event.
+    """
+
+    media_type = "text/calendar"
+    format = "ics"
+
+    def stream(
+        self, querysets: Iterable[models.QuerySet], request, series=None
+    ) -> Iterator[bytes]:
+        """Render the calendar with an event per reservation or occurrence."""
+        host = request.get_host()
+        stamp = ical_datetime(timezone.now())
+        lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//UL FRI//reservations//EN",
+            "CALSCALE:GREGORIAN",
+        ]
+        for count, (entry, start, end) in enumerate(self.entries(querysets, series), 1):
+            if isinstance(entry, ReservationSeries):
+                uid = f"series-{entry.pk}-{ical_datetime(start)}@{host}"
+            else:
+                uid = f"reservation-{entry.pk}@{host}"
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:{uid}",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{ical_datetime(start)}",
+                f"DTEND:{ical_datetime(end)}",
+                f"SUMMARY:{ical_text(entry.reason)}",
+                "LOCATION:{}".format(
+                    ical_text(
+                        ", ".join(
+                            reservable.slug for reservable in entry.reservables.all()
+                        )
+                    )
+                ),
+                "END:VEVENT",
+            ]
+            if count % self.chunk_size == 0:
+                yield fold(lines).encode(self.charset)
+                lines = []
+        lines.append("END:VCALENDAR")
+        yield fold(lines).encode(self.charset)
+
+
+def flush(buffer: io.StringIO) -> str:
+    """Get the contents of the buffer and empty it."""
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def ical_datetime(value: datetime) -> str:
+    """Format the datetime in UTC as an iCalendar date-time."""
+    return value.astimezone(UTC).strftime("%Y%m%dT%H%M%SZ")
+
+
+def ical_text(value: str) -> str:
+    """Escape the iCalendar text value."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(lines: Iterable[str]) -> str:
+    """Join the content lines, folding them at 75 octets as iCalendar requires."""
+    folded = []
+    for line in lines:
+        encoded = line.encode("utf-8")
+        while len(encoded) > 75:
+            # Do not split the multi-byte characters.
+            cut = 75
+            while cut and (encoded[cut] & 0xC0) == 0x80:
+                cut -= 1
+            folded.append(encoded[:cut].decode("utf-8"))
+            encoded = b" " + encoded[cut:]
+        folded.append(encoded.decode("utf-8"))
+    return "".join(f"{line}\r\n" for line in folded)
@@ -0,0 +1,230 @@
+"""Substring search on the text fields of reservables and users.
+
+The autocompletes and the ``icontains``/``istartswith`` filters search the names of
+the reservables and the users. On PostgreSQL these lookups are answered from the
+pg_trgm GIN indexes created by the migrations. Other databases scan the tables, so
+the autocompletes are answered from an in-process index instead: the lowercased
+texts of a field are joined into a single string, which is searched in C by
+``str.find``, and the matches are mapped back to the objects by bisecting the
+offsets of the texts.
+
+The index is built on the first search and the changes made in the same process are
+applied by the signal handlers. Changes made by other processes are seen when the
+index is rebuilt, ``RESERVATIONS_SEARCH_TTL`` seconds (five minutes by default)
+after it was built. The suggestions can lag behind until then, so the filters of the
+API always search the database.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import connection, models
+
+#: The indexed text fields by the model label.
+SEARCH_FIELDS = {
+    "reservations.Reservable": ("slug", "name"),
+    settings.AUTH_USER_MODEL: ("first_name", "last_name", "username", "email"),
+}
+
+#: Searches matching more objects are left to the database.
+MAX_CANDIDATES = 10_000
+
+#: The number of changed objects kept aside before they are merged into the index.
+MAX_CHANGES = 1000
+
+#: The lookups answered by the index.
+SEARCH_LOOKUPS = ("icontains", "istartswith")
+
+#: Separates the texts in the joined string, it is removed from the texts.
+SEPARATOR = "\n"
+
+
+def normalize(text: Optional[str]) -> str:
+    """Get the indexed form of the text."""
+    return (text or "").lower().replace(SEPARATOR, " ")
+
+
+class JoinedTexts:
+    """The texts of a field joined into a single string."""
+
+    def __init__(self, pks: Iterable[int], texts: Iterable[str]):
+        """Join the normalised texts of the objects with the primary keys."""
+        self.pks = array("q", pks)
+        self.starts = array("q")
+        offset = 0
+        parts = []
+        for text in texts:
+            # Every text is preceded by the separator.
+            offset += 1
+            self.starts.append(offset)
+            offset += len(text)
+            parts.append(text)
+        self.joined = "".join(SEPARATOR + text for text in parts)
+
+    def items(self) -> Iterable[tuple[int, str]]:
+        """Get the (primary key, text) pairs."""
+        return zip(self.pks, self.joined.split(SEPARATOR)[1:], strict=True)
+
+    def search(self, term: str, prefix: bool, limit: int) -> Optional[set[int]]:
+        """Get the primary keys of the texts containing or starting with the term.
+
+        Return None when there are more than ``limit`` matches.
+        """
+        if prefix:
+            # The separator preceding the text is matched too.
+            term = SEPARATOR + term
+        found = set()
+        position = self.joined.find(term)
+        while position != -1:
+            i = bisect_right(self.starts, position + prefix) - 1
+            found.add(self.pks[i])
+            if len(found) > limit:
+                return None
+            if i + 1 == len(self.starts):
+                break
+            position = self.joined.find(term, self.starts[i + 1] - 1)
+        return found
+
+
+class SubstringIndex:
+    """In-process substring index of the text fields of a model.
+
+    The changed objects are kept aside until there are too many of them, so the
+    joined texts do not have to be rebuilt on every change.
+    """
+
+    def __init__(self, model: type[models.Model], fields: Iterable[str]):
+        """Create an empty index, it is built on the first search."""
+        self.model = model
+        self.fields = tuple(fields)
+        self.joined: dict[str, JoinedTexts] = {}
+        # The texts of the changed objects, None for the deleted ones.
+        self.changed: dict[int, Optional[dict[str, str]]] = {}
+        self.built: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        """Read all the texts from the database and index them."""
+        rows = list(self.model._default_manager.values_list("pk", *self.fields))
+        pks = [row[0] for row in rows]
+        self.joined = {
+            field: JoinedTexts(pks, (normalize(row[i]) for row in rows))
+            for i, field in enumerate(self.fields, 1)
+        }
+        self.changed = {}
+        self.built = time.monotonic()
+
+    def merge(self):
+        """Merge the changed objects into the joined texts."""
+        for field in self.fields:
+            texts = dict(self.joined[field].items())
+            for pk, changed in self.changed.items():
+                if changed is None:
+                    texts.pop(pk, None)
+                else:
+                    texts[pk] = changed[field]
+            self.joined[field] = JoinedTexts(texts.keys(), texts.values())
+        self.changed = {}
+
+    def update(self, instance: models.Model):
+        """Index the new texts of the saved object."""
+        self.change(
+            instance.pk,
+            {field: normalize(getattr(instance, field)) for field in self.fields},
+        )
+
+    def delete(self, pk: int):
+        """Remove the deleted object from the index."""
+        self.change(pk, None)
+
+    def change(self, pk: int, texts: Optional[dict[str, str]]):
+        """Keep the changed texts of the object aside."""
+        with self.lock:
+            if self.built is None:
+                return
+            self.changed[pk] = texts
+            if len(self.changed) > MAX_CHANGES:
+                self.merge()
+
+    def search(
+        self, field: str, term: str, lookup: str = "icontains", limit: int = 0
+    ) -> Optional[set[int]]:
+        """Get the primary keys of the objects whose field contains the term.
+
+        Return None when more than ``limit`` objects match (no limit by default).
+
+        :param lookup: ``icontains`` or ``istartswith``.
+        """
+        prefix = lookup == "istartswith"
+        term = term.lower()
+        if SEPARATOR in term:
+            return set()
+        with self.lock:
+            ttl = getattr(settings, "RESERVATIONS_SEARCH_TTL", 5 * 60)
+            if self.built is None or time.monotonic() - self.built > ttl:
+                self.build()
+            found = self.joined[field].search(
+                term, prefix, (limit or len(self.joined[field].pks)) + len(self.changed)
+            )
+            if found is None:
+                return None
+            for pk, changed in self.changed.items():
+                text = changed[field] if changed is not None else None
+                if text is not None and (
+                    text.startswith(term) if prefix else term in text
+                ):
+                    found.add(pk)
+                else:
+                    found.discard(pk)
+        return found if not limit or len(found) <= limit else None
+
+
+#: The in-process indexes by the model label.
+INDEXES: dict[str, SubstringIndex] = {}
+
+
+def get_index(model: type[models.Model]) -> Optional[SubstringIndex]:
+    """Get the in-process index of the model if it has one."""
+    label = model._meta.label
+    if label not in SEARCH_FIELDS:
+        return None
+    if label not in INDEXES:
+        INDEXES.setdefault(label, SubstringIndex(model, SEARCH_FIELDS[label]))
+    return INDEXES[label]
+
+
+def find(
+    model: type[models.Model],
+    fields: Iterable[str],
+    term: str,
+    lookup: str = "icontains",
+) -> Optional[set[int]]:
+    """Get the primary keys of the objects with the term in any of the fields.
+
+    Return None when the search should be performed by the database: on PostgreSQL,
+    for the fields without the index, for the empty terms and when too many objects
+    match.
+    """
+    index = get_index(model)
+    fields = list(fields)
+    if (
+        connection.vendor == "postgresql"
+        or index is None
+        or not term
+        or lookup not in SEARCH_LOOKUPS
+        or not set(fields) <= set(index.fields)
+    ):
+        return None
+    found = set()
+    for field in fields:
+        matches = index.search(field, term, lookup, MAX_CANDIDATES)
+        if matches is None:
+            return None
+        found |= matches
+        if len(found) > MAX_CANDIDATES:
+            return None
+    return found
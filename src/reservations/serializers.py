@@ -1,47 +1,158 @@
-"""Serializers for REST."""
+"""Serializers for REST.
+
+Serializers with nested or related fields define the ``setup_eager_loading`` static
+method, which adds the prefetches the serializer needs to the given queryset. The
+serializers of the endpoints add their time to the measurements of
+:mod:`reservations.metrics`.
+"""
+
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
+from reservations.metrics import MeasuredSerializerMixin
 from reservations.models import (
     NResources,
+    Occurrence,
     Reservable,
     ReservableSet,
     Reservation,
+    ReservationSeries,
     Resource,
 )
 
 
-class ResourceSerializer(serializers.HyperlinkedModelSerializer):
+def parse_requirements(value: str) -> dict[str, int]:
+    """Parse the comma separated ``slug:n`` pairs into the numbers by the slug.
+
+    The number defaults to one when omitted.
+
+    :raises ValidationError: if a number is not an integer.
+    """
+    requirements = {}
+    for requirement in filter(None, value.split(",")):
+        slug, _sep, n = requirement.strip().partition(":")
+        try:
+            requirements[slug] = int(n or 1)
+        except ValueError as error:
+            raise serializers.ValidationError(
+                _("Invalid resource requirement: {}.").format(requirement)
+            ) from error
+    return requirements
+
+
+class ResourceSerializer(
+    MeasuredSerializerMixin, serializers.HyperlinkedModelSerializer
+):
     class Meta:
         model = Resource
-        fields = "__all__"
+        exclude = ("sequence",)
 
 
-class ReservableNResourcesSerializer(serializers.ModelSerializer):
+class ReservableNResourcesSerializer(
+    MeasuredSerializerMixin, serializers.ModelSerializer
+):
     resource = ResourceSerializer()
 
     class Meta:
         model = NResources
         fields = ("id", "resource", "n", "url")
 
+    @staticmethod
+    def setup_eager_loading(queryset: models.QuerySet) -> models.QuerySet:
+        """Load the nested resources along with the queryset."""
+        return queryset.select_related("resource")
+
 
-class ReservableSerializer(serializers.HyperlinkedModelSerializer):
+class ReservableSerializer(
+    MeasuredSerializerMixin, serializers.HyperlinkedModelSerializer
+):
     nresources_set = ReservableNResourcesSerializer(many=True, read_only=True)
 
     class Meta:
         model = Reservable
         fields = ("id", "slug", "type", "name", "nresources_set", "url")
 
+    @staticmethod
+    def setup_eager_loading(queryset: models.QuerySet) -> models.QuerySet:
+        """Prefetch the nested nresources with their resources."""
+        return queryset.prefetch_related(
+            models.Prefetch(
+                "nresources_set",
+                queryset=ReservableNResourcesSerializer.setup_eager_loading(
+                    NResources.objects.all()
+                ),
+            )
+        )
 
-class ReservableSetSerializer(serializers.HyperlinkedModelSerializer):
+
+class ReservableSetSerializer(
+    MeasuredSerializerMixin, serializers.HyperlinkedModelSerializer
+):
     class Meta:
         model = ReservableSet
         fields = ("name", "slug", "reservables", "url")
 
+    @staticmethod
+    def setup_eager_loading(queryset: models.QuerySet) -> models.QuerySet:
+        """Prefetch the primary keys of the reservables in the sets."""
+        return queryset.prefetch_related(
+            models.Prefetch("reservables", queryset=Reservable.objects.only("pk"))
+        )
+
 
-class ReservationSerializer(serializers.HyperlinkedModelSerializer):
+class ReservationSerializer(
+    MeasuredSerializerMixin, serializers.HyperlinkedModelSerializer
+):
     """Serializer for the Reservation model."""
 
+    # There is no user endpoint to link to.
+    owners = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=get_user_model().objects.all()
+    )
+
+    # Declared explicitly since the fields with the custom through model are read-only
+    # by default.
+    reservables = serializers.HyperlinkedRelatedField(
+        many=True, view_name="reservable-detail", queryset=Reservable.objects.all()
+    )
+
+    class Meta:
+        model = Reservation
+        fields = [
+            "reason",
+            "start",
+            "end",
+            "owners",
+            "reservables",
+            "requirements",
+            "id",
+            "url",
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset: models.QuerySet) -> models.QuerySet:
+        """Prefetch the primary keys of the related objects."""
+        return queryset.prefetch_related(
+            models.Prefetch("owners", queryset=get_user_model().objects.only("pk")),
+            models.Prefetch("reservables", queryset=Reservable.objects.only("pk")),
+            models.Prefetch("requirements", queryset=Resource.objects.only("pk")),
+        )
+
+
+class FlatReservationSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """Read-only serializer for the Reservation model using primary keys.
+
+    It avoids reversing the URLs of the related objects, which dominates the
+    serialization time of long reservation lists.
+    """
+
+    reservables = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
     class Meta:
         model = Reservation
         fields = [
@@ -52,5 +163,198 @@ class ReservationSerializer(serializers.HyperlinkedModelSerializer):
             "reservables",
             "requirements",
             "id",
+        ]
+        read_only_fields = fields
+
+    setup_eager_loading = ReservationSerializer.setup_eager_loading
+
+
+class ReservationSeriesSerializer(
+    MeasuredSerializerMixin, serializers.HyperlinkedModelSerializer
+):
+    """Serializer for the ReservationSeries model."""
+
+    # There is no user endpoint to link to.
+    owners = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=get_user_model().objects.all()
+    )
+
+    class Meta:
+        model = ReservationSeries
+        fields = [
+            "reason",
+            "start",
+            "end",
+            "frequency",
+            "interval",
+            "until",
+            "exceptions",
+            "owners",
+            "reservables",
+            "id",
             "url",
         ]
+
+    @staticmethod
+    def setup_eager_loading(queryset: models.QuerySet) -> models.QuerySet:
+        """Prefetch the primary keys of the related objects."""
+        return queryset.prefetch_related(
+            models.Prefetch("owners", queryset=get_user_model().objects.only("pk")),
+            models.Prefetch("reservables", queryset=Reservable.objects.only("pk")),
+        )
+
+    def validate_exceptions(self, value):
+        """Make sure the exceptions are a list of ISO formatted dates."""
+        if not isinstance(value, list):
+            raise serializers.ValidationError(_("Expected a list of dates."))
+        try:
+            return sorted({date.fromisoformat(day).isoformat() for day in value})
+        except (TypeError, ValueError) as error:
+            raise serializers.ValidationError(_("Expected a list of dates.")) from error
+
+    def validate(self, data):
+        """Make sure the occurrences are ordered and do not overlap each other."""
+        start = data.get("start", getattr(self.instance, "start", None))
+        end = data.get("end", getattr(self.instance, "end", None))
+        until = data.get("until", getattr(self.instance, "until", None))
+        frequency = data.get("frequency", getattr(self.instance, "frequency", None))
+        interval = data.get("interval", getattr(self.instance, "interval", 1))
+        if start >= end:
+            raise serializers.ValidationError(_("The start must be before the end."))
+        if until <= start:
+            raise serializers.ValidationError(
+                _("The series must end after the first occurrence.")
+            )
+        days = interval * (7 if frequency == ReservationSeries.WEEKLY else 1)
+        if end - start > timedelta(days=days):
+            raise serializers.ValidationError(
+                _("The occurrences must not overlap each other.")
+            )
+        return data
+
+
+class SeriesOccurrenceSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """Serializer for an occurrence of a reservation series."""
+
+    series = serializers.IntegerField(source="series.pk")
+    reason = serializers.CharField(source="series.reason")
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    owners = serializers.SerializerMethodField()
+    reservables = serializers.SerializerMethodField()
+
+    setup_eager_loading = ReservationSeriesSerializer.setup_eager_loading
+
+    def get_owners(self, occurrence) -> list[int]:
+        """Get the primary keys of the owners of the series."""
+        return [owner.pk for owner in occurrence.series.owners.all()]
+
+    def get_reservables(self, occurrence) -> list[int]:
+        """Get the primary keys of the reservables of the series."""
+        return [reservable.pk for reservable in occurrence.series.reservables.all()]
+
+
+def serialize_entries(serializer_class: type, entries: list, context: dict) -> list:
+    """Serialize the reservations and the series occurrences keeping their order.
+
+    :param serializer_class: the serializer of the reservations.
+    """
+    reservations = serializer_class(
+        [entry for entry in entries if not isinstance(entry, Occurrence)],
+        many=True,
+        context=context,
+    ).data
+    occurrences = SeriesOccurrenceSerializer(
+        [entry for entry in entries if isinstance(entry, Occurrence)], many=True
+    ).data
+    serialized = {False: iter(reservations), True: iter(occurrences)}
+    return [next(serialized[isinstance(entry, Occurrence)]) for entry in entries]
+
+
+class BulkReservationSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """Serializer for a reservation in the bulk creation request.
+
+    The related objects are given by their primary keys and the requirements as the
+    mapping of resource slugs to the required amounts. They are resolved for the
+    whole batch at once.
+    """
+
+    reason = serializers.CharField(max_length=255)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    owners = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    reservables = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False
+    )
+    requirements = serializers.DictField(
+        child=serializers.IntegerField(min_value=1), required=False, default=dict
+    )
+
+    def validate(self, data):
+        """Make sure the reservation starts before it ends."""
+        if data["start"] >= data["end"]:
+            raise serializers.ValidationError(_("The start must be before the end."))
+        return data
+
+
+class AvailabilityWindowSerializer(serializers.Serializer):
+    """The time window of the availability query."""
+
+    #: The longest window availability can be computed for.
+    MAX_WINDOW = timedelta(days=366)
+
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+    def validate(self, data):
+        """Make sure the window is not empty and not too long."""
+        if data["start"] >= data["end"]:
+            raise serializers.ValidationError(_("The start must be before the end."))
+        if data["end"] - data["start"] > self.MAX_WINDOW:
+            raise serializers.ValidationError(_("The time window is too long."))
+        return data
+
+
+class UtilisationQuerySerializer(AvailabilityWindowSerializer):
+    """The query for the utilisation heat map."""
+
+    #: How the reservables are grouped into the rows.
+    group = serializers.ChoiceField(
+        choices=["reservable", "set", "type"], default="reservable"
+    )
+
+    #: The length of the buckets.
+    resolution = serializers.ChoiceField(choices=["hour", "day"], default="hour")
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """The query for the reservation change feed."""
+
+    #: The token returned by the previous query.
+    since = serializers.IntegerField(min_value=0, required=False)
+
+
+class SlotQuerySerializer(AvailabilityWindowSerializer):
+    """The query for the earliest available slots."""
+
+    #: The duration of the slot.
+    duration = serializers.DurationField(min_value=timedelta(minutes=1))
+
+    #: The required resources as comma separated ``slug:n`` pairs.
+    resources = serializers.CharField(required=False, default="")
+
+    #: The maximal number of slots returned.
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate_resources(self, value: str) -> dict[str, int]:
+        """Parse the required resources."""
+        return parse_requirements(value)
+
+    def validate(self, data):
+        """Make sure the slot fits into the window."""
+        data = super().validate(data)
+        if data["duration"] > data["end"] - data["start"]:
+            raise serializers.ValidationError(
+                _("The duration is longer than the time window.")
+            )
+        return data
@@ -0,0 +1,69 @@
+"""Guardian shortcuts keeping the reservable permission map up to date.
+
+The signal handlers refresh the map when a single object permission is saved or
+deleted. Guardian assigns the permissions on a queryset or a list of objects and to a
+list of users or groups with bulk creates, which send no signals, so such
+permissions must be assigned with these shortcuts, or the map must be refreshed
+afterwards with the ``refresh_permission_map`` command.
+"""
+
+from typing import Optional
+
+from guardian import shortcuts
+from guardian.utils import get_identity
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+
+from reservations.models import Reservable, ReservablePermission
+
+
+def changed_reservables(obj) -> Optional[list[int]]:
+    """Get the primary keys of the reservables, None for the other objects."""
+    if obj is None:
+        return None
+    if isinstance(obj, models.QuerySet):
+        if obj.model is not Reservable:
+            return None
+        return list(obj.values_list("pk", flat=True))
+    objects = obj if isinstance(obj, (list, tuple)) else [obj]
+    if not all(isinstance(instance, Reservable) for instance in objects):
+        return None
+    return [instance.pk for instance in objects]
+
+
+def changed_users(user_or_group) -> list[int]:
+    """Get the primary keys of the users or the members of the groups."""
+    users, groups = get_identity(user_or_group)
+    if users is not None:
+        if isinstance(users, models.QuerySet):
+            return list(users.values_list("pk", flat=True))
+        users = users if isinstance(users, list) else [users]
+        return [user.pk for user in users]
+    if not isinstance(groups, (list, models.QuerySet)):
+        groups = [groups]
+    members = get_user_model().objects.filter(groups__in=groups).distinct()
+    return list(members.values_list("pk", flat=True))
+
+
+def refresh(user_or_group, obj):
+    """Refresh the map of the users or the groups on the reservables."""
+    reservables = changed_reservables(obj)
+    if reservables is not None:
+        ReservablePermission.objects.refresh(changed_users(user_or_group), reservables)
+
+
+def assign_perm(perm, user_or_group, obj=None):
+    """Assign the permission with guardian and refresh the map."""
+    with transaction.atomic():
+        assigned = shortcuts.assign_perm(perm, user_or_group, obj)
+        refresh(user_or_group, obj)
+    return assigned
+
+
+def remove_perm(perm, user_or_group=None, obj=None):
+    """Remove the permission with guardian and refresh the map."""
+    with transaction.atomic():
+        removed = shortcuts.remove_perm(perm, user_or_group, obj)
+        refresh(user_or_group, obj)
+    return removed
@@ -0,0 +1,304 @@
+"""Signal handlers for the reservations application."""
+
+from guardian.utils import get_group_obj_perms_model, get_user_obj_perms_model
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from reservations import analytics
+from reservations.models import (
+    ChangeSequence,
+    NRequirements,
+    NResources,
+    Reservable,
+    ReservablePermission,
+    ReservableSet,
+    Reservation,
+    ReservationReservable,
+    ReservationSeries,
+    Resource,
+)
+from reservations.search import get_index
+
+
+@receiver(m2m_changed, sender=ReservationReservable)
+def copy_reservation_interval(sender, instance, action, reverse, pk_set, **kwargs):
+    """Copy the reservation interval to the newly added reservation reservables.
+
+    Rows created by the related managers (add, set) are created without the interval.
+    """
+    if action != "post_add" or not pk_set:
+        return
+    if not reverse:
+        ReservationReservable.objects.filter(
+            reservation=instance, reservable__in=pk_set
+        ).update(start=instance.start, end=instance.end)
+    else:
+        reservations = Reservation.objects.filter(pk=OuterRef("reservation_id"))
+        ReservationReservable.objects.filter(
+            reservable=instance, reservation__in=pk_set
+        ).update(
+            start=Subquery(reservations.values("start")[:1]),
+            end=Subquery(reservations.values("end")[:1]),
+        )
+
+
+@receiver(m2m_changed, sender=ReservationReservable)
+@receiver(m2m_changed, sender=Reservation.owners.through)
+def reservation_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Move the reservations with changed reservables or owners in the change feed.
+
+    The reverse clear is handled before the relations are removed, while the cleared
+    reservations can still be found.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if action != "pre_clear" and not pk_set:
+        return
+    if not reverse:
+        reservations = Reservation.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        relation = "reservables" if sender is ReservationReservable else "owners"
+        reservations = Reservation.objects.filter(**{relation: instance})
+    else:
+        reservations = Reservation.objects.filter(pk__in=pk_set)
+    reservations.update(sequence=ChangeSequence.next())
+
+
+@receiver(m2m_changed, sender=ReservationSeries.reservables.through)
+@receiver(m2m_changed, sender=ReservationSeries.owners.through)
+def series_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Move the series with changed reservables or owners in the change feed."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if action != "pre_clear" and not pk_set:
+        return
+    if not reverse:
+        series = ReservationSeries.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        relation = (
+            "reservables"
+            if sender is ReservationSeries.reservables.through
+            else "owners"
+        )
+        series = ReservationSeries.objects.filter(**{relation: instance})
+    else:
+        series = ReservationSeries.objects.filter(pk__in=pk_set)
+    series.update(sequence=ChangeSequence.next())
+
+
+@receiver(pre_delete, sender=Reservable)
+@receiver(pre_delete, sender=get_user_model())
+def relation_deleting(sender, instance, **kwargs):
+    """Move the reservations and the series losing the deleted reservable or owner
+    in the change feed.
+
+    The deletion cascades to the relations without the m2m_changed signals.
+    """
+    relation = "reservables" if sender is Reservable else "owners"
+    sequence = ChangeSequence.next()
+    Reservation.objects.filter(**{relation: instance}).update(sequence=sequence)
+    ReservationSeries.objects.filter(**{relation: instance}).update(sequence=sequence)
+
+
+@receiver(post_save, sender=NRequirements)
+@receiver(post_delete, sender=NRequirements)
+def requirements_changed(sender, instance, **kwargs):
+    """Move the reservation with changed requirements in the change feed."""
+    with transaction.atomic():
+        Reservation.objects.filter(pk=instance.reservation_id).update(
+            sequence=ChangeSequence.next()
+        )
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Reservable)
+@receiver(post_save, sender=ReservableSet)
+def catalog_object_saved(sender, instance, **kwargs):
+    """Move the saved catalog object in the catalog changes."""
+    sequence = ChangeSequence.next(ChangeSequence.CATALOG)
+    sender.objects.filter(pk=instance.pk).update(sequence=sequence)
+    if sender is Resource:
+        # The reservables include their resources.
+        Reservable.objects.filter(nresources__resource=instance).update(
+            sequence=sequence
+        )
+
+
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=ReservableSet)
+def catalog_object_deleted(sender, instance, **kwargs):
+    """Record the deletion time in the catalog changes."""
+    ChangeSequence.next(ChangeSequence.CATALOG)
+
+
+@receiver(pre_delete, sender=Reservable)
+def reservable_deleted(sender, instance, **kwargs):
+    """Move the sets losing the deleted reservable in the catalog changes."""
+    ReservableSet.objects.filter(reservables=instance).update(
+        sequence=ChangeSequence.next(ChangeSequence.CATALOG)
+    )
+
+
+@receiver(post_save, sender=NResources)
+@receiver(post_delete, sender=NResources)
+def nresources_changed(sender, instance, **kwargs):
+    """Move the reservable with changed resources in the catalog changes."""
+    Reservable.objects.filter(pk=instance.reservable_id).update(
+        sequence=ChangeSequence.next(ChangeSequence.CATALOG)
+    )
+
+
+@receiver(m2m_changed, sender=ReservableSet.reservables.through)
+def reservable_set_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Move the sets with changed reservables in the catalog changes."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if action != "pre_clear" and not pk_set:
+        return
+    if not reverse:
+        reservable_sets = ReservableSet.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        reservable_sets = ReservableSet.objects.filter(reservables=instance)
+    else:
+        reservable_sets = ReservableSet.objects.filter(pk__in=pk_set)
+    reservable_sets.update(sequence=ChangeSequence.next(ChangeSequence.CATALOG))
+
+
+def is_reservable_permission(permission) -> bool:
+    """Is the guardian object permission on a reservable."""
+    return permission.content_type_id == (
+        ContentType.objects.get_for_model(Reservable).pk
+    )
+
+
+@receiver(post_save, sender=get_user_obj_perms_model())
+@receiver(post_delete, sender=get_user_obj_perms_model())
+def user_permission_changed(sender, instance, **kwargs):
+    """Refresh the permission map of the user on the reservable."""
+    if is_reservable_permission(instance):
+        ReservablePermission.objects.refresh(
+            [instance.user_id], [int(instance.object_pk)]
+        )
+
+
+@receiver(post_save, sender=get_group_obj_perms_model())
+@receiver(post_delete, sender=get_group_obj_perms_model())
+def group_permission_changed(sender, instance, **kwargs):
+    """Refresh the permission map of the group members on the reservable."""
+    if is_reservable_permission(instance):
+        ReservablePermission.objects.refresh(
+            get_user_model().objects.filter(groups=instance.group_id),
+            [int(instance.object_pk)],
+        )
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the permission map of the users joining or leaving the groups.
+
+    The members of a cleared group are only known before it is cleared.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            ReservablePermission.objects.refresh([instance.pk])
+    elif action == "pre_clear":
+        instance._reservations_members = list(
+            instance.user_set.values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        ReservablePermission.objects.refresh(instance._reservations_members)
+    elif action in ("post_add", "post_remove"):
+        ReservablePermission.objects.refresh(pk_set)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    """Remember the members of the deleted group."""
+    instance._reservations_members = list(
+        instance.user_set.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """Refresh the permission map of the members of the deleted group."""
+    ReservablePermission.objects.refresh(instance._reservations_members)
+
+
+@receiver(post_save, sender=Reservable)
+@receiver(post_save, sender=get_user_model())
+def index_saved_object(sender, instance, **kwargs):
+    """Update the in-process search index once the object is committed."""
+    index = get_index(sender)
+    transaction.on_commit(lambda: index.update(instance))
+
+
+@receiver(post_delete, sender=Reservable)
+@receiver(post_delete, sender=get_user_model())
+def unindex_deleted_object(sender, instance, **kwargs):
+    """Remove the object from the in-process search index once it is committed."""
+    index, pk = get_index(sender), instance.pk
+    transaction.on_commit(lambda: index.delete(pk))
+
+
+@receiver(m2m_changed, sender=ReservationReservable)
+def occupancy_added(sender, instance, action, reverse, pk_set, **kwargs):
+    """Add the reserved time of the added reservation reservables to the rollups.
+
+    The removed rows are subtracted by the queryset deleting them, see
+    :class:`~reservations.models.ReservationReservableQuerySet`. The occurrences of
+    the series are not rolled up, :func:`~reservations.analytics.utilisation`
+    expands them when the heat map is read.
+    """
+    if action != "post_add" or not pk_set:
+        return
+    if not reverse:
+        intervals = [(pk, instance.start, instance.end) for pk in pk_set]
+    else:
+        intervals = [
+            (instance.pk, start, end)
+            for start, end in Reservation.objects.filter(pk__in=pk_set).values_list(
+                "start", "end"
+            )
+        ]
+    analytics.apply_intervals(intervals)
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_saving(sender, instance, **kwargs):
+    """Remember the copied intervals of the reservation before it is saved."""
+    if instance.pk is not None:
+        instance._reservations_intervals = list(
+            ReservationReservable.objects.filter(reservation=instance).values_list(
+                "reservable", "start", "end"
+            )
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    """Move the reserved time of the reservation with the changed interval."""
+    intervals = instance.__dict__.pop("_reservations_intervals", None)
+    changed = [
+        interval
+        for interval in intervals or ()
+        if interval[1:] != (instance.start, instance.end)
+    ]
+    if changed:
+        analytics.apply_intervals(changed, -1)
+        analytics.apply_intervals(
+            (reservable_id, instance.start, instance.end)
+            for reservable_id, _start, _end in changed
+        )
@@ -1,3 +1,2024 @@
-from django.test import TestCase
+import csv
+import io
+import base64
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock, skipIf
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from guardian.shortcuts import assign_perm, remove_perm
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.test import APIClient, APITestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    close_old_connections,
+    connection,
+)
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from reservations import analytics, metrics, search, shortcuts
+from reservations.archive import archive
+from reservations.asyncviews import AsyncReadView
+from reservations.benchmarks import percentile, regressions
+from reservations.imports import Importer, read_csv, read_ics, read_jsonl
+from reservations.models import (
+    ArchivedReservation,
+    ChangeSequence,
+    NRequirements,
+    NResources,
+    Occupancy,
+    Reservable,
+    ReservablePermission,
+    ReservableSet,
+    Reservation,
+    ReservationReservable,
+    ReservationSeries,
+    ReservationTombstone,
+    Resource,
+    missing_resources,
+)
+from reservations.pagination import KeysetPagination
+from reservations.permissions import ReservationPermission
+from reservations.renderers import ReservationCSVRenderer, fold
+
+try:
+    from reservations import ul_groupname
+except ImportError:
+    ul_groupname = None
+
+
+def hours(n: int) -> datetime:
+    """Return the datetime n hours after the fixed origin."""
+    return datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=n)
+
+
+class OverlappingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        cls.reservation = Reservation.objects.create(
+            reason="lecture", start=hours(10), end=hours(12)
+        )
+        cls.reservation.reservables.add(cls.room1, cls.room2)
+
+    def test_interval_copied(self):
+        self.assertFalse(
+            ReservationReservable.objects.filter(start__isnull=True).exists()
+        )
+        self.room1.reservations.add(
+            Reservation.objects.create(reason="exam", start=hours(1), end=hours(2))
+        )
+        self.assertFalse(
+            ReservationReservable.objects.filter(start__isnull=True).exists()
+        )
+
+    def test_overlapping(self):
+        overlapping = Reservation.objects.overlapping
+        rooms = Reservable.objects.all()
+        self.assertEqual(
+            list(overlapping(hours(11), hours(13), rooms)), [self.reservation]
+        )
+        self.assertTrue(overlapping(hours(9), hours(11), [self.room2]).exists())
+        self.assertFalse(overlapping(hours(12), hours(13), rooms).exists())
+        self.assertFalse(overlapping(hours(8), hours(10), rooms).exists())
+        self.assertFalse(overlapping(hours(10), hours(12), []).exists())
+
+    def test_interval_updated(self):
+        self.reservation.start, self.reservation.end = hours(20), hours(21)
+        self.reservation.save()
+        self.assertFalse(self.reservation.overlapping_reservations().exists())
+        self.assertTrue(
+            Reservation.objects.overlapping(hours(20), hours(22), [self.room1]).exists()
+        )
+
+
+class ReservationPermissionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        group = Group.objects.create(name="staff")
+        cls.user.groups.add(group)
+        cls.rooms = Reservable.objects.bulk_create(
+            Reservable(slug=f"room{i}", type="room", name=str(i)) for i in range(30)
+        )
+        for room in cls.rooms:
+            assign_perm("reserve", cls.user, room)
+            assign_perm("double_reserve", group, room)
+        reservation = Reservation.objects.create(
+            reason="lecture", start=hours(0), end=hours(2)
+        )
+        reservation.reservables.set(cls.rooms)
+
+    def count_queries(self, reservables) -> int:
+        data = {"reservables": reservables, "start": hours(1), "end": hours(3)}
+        with CaptureQueriesContext(connection) as context:
+            ReservationPermission().can_create_update(data, self.user)
+        return len(context.captured_queries)
+
+    def test_constant_queries(self):
+        self.assertEqual(
+            self.count_queries(self.rooms[:2]), self.count_queries(self.rooms)
+        )
+
+    def test_denied(self):
+        room = Reservable.objects.create(slug="other", type="room", name="other")
+        with self.assertRaises(PermissionDenied):
+            self.count_queries([self.rooms[0], room])
+
+
+class PermissionMapTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        cls.group = Group.objects.create(name="staff")
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+
+    def permitted(self, codename: str = "reserve") -> list[Reservable]:
+        user = get_user_model().objects.get(pk=self.user.pk)
+        return list(Reservable.objects.permitted(user, codename).order_by("pk"))
+
+    def test_user_permissions(self):
+        assign_perm("reserve", self.user, self.room1)
+        self.assertEqual(self.permitted(), [self.room1])
+        self.assertEqual(self.permitted("manage_reservations"), [])
+        remove_perm("reserve", self.user, self.room1)
+        self.assertEqual(self.permitted(), [])
+
+    def test_group_permissions(self):
+        assign_perm("reserve", self.group, self.room2)
+        self.assertEqual(self.permitted(), [])
+        self.user.groups.add(self.group)
+        self.assertEqual(self.permitted(), [self.room2])
+        self.group.user_set.clear()
+        self.assertEqual(self.permitted(), [])
+        self.group.user_set.add(self.user)
+        self.assertEqual(self.permitted(), [self.room2])
+        self.group.delete()
+        self.assertEqual(self.permitted(), [])
+
+    def test_global_permissions(self):
+        self.user.user_permissions.add(Permission.objects.get(codename="reserve"))
+        self.assertEqual(self.permitted(), [self.room1, self.room2])
+
+    def test_refresh(self):
+        assign_perm("reserve", self.user, self.room1)
+        ReservablePermission.objects.all().delete()
+        ReservablePermission.objects.refresh()
+        self.assertEqual(self.permitted(), [self.room1])
+
+    def test_bulk_assign(self):
+        other = get_user_model().objects.create_user("other")
+        shortcuts.assign_perm("reserve", self.user, Reservable.objects.all())
+        self.assertEqual(self.permitted(), [self.room1, self.room2])
+        shortcuts.assign_perm("manage_reservations", [self.user, other], self.room1)
+        self.assertEqual(self.permitted("manage_reservations"), [self.room1])
+        self.assertEqual(ReservablePermission.objects.filter(user=other).count(), 1)
+        self.user.groups.add(self.group)
+        shortcuts.assign_perm("double_reserve", self.group, [self.room2])
+        self.assertEqual(self.permitted("double_reserve"), [self.room2])
+        shortcuts.assign_perm("double_reserve", [self.group], self.room1)
+        self.assertEqual(self.permitted("double_reserve"), [self.room1, self.room2])
+
+    def test_bulk_remove(self):
+        shortcuts.assign_perm("reserve", self.user, Reservable.objects.all())
+        shortcuts.remove_perm("reserve", self.user, Reservable.objects.all())
+        self.assertEqual(self.permitted(), [])
+        shortcuts.assign_perm("reserve", self.group, Reservable.objects.all())
+        self.user.groups.add(self.group)
+        shortcuts.remove_perm(
+            "reserve", self.group, Reservable.objects.filter(pk=self.room1.pk)
+        )
+        self.assertEqual(self.permitted(), [self.room2])
+
+    def test_command(self):
+        # Guardian assigns the permissions on a queryset without signals.
+        assign_perm("reserve", self.user, Reservable.objects.all())
+        self.assertEqual(self.permitted(), [])
+        out = io.StringIO()
+        call_command("refresh_permission_map", "user", stdout=out)
+        self.assertEqual(self.permitted(), [self.room1, self.room2])
+        self.assertEqual(out.getvalue(), "The permission map has 2 entries.\n")
+
+
+class Directory:
+    """An LDAP directory of the groups of names, searched by their members."""
+
+    base_dn = "ou=groups,ou=FRI,dc=uni-lj,dc=si"
+    filterstr = "(objectClass=groupOfNames)"
+
+    def __init__(self, groups: dict[str, list[str]]):
+        self.groups = {
+            f"cn={name},{self.base_dn}": {"cn": [name], "member": members}
+            for name, members in groups.items()
+        }
+        self.searches = 0
+
+    def search_with_additional_term_string(self, filterstr: str):
+        members = set(re.findall(r"\(member=([^)]*)\)", filterstr))
+        return SimpleNamespace(execute=lambda connection: self.search(members))
+
+    def search(self, members: set[str]) -> list:
+        self.searches += 1
+        return [
+            (dn, attrs)
+            for dn, attrs in self.groups.items()
+            if members.intersection(attrs["member"])
+        ]
+
+
+@skipIf(ul_groupname is None, "django-auth-ldap is not installed.")
+class LDAPGroupsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_dn = "uid=student,ou=people,ou=FRI,dc=uni-lj,dc=si"
+        self.ldap_user = SimpleNamespace(dn=user_dn, connection=None)
+        self.directory = Directory(
+            {
+                "students": [user_dn],
+                "all": [f"cn=students,{Directory.base_dn}"],
+                "staff": ["uid=teacher,ou=people,ou=FRI,dc=uni-lj,dc=si"],
+            }
+        )
+
+    def test_user_groups(self):
+        group_type = ul_groupname.ULNestedGroupOfNamesType()
+        for searches in (3, 3):
+            groups = group_type.user_groups(self.ldap_user, self.directory)
+            self.assertEqual(self.directory.searches, searches)
+            self.assertEqual(
+                {group_type.group_name_from_info(info) for info in groups},
+                {"FRI_students", "FRI_all"},
+            )
+        self.assertEqual(groups[0][1], {"cn": ["students"]})
+        group_type = ul_groupname.ULNestedGroupOfNamesType(cache_timeout=0)
+        group_type.user_groups(self.ldap_user, self.directory)
+        self.assertEqual(self.directory.searches, 6)
+        self.assertIsNone(group_type.group_name_from_info(("cn=x,o=y", {"cn": ["x"]})))
+
+    def test_settings_import(self):
+        # The group type is created in the settings, before the apps are loaded.
+        code = (
+            "from django.conf import settings\n"
+            "settings.configure()\n"
+            "from reservations.ul_groupname import ULNestedGroupOfNamesType\n"
+            "ULNestedGroupOfNamesType()\n"
+        )
+        environment = {
+            key: value
+            for key, value in os.environ.items()
+            if key != "DJANGO_SETTINGS_MODULE"
+        }
+        environment["PYTHONPATH"] = os.pathsep.join(sys.path)
+        result = subprocess.run(
+            [sys.executable, "-c", code], env=environment, capture_output=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr.decode())
+
+    def test_mirror_groups(self):
+        user = get_user_model().objects.create_user("student")
+        room = Reservable.objects.create(slug="room", type="room", name="Room")
+        old = Group.objects.create(name="old")
+        Group.objects.create(name="FRI_students")
+        assign_perm("reserve", Group.objects.create(name="FRI_all"), room)
+        user.groups.add(old, Group.objects.get(name="FRI_students"))
+        with self.assertNumQueries(14):
+            self.assertTrue(
+                ul_groupname.mirror_groups(user, ["FRI_students", "FRI_all", None])
+            )
+        self.assertEqual(
+            set(user.groups.values_list("name", flat=True)),
+            {"FRI_students", "FRI_all"},
+        )
+        self.assertTrue(
+            ReservablePermission.objects.filter(user=user, reservable=room).exists()
+        )
+        self.assertTrue(ul_groupname.mirror_groups(user, ["FRI_new"]))
+        self.assertEqual(list(user.groups.values_list("name", flat=True)), ["FRI_new"])
+        self.assertFalse(ReservablePermission.objects.filter(user=user).exists())
+        self.assertFalse(ul_groupname.mirror_groups(user, ["FRI_new"]))
+
+
+class SearchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user("alice", "alice@example.com")
+        cls.bob = User.objects.create_user("bob", "bob@example.org", last_name="Alison")
+        cls.lab = Reservable.objects.create(slug="lab", type="room", name="Main lab")
+        cls.hall = Reservable.objects.create(slug="hall", type="room", name="Hall")
+        for owner, reservable in ((cls.alice, cls.lab), (cls.bob, cls.hall)):
+            reservation = Reservation.objects.create(
+                reason="lecture", start=hours(1), end=hours(2)
+            )
+            reservation.owners.add(owner)
+            reservation.reservables.add(reservable)
+
+    def setUp(self):
+        search.INDEXES.clear()
+
+    def test_find(self):
+        User = get_user_model()
+        fields = ["first_name", "last_name", "username", "email"]
+        self.assertEqual(search.find(User, fields, "ALI"), {self.alice.pk, self.bob.pk})
+        self.assertEqual(search.find(User, ["email"], "@example.o"), {self.bob.pk})
+        self.assertEqual(
+            search.find(User, ["username"], "b", "istartswith"), {self.bob.pk}
+        )
+        self.assertIsNone(search.find(User, ["password"], "ali"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.username = "carol"
+            self.alice.save()
+        self.assertEqual(search.find(User, ["username"], "ali"), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertEqual(search.find(User, fields, "ali"), {self.alice.pk})
+        # The changes are merged into the index.
+        with mock.patch.object(search, "MAX_CHANGES", 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.alice.first_name = "Alicia"
+                self.alice.save()
+        self.assertEqual(search.get_index(User).changed, {})
+        self.assertEqual(search.find(User, ["first_name"], "lici"), {self.alice.pk})
+        self.assertEqual(
+            search.find(User, ["username"], "car", "istartswith"), {self.alice.pk}
+        )
+
+    def test_rebuild(self):
+        search.find(Reservable, ["name"], "lab")
+        Reservable.objects.bulk_create(
+            [Reservable(slug="lab2", type="room", name="Lab")]
+        )
+        # The suggestions lag behind until the index is rebuilt, the filters do not.
+        self.assertEqual(len(search.find(Reservable, ["name"], "lab")), 1)
+        response = self.client.get("/api/reservables/", {"name__icontains": "lab"})
+        self.assertEqual(len(response.data), 2)
+        with override_settings(RESERVATIONS_SEARCH_TTL=0):
+            self.assertEqual(len(search.find(Reservable, ["name"], "lab")), 2)
+
+    def test_filters(self):
+        response = self.client.get(
+            "/api/reservations/", {"owners__email__icontains": "EXAMPLE.COM"}
+        )
+        self.assertEqual([r["owners"] for r in response.data], [[self.alice.pk]])
+        response = self.client.get(
+            "/api/reservations/", {"reservables__name__icontains": "all"}
+        )
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get("/api/reservables/", {"name__istartswith": "main"})
+        self.assertEqual([r["slug"] for r in response.data], ["lab"])
+
+
+class CatalogQueriesTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        resources = Resource.objects.bulk_create(
+            Resource(slug=f"resource{i}", type="equipment") for i in range(3)
+        )
+        rooms = Reservable.objects.bulk_create(
+            Reservable(slug=f"room{i}", type="room", name=str(i)) for i in range(10)
+        )
+        NResources.objects.bulk_create(
+            NResources(resource=resource, reservable=room, n=i)
+            for i, room in enumerate(rooms)
+            for resource in resources
+        )
+        reservable_set = ReservableSet.objects.create(name="Rooms", slug="rooms")
+        reservable_set.reservables.set(rooms)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reservables(self):
+        # The fingerprint and the last change are read first.
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/reservables/")
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[0]["nresources_set"]), 3)
+
+    def test_filtered_reservables(self):
+        # The fingerprint and the last change are read first.
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/sets/rooms/types/room/reservables/")
+        self.assertEqual(len(response.data), 10)
+        response = self.client.get("/api/sets/rooms/types/lab/reservables/")
+        self.assertEqual(len(response.data), 0)
+
+    def test_nresources(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/nresources/")
+        self.assertEqual(len(response.data), 30)
+
+    def test_sets(self):
+        # The fingerprint and the last change are read first.
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/sets/")
+        self.assertEqual(len(response.data[0]["reservables"]), 10)
+
+
+class ConditionalGetTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.projector = Resource.objects.create(slug="projector", type="equipment")
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        cls.nresources = NResources.objects.create(
+            resource=cls.projector, reservable=cls.room2, n=1
+        )
+        cls.rooms = ReservableSet.objects.create(name="Rooms", slug="rooms")
+        cls.rooms.reservables.set([cls.room1, cls.room2])
+
+    def etag(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response.headers)
+        return response.headers["ETag"]
+
+    def test_not_modified(self):
+        etag = self.etag("/api/reservables/")
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/reservables/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        response = self.client.get(
+            "/api/reservables/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_collection_changes(self):
+        urls = ["/api/reservables/", "/api/reservables/?slug=room1", "/api/sets/"]
+        etags = [self.etag(url) for url in urls]
+        self.nresources.n = 2
+        self.nresources.save()
+        self.assertEqual(
+            [self.etag(url) != etag for url, etag in zip(urls, etags, strict=True)],
+            [True, False, False],
+        )
+        etags = [self.etag(url) for url in urls]
+        self.room2.delete()
+        self.assertEqual(
+            [self.etag(url) != etag for url, etag in zip(urls, etags, strict=True)],
+            [True, False, True],
+        )
+
+    def test_detail_changes(self):
+        url = f"/api/resources/{self.projector.pk}/"
+        etag, room_etag = (
+            self.etag(url),
+            self.etag(f"/api/reservables/{self.room2.pk}/"),
+        )
+        self.projector.name = "Projector"
+        self.projector.save()
+        self.assertNotEqual(self.etag(url), etag)
+        self.assertNotEqual(self.etag(f"/api/reservables/{self.room2.pk}/"), room_etag)
+
+
+class CatalogCacheTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.projector = Resource.objects.create(slug="projector", type="equipment")
+        cls.room = Reservable.objects.create(slug="room", type="room", name="room")
+        cls.nresources = NResources.objects.create(
+            resource=cls.projector, reservable=cls.room, n=1
+        )
+        cls.rooms = ReservableSet.objects.create(name="Rooms", slug="rooms")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hit(self):
+        first = self.client.get("/api/reservables/?type=room&slug=room")
+        response = self.client.get("/api/nresources/")
+        # The fingerprint is read and the data is taken from the cache.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/nresources/").data, response.data)
+        # The normalised query strings are equal, the fingerprint is computed once.
+        with self.assertNumQueries(2):
+            second = self.client.get("/api/reservables/?slug=room&type=room")
+        self.assertEqual(first.data, second.data)
+
+    def test_invalidation(self):
+        response = self.client.get("/api/reservables/")
+        self.assertEqual(response.data[0]["nresources_set"][0]["n"], 1)
+        self.nresources.n = 2
+        self.nresources.save()
+        response = self.client.get("/api/reservables/")
+        self.assertEqual(response.data[0]["nresources_set"][0]["n"], 2)
+
+        self.assertEqual(self.client.get("/api/sets/").data[0]["reservables"], [])
+        self.rooms.reservables.add(self.room)
+        self.assertEqual(len(self.client.get("/api/sets/").data[0]["reservables"]), 1)
+
+    def serialized(self, path: str = "/api/resources/") -> bool:
+        """Get the resources and tell whether they were serialized."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(path)
+        return any(
+            query["sql"].startswith('SELECT "reservations_resource"."id"')
+            for query in context.captured_queries
+        )
+
+    def test_object_keys(self):
+        camera = Resource.objects.create(slug="camera", type="equipment")
+        paths = [
+            f"/api/resources/{self.projector.pk}/",
+            f"/api/resources/{camera.pk}/",
+            "/api/resources/?slug=projector",
+            "/api/resources/",
+        ]
+        self.assertEqual([self.serialized(path) for path in paths], [True] * 4)
+        camera.name = "Camera"
+        camera.save()
+        # Only the responses including the changed resource are outdated.
+        self.assertEqual(
+            [self.serialized(path) for path in paths], [False, True, False, True]
+        )
+        camera.delete()
+        del paths[1]
+        self.assertEqual(
+            [self.serialized(path) for path in paths], [False, False, True]
+        )
+
+    def test_users(self):
+        user = get_user_model().objects.create_user("user")
+        user.user_permissions.add(Permission.objects.get(codename="add_resource"))
+        self.assertTrue(self.serialized())
+        self.client.force_authenticate(user)
+        # The users share the cached data and their permissions are not read.
+        with self.assertNumQueries(2):
+            self.assertFalse(self.serialized())
+
+
+class ReservationListTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("user")
+        room = Reservable.objects.create(slug="room", type="room", name="room")
+        resource = Resource.objects.create(slug="projector", type="equipment")
+        for i in range(10):
+            reservation = Reservation.objects.create(
+                reason="lecture", start=hours(i), end=hours(i + 1)
+            )
+            reservation.owners.add(user)
+            reservation.reservables.add(room)
+            NRequirements.objects.create(
+                reservation=reservation, resource=resource, n=1
+            )
+
+    def test_hyperlinked(self):
+        # The archive horizon, the reservations, the three prefetches and the series.
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/reservations/")
+        self.assertEqual(len(response.data), 10)
+        self.assertTrue(response.data[0]["reservables"][0].startswith("http"))
+
+    def test_flat(self):
+        room = Reservable.objects.get()
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/reservations/?flat=true")
+        self.assertEqual(response.data[0]["reservables"], [room.pk])
+        self.assertNotIn("url", response.data[0])
+        response = self.client.get(
+            "/api/reservations/", HTTP_ACCEPT="application/json; flat=true"
+        )
+        self.assertEqual(response.data[0]["reservables"], [room.pk])
+
+    def test_keyset_pages(self):
+        # Reservations with equal start are ordered by the primary key.
+        Reservation.objects.create(reason="exam", start=hours(4), end=hours(5))
+        url, ids = "/api/reservations/?flat=true&page_size=3", []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            ids += [r["id"] for r in response.data["results"]]
+            url = response.data["next"]
+            # Insertions before the cursor do not shift the following pages.
+            Reservation.objects.create(reason="late", start=hours(-1), end=hours(0))
+        expected = Reservation.objects.exclude(reason="late").order_by("start", "pk")
+        self.assertEqual(ids, list(expected.values_list("pk", flat=True)))
+
+    def test_keyset_seek(self):
+        response = self.client.get("/api/reservations/?flat=true&page_size=3")
+        cursor = parse_qs(urlparse(response.data["next"]).query)["cursor"][0]
+        paginator = KeysetPagination()
+        paginator.fields = ("start", "id")
+        page = Reservation.objects.filter(
+            paginator.after(Reservation, cursor)
+        ).order_by("start", "id")
+        # Only the rows after the cursor are read.
+        self.assertEqual(page.count(), 7)
+        if connection.vendor == "sqlite":
+            # A single seek in the index order, without sorting the rows.
+            plan = page[:3].explain()
+            self.assertIn("USING INDEX reservations_keyset_idx (start>?)", plan)
+            self.assertNotIn("MULTI-INDEX OR", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_reservable_pages(self):
+        Reservable.objects.create(slug="hall", type="room", name="hall")
+        response = self.client.get("/api/reservables/", {"page_size": 1})
+        self.assertEqual(response.data["results"][0]["slug"], "hall")
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"][0]["slug"], "room")
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/reservations/", {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_csv_export(self):
+        Reservation.objects.filter(start=hours(0)).update(reason='a "quoted", reason')
+        with mock.patch.object(ReservationCSVRenderer, "chunk_size", 4):
+            # The archive horizon, the series, a query for the reservations and three
+            # prefetches for each chunk.
+            with self.assertNumQueries(12):
+                response = self.client.get(
+                    "/api/reservations/", {"format": "csv", "reservables__slug": "room"}
+                )
+                content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], list(ReservationCSVRenderer.header))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(
+            rows[1][1:],
+            [
+                'a "quoted", reason',
+                hours(0).isoformat(),
+                hours(1).isoformat(),
+                "room",
+                "user",
+                "projector:1",
+            ],
+        )
+
+    def test_series_export(self):
+        user = get_user_model().objects.get(username="user")
+        room = Reservable.objects.get(slug="room")
+        NResources.objects.create(reservable=room, resource=Resource.objects.get(), n=1)
+        series = ReservationSeries.objects.create(
+            reason="weekly", start=hours(2), end=hours(3), until=hours(24 * 21)
+        )
+        series.reservables.add(room)
+        series.owners.add(user)
+        query = {"format": "csv", "start__gte": hours(1).isoformat()}
+        response = self.client.get("/api/reservations/", query)
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 9 + 3)
+        self.assertEqual(
+            [(row["id"], row["start"]) for row in rows if row["reason"] == "weekly"],
+            [("", hours(hour).isoformat()) for hour in (2, 24 * 7 + 2, 24 * 14 + 2)],
+        )
+        response = self.client.get(
+            "/api/reservations/", {**query, "end__lte": hours(3).isoformat()}
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            [row["start"] for row in csv.DictReader(io.StringIO(content))],
+            [hours(1).isoformat(), hours(2).isoformat(), hours(2).isoformat()],
+        )
+        # The export is imported back.
+        importer = Importer(dry_run=True, allow_overlaps=True).run(
+            read_csv(io.StringIO(content))
+        )
+        self.assertEqual((importer.imported, importer.invalid), (3, 0))
+        response = self.client.get(
+            "/api/reservations/", {"format": "ics", "id": series.pk}
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        response = self.client.get(
+            "/api/reservations/", {"format": "ics", "reason": "weekly"}
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(f"UID:series-{series.pk}-20240108T020000Z@testserver", content)
+        self.assertEqual(content.count("BEGIN:VEVENT"), 3)
+
+    def test_series_list(self):
+        user = get_user_model().objects.get(username="user")
+        room = Reservable.objects.get(slug="room")
+        series = ReservationSeries.objects.create(
+            reason="weekly", start=hours(2), end=hours(3), until=hours(24 * 21)
+        )
+        series.reservables.add(room)
+        series.owners.add(user)
+        query = {"flat": "true", "start__gte": hours(1).isoformat()}
+        response = self.client.get("/api/reservations/", query)
+        entries = [
+            (entry["start"], entry.get("id"), entry.get("series"))
+            for entry in response.data
+        ]
+        self.assertEqual(len(entries), 12)
+        # The occurrences precede the reservations starting at the same time.
+        self.assertEqual(entries[1][1:], (None, series.pk))
+        self.assertEqual(entries[2][0], entries[1][0])
+        self.assertEqual(
+            response.data[1],
+            {
+                "series": series.pk,
+                "reason": "weekly",
+                "start": hours(2).isoformat().replace("+00:00", "Z"),
+                "end": hours(3).isoformat().replace("+00:00", "Z"),
+                "owners": [user.pk],
+                "reservables": [room.pk],
+            },
+        )
+        # The keyset pages hold the same entries, whatever the last one of the page.
+        for size in (1, 2, 3):
+            url, paged = "/api/reservations/", []
+            response = self.client.get(url, {**query, "page_size": size})
+            while True:
+                paged += [
+                    (entry["start"], entry.get("id"), entry.get("series"))
+                    for entry in response.data["results"]
+                ]
+                if response.data["next"] is None:
+                    break
+                response = self.client.get(response.data["next"])
+            self.assertEqual(paged, entries)
+        # The export lists the same entries in the same order.
+        response = self.client.get("/api/reservations/", {**query, "format": "csv"})
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            [
+                (row["start"], row["id"] or None)
+                for row in csv.DictReader(io.StringIO(content))
+            ],
+            [
+                (
+                    datetime.fromisoformat(start).isoformat(),
+                    None if pk is None else str(pk),
+                )
+                for start, pk, _series in entries
+            ],
+        )
+        # The filters apply to the series like to the reservations.
+        response = self.client.get("/api/reservations/", {"reason": "weekly"})
+        self.assertEqual([entry["series"] for entry in response.data], [series.pk] * 3)
+        pk = Reservation.objects.first().pk
+        response = self.client.get("/api/reservations/", {"id": pk})
+        self.assertEqual([entry["id"] for entry in response.data], [pk])
+
+    def test_ics_export(self):
+        response = self.client.get(
+            "/api/reservations/",
+            {"owners__username": "user"},
+            HTTP_ACCEPT="text/calendar",
+        )
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        content = b"".join(response.streaming_content).decode()
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEqual(content.count("BEGIN:VEVENT"), 10)
+        self.assertIn("DTSTART:20240101T000000Z\r\n", content)
+        self.assertEqual(fold(["x" * 80]), "x" * 75 + "\r\n " + "x" * 5 + "\r\n")
+        response = self.client.get(
+            f"/api/reservations/{Reservation.objects.first().pk}/", {"format": "ics"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        cls.room = Reservable.objects.create(slug="room", type="room", name="room")
+        assign_perm("reservations.add_reservation", cls.user)
+        assign_perm("reserve", cls.user, cls.room)
+        reservation = Reservation.objects.create(
+            reason="lecture", start=hours(0), end=hours(1)
+        )
+        reservation.reservables.add(cls.room)
+
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def scrape(self) -> str:
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_list(self):
+        response = self.client.get("/api/reservations/")
+        text = self.scrape()
+        labels = 'view="ReservationViewSet",action="list"'
+        # The archive horizon, the reservations, the three prefetches and the series.
+        self.assertIn(f"reservations_db_queries_sum{{{labels}}} 6", text)
+        self.assertIn(
+            f"reservations_permission_duration_seconds_count{{{labels},"
+            f'check="has_permission"}} 1',
+            text,
+        )
+        self.assertIn(
+            f"reservations_response_size_bytes_sum{{{labels}}} {len(response.content)}",
+            text,
+        )
+        self.assertIn(
+            f"reservations_serializer_duration_seconds_count{{{labels}}} 1", text
+        )
+        self.assertIn(
+            f'reservations_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1',
+            text,
+        )
+        # The metrics endpoint is not measured before it responds.
+        self.assertNotIn('view="metrics"', text)
+
+    def test_permission_checks(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/reservations/",
+            {
+                "reason": "exam",
+                "start": hours(0).isoformat(),
+                "end": hours(1).isoformat(),
+                "owners": [self.user.pk],
+                "reservables": [f"http://testserver/api/reservables/{self.room.pk}/"],
+            },
+        )
+        self.assertEqual(response.status_code, 403)
+        text = self.scrape()
+        for check in ("has_permission", "can_create_update", "can_overlap"):
+            self.assertIn(
+                'view="ReservationViewSet",action="create",check="{}"}} 1'.format(
+                    check
+                ),
+                text,
+            )
+
+    def test_access(self):
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+        self.client.force_login(
+            get_user_model().objects.create_user("staff", is_staff=True)
+        )
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async(self):
+        await self.async_client.get("/api/async/reservables/")
+        text = await sync_to_async(self.scrape)()
+        labels = 'view="AsyncReservableList",action="get"'
+        # The reservables and the prefetch of the resources.
+        self.assertIn(f"reservations_db_queries_sum{{{labels}}} 2", text)
+
+    @override_settings(RESERVATIONS_SLOW_REQUEST=0)
+    def test_slow_log(self):
+        with self.assertLogs("reservations.metrics", "WARNING") as logs:
+            self.client.get("/api/reservables/")
+        self.assertIn("(ReservableViewSet.list)", logs.output[0])
+        self.assertIn('FROM "reservations_reservable"', logs.output[0])
+
+
+class ChangeFeedTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Reservable.objects.create(slug="room", type="room", name="room")
+        cls.resource = Resource.objects.create(slug="projector", type="equipment")
+        cls.reservations = [
+            Reservation.objects.create(
+                reason="lecture", start=hours(i), end=hours(i + 1)
+            )
+            for i in range(3)
+        ]
+        for reservation in cls.reservations:
+            reservation.reservables.add(cls.room)
+
+    def changes(self, since=None):
+        params = {"flat": "true"} if since is None else {"flat": "true", "since": since}
+        response = self.client.get("/api/reservations/changes/", params)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        return data["token"], [r["id"] for r in data["changed"]], data["deleted"]
+
+    def test_full(self):
+        token, changed, deleted = self.changes()
+        self.assertEqual(changed, [r.pk for r in self.reservations])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.changes(token), (token, [], []))
+
+    def test_delta(self):
+        token, _changed, _deleted = self.changes()
+        first, second, third = self.reservations
+        first.reason = "exam"
+        first.save()
+        NRequirements.objects.create(reservation=second, resource=self.resource, n=1)
+        self.room.reservations.remove(third)
+        token, changed, deleted = self.changes(token)
+        self.assertEqual(changed, [first.pk, second.pk, third.pk])
+        self.assertEqual(deleted, [])
+
+        pk = first.pk
+        first.delete()
+        Reservation.objects.prune()
+        token, changed, deleted = self.changes(token)
+        self.assertEqual(changed, [])
+        self.assertEqual(deleted, [pk, third.pk])
+
+    def test_delete(self):
+        token, _changed, _deleted = self.changes()
+        pks = [r.pk for r in self.reservations]
+        Reservation.objects.filter(pk__in=pks[1:]).delete()
+        self.assertEqual(
+            ReservationTombstone.objects.values("sequence").distinct().count(), 1
+        )
+        token, changed, deleted = self.changes(token)
+        self.assertEqual((changed, deleted), ([], pks[1:]))
+
+    def test_rolled_back(self):
+        token, _changed, _deleted = self.changes()
+        sequence = ChangeSequence.current()
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(reason="exam", start=hours(2), end=hours(1))
+        # The number is taken in the transaction of the failed change.
+        self.assertEqual(ChangeSequence.current(), sequence)
+        self.assertEqual(self.changes(token), (token, [], []))
+
+    def test_owners(self):
+        user = get_user_model().objects.create_user("user")
+        token, _changed, _deleted = self.changes()
+        user.reservation_set.set(self.reservations[1:])
+        token, changed, _deleted = self.changes(token)
+        self.assertEqual(changed, [r.pk for r in self.reservations[1:]])
+        user.reservation_set.clear()
+        self.assertEqual(self.changes(token)[1], changed)
+
+    def series_changes(self, since):
+        response = self.client.get("/api/reservations/changes/", {"since": since})
+        series = response.data["series"]
+        return [s["id"] for s in series["changed"]], series["deleted"]
+
+    def test_series(self):
+        token, _changed, _deleted = self.changes()
+        series = ReservationSeries.objects.create(
+            reason="weekly", start=hours(0), end=hours(1), until=hours(24 * 14)
+        )
+        series.reservables.add(self.room)
+        self.assertEqual(self.series_changes(token), ([series.pk], []))
+        token, changed, _deleted = self.changes(token)
+        self.assertEqual(changed, [])
+        series.detach(hours(0).date())
+        user = get_user_model().objects.create_user("user")
+        user.reservation_series.add(series)
+        self.assertEqual(self.series_changes(token), ([series.pk], []))
+        # The series are filtered like in the exports.
+        response = self.client.get(
+            "/api/reservations/changes/", {"since": token, "reason": "lecture"}
+        )
+        self.assertEqual(response.data["series"]["changed"], [])
+        token = self.changes(token)[0]
+        pk = series.pk
+        series.delete()
+        self.assertEqual(self.series_changes(token), ([], [pk]))
+
+    def test_reservable_deleted(self):
+        hall = Reservable.objects.create(slug="hall", type="room", name="hall")
+        first = self.reservations[0]
+        first.reservables.add(hall)
+        series = ReservationSeries.objects.create(
+            reason="weekly", start=hours(0), end=hours(1), until=hours(24 * 14)
+        )
+        series.reservables.add(hall)
+        token, _changed, _deleted = self.changes()
+        # The deletion cascades to the relations without the m2m signals.
+        hall.delete()
+        self.assertEqual(self.changes(token)[1], [first.pk])
+        self.assertEqual(self.series_changes(token), ([series.pk], []))
+
+
+class AvailabilityTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        for start, end in ((1, 3), (2, 4), (4, 5), (7, 12)):
+            reservation = Reservation.objects.create(
+                reason="lecture", start=hours(start), end=hours(end)
+            )
+            reservation.reservables.add(cls.room1)
+
+    def get(self, url: str, start: int = 0, end: int = 10):
+        return self.client.get(
+            url, {"start": hours(start).isoformat(), "end": hours(end).isoformat()}
+        )
+
+    def test_reservable(self):
+        response = self.get("/api/reservables/room1/availability/")
+        self.assertEqual(response.status_code, 200)
+        (data,) = response.data
+        self.assertEqual(
+            [(i["start"], i["end"]) for i in data["busy"]],
+            [(hours(1), hours(5)), (hours(7), hours(10))],
+        )
+        self.assertEqual(
+            [(i["start"], i["end"]) for i in data["free"]],
+            [(hours(0), hours(1)), (hours(5), hours(7))],
+        )
+        self.assertEqual(
+            self.get("/api/reservables/none/availability/").status_code, 404
+        )
+
+    def test_bulk(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                "/api/reservables/availability/",
+                {
+                    "start": hours(0).isoformat(),
+                    "end": hours(10).isoformat(),
+                    "type": "room",
+                },
+            )
+        data = {item["reservable"]: item for item in response.data}
+        self.assertEqual(len(data["room1"]["busy"]), 2)
+        self.assertEqual(data["room2"]["free"], [{"start": hours(0), "end": hours(10)}])
+
+    def test_invalid_window(self):
+        response = self.get("/api/reservables/room1/availability/", 5, 1)
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        Reservable.objects.create(slug="room2", type="room", name="2")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        NResources.objects.create(reservable=room1, resource=projector, n=1)
+        user = get_user_model().objects.create_user("user", password="secret")
+        for start, end in ((1, 3), (2, 4), (7, 12)):
+            reservation = Reservation.objects.create(
+                reason="lecture", start=hours(start), end=hours(end)
+            )
+            reservation.reservables.add(room1)
+            reservation.owners.add(user)
+        series = ReservationSeries.objects.create(
+            reason="weekly", start=hours(5), end=hours(6), until=hours(24 * 30)
+        )
+        series.reservables.add(room1)
+
+    def assertSameResponse(self, path: str, query: dict, **headers):
+        response = self.client.get(f"/api/async/{path}", query, headers=headers)
+        expected = self.client.get(f"/api/{path}", query, headers=headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            response.headers.get("WWW-Authenticate"),
+            expected.headers.get("WWW-Authenticate"),
+        )
+        self.assertEqual(
+            json.loads(response.content.decode().replace("/api/async/", "/api/")),
+            expected.json(),
+        )
+
+    def test_reservations(self):
+        archive(hours(3))
+        self.assertSameResponse("reservations/", {})
+        self.assertSameResponse("reservations/", {"flat": "true", "page_size": 2})
+        self.assertSameResponse("reservations/", {"end__gt": hours(5).isoformat()})
+        self.assertSameResponse("reservations/", {"start": "invalid"})
+        self.assertSameResponse("reservations/", {"unknown": "1"})
+
+    def test_reservables(self):
+        self.assertSameResponse("reservables/", {})
+        self.assertSameResponse("reservables/", {"resources": "projector"})
+        self.assertSameResponse("reservables/", {"page_size": 1})
+
+    def test_availability(self):
+        window = {"start": hours(0).isoformat(), "end": hours(10).isoformat()}
+        self.assertSameResponse("reservables/availability/", window)
+        self.assertSameResponse("reservables/availability/", {"type": "room", **window})
+        self.assertSameResponse("reservables/room1/availability/", window)
+        self.assertSameResponse("reservables/none/availability/", window)
+        self.assertSameResponse("reservables/room1/availability/", {})
+
+    def test_read_only(self):
+        response = self.client.post("/api/async/reservations/", {})
+        self.assertEqual(response.status_code, 405)
+
+    def test_authentication(self):
+        credentials = base64.b64encode(b"user:secret").decode()
+        self.assertSameResponse(
+            "reservations/", {}, authorization=f"Basic {credentials}"
+        )
+        credentials = base64.b64encode(b"user:wrong").decode()
+        self.assertSameResponse(
+            "reservations/", {}, authorization=f"Basic {credentials}"
+        )
+        self.client.force_login(get_user_model().objects.get(username="user"))
+        self.assertSameResponse("reservations/", {"page_size": 2})
+
+    @mock.patch.object(AsyncReadView, "authentication_classes", (BasicAuthentication,))
+    def test_challenge(self):
+        credentials = base64.b64encode(b"user:wrong").decode()
+        response = self.client.get(
+            "/api/async/reservables/", headers={"authorization": f"Basic {credentials}"}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.headers["WWW-Authenticate"], 'Basic realm="api"')
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            AsyncReadView()
+
+    async def test_async_client(self):
+        response = await self.async_client.get(
+            "/api/async/reservables/room1/availability/",
+            {"start": hours(0).isoformat(), "end": hours(10).isoformat()},
+        )
+        self.assertEqual(len(response.json()[0]["busy"]), 3)
+
+
+class SlotsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seats = Resource.objects.create(slug="seats", type="furniture")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        rooms = ReservableSet.objects.create(name="Rooms", slug="rooms")
+        for slug, n_seats, busy in (
+            ("small", 20, []),
+            ("large", 60, [(0, 2), (3, 5)]),
+            ("hall", 200, [(0, 4)]),
+        ):
+            room = Reservable.objects.create(slug=slug, type="room", name=slug)
+            rooms.reservables.add(room)
+            NResources.objects.create(reservable=room, resource=seats, n=n_seats)
+            NResources.objects.create(reservable=room, resource=projector, n=1)
+            for start, end in busy:
+                reservation = Reservation.objects.create(
+                    reason="lecture", start=hours(start), end=hours(end)
+                )
+                reservation.reservables.add(room)
+
+    def get(self, **params):
+        query = {"start": hours(0).isoformat(), "end": hours(8).isoformat()}
+        return self.client.get("/api/sets/rooms/slots/", {**query, **params})
+
+    def test_slots(self):
+        response = self.get(duration="02:00:00", resources="seats:40,projector")
+        self.assertEqual(
+            [(slot["reservable"], slot["start"]) for slot in response.data],
+            [("hall", hours(4)), ("large", hours(5))],
+        )
+        response = self.get(duration="01:00:00", resources="seats:40", limit=2)
+        self.assertEqual(
+            [(slot["reservable"], slot["start"]) for slot in response.data],
+            [("large", hours(2)), ("hall", hours(4))],
+        )
+
+    def test_invalid(self):
+        self.assertEqual(self.get(duration="10:00:00").status_code, 400)
+        self.assertEqual(
+            self.get(duration="01:00:00", resources="seats:many").status_code, 400
+        )
+
+    def test_resources_filter(self):
+        response = self.client.get(
+            "/api/reservables/",
+            {"reservableset_set__slug": "rooms", "resources": "seats:40,projector"},
+        )
+        self.assertEqual(
+            sorted(reservable["slug"] for reservable in response.data),
+            ["hall", "large"],
+        )
+        response = self.client.get("/api/reservables/", {"resources": "seats:x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_summed_resources(self):
+        small = Reservable.objects.get(slug="small")
+        NResources.objects.create(
+            reservable=small, resource=Resource.objects.get(slug="seats"), n=30
+        )
+        requirements = {"seats": 50, "projector": 1}
+        self.assertIn(small, Reservable.objects.with_resources(requirements))
+        capacity = NResources.objects.capacity([small])
+        self.assertEqual(
+            missing_resources(
+                {
+                    Resource.objects.get(slug=slug).pk: n
+                    for slug, n in requirements.items()
+                },
+                capacity,
+            ),
+            [],
+        )
+        self.assertNotIn(small, Reservable.objects.with_resources({"seats": 51}))
+
+
+class UtilisationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rooms = ReservableSet.objects.create(name="Rooms", slug="rooms")
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        cls.lab = Reservable.objects.create(slug="lab", type="lab", name="lab")
+        rooms.reservables.add(cls.room1, cls.room2)
+
+    def occupancy(self) -> dict:
+        return {
+            (occupancy.reservable.slug, occupancy.start): occupancy.seconds
+            for occupancy in Occupancy.objects.filter(seconds__gt=0)
+        }
+
+    def test_rollups(self):
+        half = timedelta(minutes=30)
+        reservation = Reservation.objects.create(
+            reason="lecture", start=hours(0) + half, end=hours(2)
+        )
+        reservation.reservables.add(self.room1, self.lab)
+        self.room2.reservations.add(reservation)
+        expected = {
+            (slug, start): seconds
+            for slug in ("room1", "room2", "lab")
+            for start, seconds in ((hours(0), 1800), (hours(1), 3600))
+        }
+        self.assertEqual(self.occupancy(), expected)
+
+        reservation.start, reservation.end = hours(1), hours(1) + half
+        reservation.save()
+        reservation.reservables.remove(self.lab)
+        expected = {("room1", hours(1)): 1800, ("room2", hours(1)): 1800}
+        self.assertEqual(self.occupancy(), expected)
+
+        Occupancy.objects.update(seconds=0)
+        self.assertEqual(analytics.rebuild(), 2)
+        self.assertEqual(self.occupancy(), expected)
+
+        reservation.delete()
+        self.assertEqual(self.occupancy(), {})
+
+    def test_utilisation(self):
+        reservation = Reservation.objects.create(
+            reason="lecture", start=hours(1), end=hours(3)
+        )
+        reservation.reservables.add(self.room1, self.lab)
+        query = {"start": hours(0).isoformat(), "end": hours(3).isoformat()}
+        response = self.client.get(
+            "/api/reservables/utilisation/", {**query, "group": "set"}
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data["buckets"]), 3)
+        [row] = response.data["rows"]
+        self.assertEqual(
+            (row["group"], row["reservables"], row["utilisation"]),
+            ("rooms", 2, [0, 0.5, 0.5]),
+        )
+        response = self.client.get(
+            "/api/reservables/utilisation/",
+            {**query, "group": "type", "resolution": "day", "type": "lab"},
+        )
+        [row] = response.data["rows"]
+        self.assertEqual((row["group"], row["minutes"]), ("lab", [120]))
+
+    def test_series(self):
+        series = ReservationSeries.objects.create(
+            reason="lecture", start=hours(1), end=hours(2), until=hours(24 * 14)
+        )
+        series.reservables.add(self.room1)
+        reservation = Reservation.objects.create(
+            reason="lecture", start=hours(24 * 7), end=hours(24 * 7 + 2)
+        )
+        reservation.reservables.add(self.room1)
+        # The occurrences are not rolled up.
+        self.assertEqual(analytics.rebuild(), 2)
+
+        def minutes(start: datetime, end: datetime, **kwargs) -> list:
+            return [
+                (row["group"], row["minutes"])
+                for row in analytics.utilisation(
+                    Reservable.objects.all(), "type", start, end, **kwargs
+                )["rows"]
+            ]
+
+        self.assertEqual(
+            minutes(hours(0), hours(3)), [("lab", [0, 0, 0]), ("room", [0, 60, 0])]
+        )
+        self.assertEqual(
+            minutes(hours(24 * 7), hours(24 * 7 + 3)),
+            [("lab", [0, 0, 0]), ("room", [60, 120, 0])],
+        )
+        self.assertEqual(
+            minutes(hours(24 * 7) + timedelta(minutes=90), hours(24 * 7 + 2)),
+            [("lab", [0]), ("room", [120])],
+        )
+        days = minutes(hours(0), hours(24 * 14), resolution="day")
+        self.assertEqual(days[1][1], [60] + [0] * 6 + [180] + [0] * 6)
+
+    def test_archived(self):
+        for start in range(3):
+            reservation = Reservation.objects.create(
+                reason="lecture", start=hours(start * 2), end=hours(start * 2 + 1)
+            )
+            reservation.reservables.add(self.room1, self.lab)
+        self.assertEqual(archive(hours(4)), 2)
+
+        def heat_map() -> list:
+            return analytics.utilisation(
+                Reservable.objects.all(), "type", hours(0), hours(6)
+            )["rows"]
+
+        expected = heat_map()
+        self.assertEqual(expected[0]["minutes"], [60, 0, 60, 0, 60, 0])
+        self.assertEqual(analytics.rebuild(), 6)
+        self.assertEqual(heat_map(), expected)
+        self.assertEqual(analytics.rebuild([self.lab]), 3)
+        self.assertEqual(heat_map(), expected)
+
+    def test_delete(self):
+        def updates(queries) -> int:
+            return sum(
+                query["sql"].startswith('UPDATE "reservations_occupancy"')
+                for query in queries.captured_queries
+            )
+
+        for room in (self.room1, self.room2, self.lab):
+            Reservation.objects.create(
+                reason="lecture", start=hours(0), end=hours(1)
+            ).reservables.add(room)
+        with CaptureQueriesContext(connection) as queries:
+            Reservation.objects.all().delete()
+        self.assertEqual(self.occupancy(), {})
+        self.assertEqual(updates(queries), 1)
+
+        reservation = Reservation.objects.create(
+            reason="exam", start=hours(0), end=hours(2)
+        )
+        reservation.reservables.add(self.room1, self.room2, self.lab)
+        with CaptureQueriesContext(connection) as queries:
+            reservation.reservables.clear()
+        self.assertEqual(self.occupancy(), {})
+        # One update of every hour of the three reservables.
+        self.assertEqual(updates(queries), 2)
+
+
+class BulkCreateTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        cls.user.user_permissions.add(
+            *Permission.objects.filter(
+                codename__in=("add_reservation", "change_reservation")
+            )
+        )
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        NResources.objects.create(reservable=cls.room2, resource=projector, n=1)
+        for room in (cls.room1, cls.room2):
+            assign_perm("reserve", cls.user, room)
+        assign_perm("double_reserve", cls.user, cls.room2)
+        reservation = Reservation.objects.create(
+            reason="exam", start=hours(0), end=hours(2)
+        )
+        reservation.reservables.add(cls.room1, cls.room2)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def item(self, start: int, end: int, *rooms: Reservable) -> dict:
+        return {
+            "reason": "lecture",
+            "start": hours(start).isoformat(),
+            "end": hours(end).isoformat(),
+            "owners": [self.user.pk],
+            "reservables": [room.pk for room in rooms],
+        }
+
+    def post(self, items: list[dict]):
+        return self.client.post("/api/reservations/bulk/", items, format="json")
+
+    def test_create(self):
+        items = [self.item(i, i + 1, self.room1) for i in range(2, 12)]
+        items.append(self.item(1, 3, self.room2) | {"requirements": {"projector": 1}})
+        response = self.post(items)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 11)
+        reservation = Reservation.objects.get(pk=response.data[-1]["id"])
+        self.assertEqual(list(reservation.reservables.all()), [self.room2])
+        self.assertEqual(list(reservation.owners.all()), [self.user])
+        self.assertEqual(reservation.nrequirements_set.get().n, 1)
+        self.assertFalse(
+            ReservationReservable.objects.filter(start__isnull=True).exists()
+        )
+
+    def test_conflicts(self):
+        existing = Reservation.objects.count()
+        response = self.post(
+            [
+                self.item(1, 3, self.room1),
+                self.item(4, 6, self.room1),
+                self.item(5, 7, self.room1),
+                self.item(8, 9, self.room2),
+                self.item(8, 10, self.room2),
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result["index"] for result in response.data], [0, 1, 2])
+        self.assertEqual(Reservation.objects.count(), existing)
+
+    def test_invalid(self):
+        response = self.post([self.item(1, 2, self.room1), {"reason": "x"}])
+        self.assertEqual(response.status_code, 400)
+        response = self.post([self.item(3, 4, self.room1) | {"reservables": [0]}])
+        self.assertEqual(
+            response.data[0]["errors"]["reservables"][0], "Invalid keys: 0."
+        )
+
+    def test_requirements(self):
+        response = self.post(
+            [
+                self.item(3, 4, self.room1, self.room2)
+                | {"requirements": {"projector": 1}},
+                self.item(4, 5, self.room1) | {"requirements": {"projector": 1}},
+                self.item(5, 6, self.room2) | {"requirements": {"projector": 2}},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result["index"] for result in response.data], [1, 2])
+        self.assertEqual(
+            response.data[0]["errors"]["requirements"][0],
+            "Insufficient resources: projector.",
+        )
+
+    def test_update_requirements(self):
+        response = self.post(
+            [self.item(3, 4, self.room2) | {"requirements": {"projector": 1}}]
+        )
+        url = f"/api/reservations/{response.data[0]['id']}/"
+        room1_url = f"http://testserver/api/reservables/{self.room1.pk}/"
+        item = self.item(3, 4) | {"reservables": [room1_url]}
+        response = self.client.put(url, item, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["reservables"][0], "Insufficient resources: projector."
+        )
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        cls.room1 = Reservable.objects.create(slug="room1", type="room", name="1")
+        cls.room2 = Reservable.objects.create(slug="room2", type="room", name="2")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        NResources.objects.create(reservable=cls.room2, resource=projector, n=1)
+        reservation = Reservation.objects.create(
+            reason="exam", start=hours(0), end=hours(2)
+        )
+        reservation.reservables.add(cls.room1)
+
+    def test_csv(self):
+        lines = [
+            "reason,start,end,reservables,owners,requirements\n",
+            f"lecture,{hours(2).isoformat()},{hours(3).isoformat()},room1,user,\n",
+            f"lab,{hours(2).isoformat()},{hours(4).isoformat()},room2,,projector:1\n",
+            f"talk,{hours(5).isoformat()},{hours(6).isoformat()},room3,,\n",
+            f"late,{hours(1).isoformat()},{hours(3).isoformat()},room1 room2,,\n",
+            f"big,{hours(7).isoformat()},{hours(8).isoformat()},room1,,projector:1\n",
+        ]
+        importer = Importer(batch_size=2).run(read_csv(lines))
+        self.assertEqual(
+            (importer.imported, importer.invalid, importer.overlapping), (2, 2, 1)
+        )
+        self.assertEqual(
+            sorted(importer.problems),
+            [
+                (4, "Unknown reservables: room3."),
+                (5, "Overlaps other reservations on room1, room2."),
+                (6, "Insufficient resources: projector."),
+            ],
+        )
+        lab = Reservation.objects.get(reason="lab")
+        self.assertEqual(list(lab.reservables.all()), [self.room2])
+        self.assertEqual(lab.nrequirements_set.get().n, 1)
+        self.assertEqual(
+            list(Reservation.objects.get(reason="lecture").owners.all()), [self.user]
+        )
+
+    def test_jsonl(self):
+        lines = [
+            '{"reason": "lecture", "start": "2024-01-01T02:00:00Z", '
+            '"end": "2024-01-01T03:00:00Z", "reservables": ["room1", "room2"], '
+            '"requirements": {"projector": 1}}\n',
+            "\n",
+            "[1, 2]\n",
+            "{\n",
+        ]
+        importer = Importer(owners=["user"]).run(read_jsonl(lines))
+        self.assertEqual([line for line, _ in importer.problems], [3, 4])
+        reservation = Reservation.objects.get(reason="lecture")
+        self.assertEqual(reservation.end, hours(3))
+        self.assertEqual(list(reservation.owners.all()), [self.user])
+
+    def test_jsonl_types(self):
+        row = {"start": "2024-01-01T05:00:00Z", "end": "2024-01-01T06:00:00Z"}
+        rows = [
+            {"reservables": "room2", "requirements": {"projector": "5"}},
+            {"reservables": "room2", "requirements": ["projector"]},
+            {"reservables": 5},
+            {"reservables": "room2", "requirements": {"projector": -5}},
+            {"reservables": ["room2", 5]},
+        ]
+        importer = Importer().run(
+            read_jsonl(json.dumps(row | values) for values in rows)
+        )
+        self.assertEqual(
+            importer.problems,
+            [
+                (1, 'Invalid requirements: {"projector": "5"}.'),
+                (2, 'Invalid requirements: ["projector"].'),
+                (3, "Invalid reservables: 5."),
+                (4, 'Invalid requirements: {"projector": -5}.'),
+                (5, 'Invalid reservables: ["room2", 5].'),
+            ],
+        )
+        self.assertEqual(importer.imported, 0)
+
+    def test_ics(self):
+        lines = [
+            "BEGIN:VCALENDAR\r\n",
+            "BEGIN:VEVENT\r\n",
+            "DTSTART:20240101T020000Z\r\n",
+            "DTEND;TZID=Europe/Ljubljana:20240101T040000\r\n",
+            "SUMMARY:Lecture\\, part 1\r\n",
+            "LOCATION:room1\\, ro\r\n",
+            " om2\r\n",
+            "END:VEVENT\r\n",
+            "BEGIN:VEVENT\r\n",
+            "DTSTART:yesterday\r\n",
+            "END:VEVENT\r\n",
+            "END:VCALENDAR\r\n",
+        ]
+        importer = Importer().run(read_ics(lines))
+        self.assertEqual(importer.problems, [(8, "Invalid date-time: yesterday.")])
+        reservation = Reservation.objects.get(reason="Lecture, part 1")
+        self.assertEqual(reservation.end, hours(3))
+        self.assertEqual(reservation.reservables.count(), 2)
+
+    def test_command(self):
+        path = self.enterContext(
+            mock.patch("builtins.open", mock.mock_open(read_data=""))
+        )
+        path.return_value = io.StringIO(
+            "reason,start,end,reservables\n"
+            f"lecture,{hours(1).isoformat()},{hours(2).isoformat()},room1\n"
+            f"lecture,{hours(2).isoformat()},{hours(3).isoformat()},room1\n"
+        )
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "import_reservations", "timetable.csv", "--dry-run", stdout=out, stderr=err
+        )
+        self.assertEqual(
+            out.getvalue(), "Checked 1 reservations, 0 invalid rows, 1 overlapping.\n"
+        )
+        self.assertEqual(
+            err.getvalue(), "Line 2: Overlaps other reservations on room1.\n"
+        )
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class ArchiveTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin")
+        cls.room = Reservable.objects.create(slug="room", type="room", name="Room")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        NResources.objects.create(reservable=cls.room, resource=projector, n=1)
+        cls.reservations = []
+        for start in (0, 1, 100):
+            reservation = Reservation.objects.create(
+                reason=f"r{start}", start=hours(start), end=hours(start + 1)
+            )
+            reservation.owners.add(cls.user)
+            reservation.reservables.add(cls.room)
+            NRequirements.objects.create(
+                reservation=reservation, resource=projector, n=1
+            )
+            cls.reservations.append(reservation)
+
+    def test_archive(self):
+        seconds = Occupancy.objects.aggregate(total=Sum("seconds"))["total"]
+        self.assertEqual(archive(hours(50), batch_size=1), 2)
+        self.assertEqual(list(Reservation.objects.all()), self.reservations[2:])
+        archived = ArchivedReservation.objects.get(pk=self.reservations[0].pk)
+        self.assertEqual(archived.end, hours(1))
+        self.assertEqual(list(archived.owners.all()), [self.user])
+        self.assertEqual(list(archived.reservables.all()), [self.room])
+        self.assertEqual(archived.archivednrequirements_set.get().n, 1)
+        self.assertFalse(ReservationReservable.objects.filter(end__lt=hours(50)))
+        self.assertFalse(ReservationTombstone.objects.exists())
+        self.assertEqual(
+            Occupancy.objects.aggregate(total=Sum("seconds"))["total"], seconds
+        )
+        self.assertEqual(ArchivedReservation.objects.horizon(), hours(2))
+
+    def test_list(self):
+        archive(hours(50))
+        response = self.client.get("/api/reservations/")
+        self.assertEqual(
+            [item["reason"] for item in response.data], ["r0", "r1", "r100"]
+        )
+        self.assertTrue(
+            response.data[0]["url"].endswith(f"/{self.reservations[0].pk}/")
+        )
+        response = self.client.get("/api/reservations/", {"page_size": 2})
+        self.assertEqual(
+            [item["reason"] for item in response.data["results"]], ["r0", "r1"]
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [item["reason"] for item in response.data["results"]], ["r100"]
+        )
+        response = self.client.get(
+            "/api/reservations/", {"format": "csv", "reservables__slug": "room"}
+        )
+        self.assertEqual(b"".join(response.streaming_content).count(b"r1"), 2)
+
+    def test_current_window(self):
+        archive(hours(50))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/reservations/", {"end__gt": hours(2).isoformat()}
+            )
+        self.assertEqual([item["reason"] for item in response.data], ["r100"])
+        # Only the horizon is read from the archive.
+        self.assertEqual(
+            sum("archivedreservation" in query["sql"] for query in queries), 1
+        )
+
+    def test_retrieve(self):
+        archive(hours(50))
+        url = f"/api/reservations/{self.reservations[0].pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response.data["reason"], "r0")
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command(
+            "archive_reservations", "--before", "2024-01-01T03:00Z", stdout=out
+        )
+        self.assertEqual(
+            out.getvalue(),
+            "Archived 2 reservations which ended before 2024-01-01 03:00:00+00:00.\n",
+        )
+        self.assertEqual(ArchivedReservation.objects.count(), 2)
+
+
+class PruneTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        cls.room = Reservable.objects.create(slug="room", type="room", name="Room")
+        projector = Resource.objects.create(slug="projector", type="equipment")
+        cls.reservations = []
+        for start in range(5):
+            reservation = Reservation.objects.create(
+                reason=f"r{start}", start=hours(start), end=hours(start + 1)
+            )
+            reservation.owners.add(cls.user)
+            NRequirements.objects.create(
+                reservation=reservation, resource=projector, n=1
+            )
+            cls.reservations.append(reservation)
+        cls.reservations[2].reservables.add(cls.room)
+
+    def test_prune(self):
+        counts = []
+        with self.assertNumQueries(4 * 12 + 3):
+            self.assertEqual(Reservation.objects.prune(batch_size=1), 4)
+        self.assertEqual(list(Reservation.objects.all()), [self.reservations[2]])
+        self.assertEqual(NRequirements.objects.count(), 1)
+        self.assertEqual(Reservation.owners.through.objects.count(), 1)
+        self.assertEqual(
+            list(
+                ReservationTombstone.objects.order_by("pk").values_list(
+                    "reservation_id", flat=True
+                )
+            ),
+            [r.pk for r in self.reservations if r.pk != self.reservations[2].pk],
+        )
+        self.assertEqual(Reservation.objects.prune(progress=counts.append), 0)
+        self.assertEqual(counts, [])
+
+    def test_budget(self):
+        with mock.patch("reservations.prune.time.monotonic", side_effect=[0, 0, 5]):
+            self.assertEqual(Reservation.objects.prune(batch_size=3, budget=1), 3)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("prune_reservations", "--batch-size", "2", "-v", "2", stdout=out)
+        self.assertEqual(
+            out.getvalue(),
+            "2 reservations deleted.\n4 reservations deleted.\n"
+            "Deleted 4 reservations without reservables.\n",
+        )
+
+
+class GenerateTest(TestCase):
+    def test_command(self):
+        out = io.StringIO()
+        call_command(
+            "generate_data",
+            *("--sets", "2", "--reservables", "6", "--resources", "3"),
+            *("--users", "30", "--groups", "3", "--reservations", "200"),
+            stdout=out,
+        )
+        self.assertIn("200 reservations", out.getvalue())
+        self.assertEqual(Reservable.objects.count(), 6)
+        self.assertEqual(Reservation.objects.count(), 200)
+        permissions = set(
+            ReservablePermission.objects.values_list("user", "reservable", "codename")
+        )
+        ReservablePermission.objects.refresh()
+        self.assertTrue(permissions)
+        self.assertEqual(
+            set(
+                ReservablePermission.objects.values_list(
+                    "user", "reservable", "codename"
+                )
+            ),
+            permissions,
+        )
+        seconds = Occupancy.objects.aggregate(total=Sum("seconds"))["total"]
+        analytics.rebuild()
+        self.assertEqual(
+            Occupancy.objects.aggregate(total=Sum("seconds"))["total"], seconds
+        )
+        previous = {}
+        for row in ReservationReservable.objects.order_by("reservable", "start"):
+            self.assertLessEqual(previous.get(row.reservable_id, row.start), row.start)
+            previous[row.reservable_id] = row.end
+        # New reservations get the following primary keys.
+        reservation = Reservation.objects.create(
+            reason="new", start=hours(0), end=hours(1)
+        )
+        self.assertEqual(reservation.pk, 201)
+        with self.assertRaisesMessage(CommandError, "already exists"):
+            call_command("generate_data", stdout=out)
+
+    def test_regressions(self):
+        baseline = [
+            {"benchmark": "overlap", "scale": 10, "median_ms": 1.0},
+            {"benchmark": "endpoints", "scale": 10, "request": "a", "median_ms": 2.0},
+        ]
+        results = [
+            {"benchmark": "overlap", "scale": 10, "median_ms": 1.05},
+            {"benchmark": "overlap", "scale": 100, "median_ms": 9.0},
+            {"benchmark": "endpoints", "scale": 10, "request": "a", "median_ms": 3.0},
+        ]
+        self.assertEqual(
+            regressions(results, baseline, 10), [(results[2], baseline[1], 50.0)]
+        )
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1.0, 2.0], 0.95), 2.0)
+        self.assertEqual(percentile([float(i) for i in range(1, 101)], 0.95), 95.0)
+        self.assertEqual(percentile([1.0], 0.5), 1.0)
+
+
+class ReservationSeriesTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("user")
+        for model in ("reservation", "reservationseries"):
+            cls.user.user_permissions.add(
+                Permission.objects.get(codename=f"add_{model}")
+            )
+        cls.room = Reservable.objects.create(slug="room", type="room", name="room")
+        assign_perm("reserve", cls.user, cls.room)
+        # Ten weekly lectures, the third one is cancelled.
+        cls.series = ReservationSeries.objects.create(
+            reason="lecture",
+            start=hours(8),
+            end=hours(10),
+            until=hours(8 + 24 * 7 * 10),
+            exceptions=[date(2024, 1, 15).isoformat()],
+        )
+        cls.series.reservables.add(cls.room)
+        cls.series.owners.add(cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_occurrences(self):
+        occurrences = list(self.series.occurrences())
+        self.assertEqual(len(occurrences), 9)
+        self.assertEqual(occurrences[1], (hours(8 + 24 * 7), hours(10 + 24 * 7)))
+        self.assertNotIn(hours(8 + 24 * 14), [start for start, _end in occurrences])
+        window = list(self.series.occurrences(hours(24 * 20), hours(24 * 27)))
+        self.assertEqual(window, [(hours(8 + 24 * 21), hours(10 + 24 * 21))])
+
+    def test_last_occurrence(self):
+        # The last lecture starts before the end of the series and lasts past it.
+        self.series.until = hours(9 + 24 * 7 * 9)
+        self.series.save()
+        window = (hours(9 + 24 * 7 * 9), hours(10 + 24 * 7 * 9))
+        self.assertEqual(
+            [
+                occurrence[1:3]
+                for occurrence in ReservationSeries.objects.occurrences(
+                    *window, [self.room]
+                )
+            ],
+            [(hours(8 + 24 * 7 * 9), hours(10 + 24 * 7 * 9))],
+        )
+        response = self.client.post(
+            "/api/reservations/",
+            {
+                "reason": "exam",
+                "start": window[0].isoformat(),
+                "end": window[1].isoformat(),
+                "owners": [self.user.pk],
+                "reservables": [f"http://testserver/api/reservables/{self.room.pk}/"],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403, response.data)
+        response = self.client.get(
+            "/api/series/occurrences/",
+            {"start": window[0].isoformat(), "end": window[1].isoformat()},
+        )
+        self.assertEqual(len(response.data), 1)
+
+    def test_detach(self):
+        reservation = self.series.detach(date(2024, 1, 8))
+        self.assertEqual((reservation.start, reservation.end), (hours(176), hours(178)))
+        self.assertEqual(list(reservation.reservables.all()), [self.room])
+        self.assertEqual(len(list(self.series.occurrences())), 8)
+
+    @override_settings(TIME_ZONE="Europe/Ljubljana")
+    def test_wall_clock(self):
+        series = ReservationSeries(
+            reason="lecture",
+            start=datetime(2024, 3, 20, 9, tzinfo=timezone.utc),
+            end=datetime(2024, 3, 20, 10, tzinfo=timezone.utc),
+            until=datetime(2024, 4, 4, tzinfo=timezone.utc),
+        )
+        starts = [
+            start.astimezone(timezone.utc) for start, _end in series.occurrences()
+        ]
+        # Daylight saving time starts on 31. 3. 2024, the lecture stays at 10:00.
+        self.assertEqual([start.hour for start in starts], [9, 9, 8])
+
+    def test_overlap_check(self):
+        def post(start: int, end: int):
+            return self.client.post(
+                "/api/reservations/",
+                {
+                    "reason": "exam",
+                    "start": hours(start).isoformat(),
+                    "end": hours(end).isoformat(),
+                    "owners": [self.user.pk],
+                    "reservables": [
+                        f"http://testserver/api/reservables/{self.room.pk}/"
+                    ],
+                },
+                format="json",
+            )
+
+        self.assertEqual(post(24 * 7 + 9, 24 * 7 + 11).status_code, 403)
+        self.assertEqual(post(24 * 14 + 9, 24 * 14 + 11).status_code, 201)
+
+    def test_availability(self):
+        response = self.client.get(
+            "/api/reservables/room/availability/",
+            {"start": hours(24 * 7).isoformat(), "end": hours(24 * 8).isoformat()},
+        )
+        self.assertEqual(
+            response.data[0]["busy"],
+            [{"start": hours(24 * 7 + 8), "end": hours(24 * 7 + 10)}],
+        )
+
+    def test_create_series(self):
+        data = {
+            "reason": "seminar",
+            "start": hours(24 * 7 + 9).isoformat(),
+            "end": hours(24 * 7 + 11).isoformat(),
+            "frequency": "weekly",
+            "until": hours(24 * 7 * 5).isoformat(),
+            "owners": [self.user.pk],
+            "reservables": [f"http://testserver/api/reservables/{self.room.pk}/"],
+        }
+        response = self.client.post("/api/series/", data, format="json")
+        self.assertEqual(response.status_code, 403)
+        data["start"] = hours(24 * 7 + 10).isoformat()
+        data["end"] = hours(24 * 7 + 12).isoformat()
+        response = self.client.post("/api/series/", data, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+
+        response = self.client.get(
+            "/api/series/occurrences/",
+            {"start": hours(0).isoformat(), "end": hours(24 * 14).isoformat()},
+        )
+        self.assertEqual(
+            [(item["reason"], item["start"]) for item in response.data],
+            [
+                ("lecture", hours(8).isoformat().replace("+00:00", "Z")),
+                ("lecture", hours(24 * 7 + 8).isoformat().replace("+00:00", "Z")),
+                ("seminar", hours(24 * 7 + 10).isoformat().replace("+00:00", "Z")),
+            ],
+        )
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Parallel writers must never create overlapping reservations."""
+
+    writers = 8
+    attempts = 5
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user")
+        self.user.user_permissions.add(
+            Permission.objects.get(codename="add_reservation")
+        )
+        self.room = Reservable.objects.create(slug="room", type="room", name="room")
+        assign_perm("reserve", self.user, self.room)
+
+    def post(self, client: APIClient, writer: int, start: datetime) -> int:
+        """Post the reservation, retry while the reservables are locked."""
+        data = {
+            "reason": f"writer {writer}",
+            "start": start.isoformat(),
+            "end": (start + timedelta(hours=2)).isoformat(),
+            "owners": [self.user.pk],
+            "reservables": [f"http://testserver/api/reservables/{self.room.pk}/"],
+        }
+        while True:
+            response = client.post("/api/reservations/", data, format="json")
+            if response.status_code != 503:
+                return response.status_code
+            # SQLite rejects the concurrent writers instead of waiting.
+            self.assertEqual(response["Retry-After"], "1")
+            time.sleep(0.001)
+
+    def book(self, writer: int) -> list[int]:
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            # All the writers compete for the same slots.
+            return [
+                self.post(client, writer, hours(attempt * 2 + writer % 2))
+                for attempt in range(self.attempts)
+            ]
+        finally:
+            close_old_connections()
+
+    def test_no_overlaps(self):
+        with ThreadPoolExecutor(self.writers) as executor:
+            statuses = [
+                status
+                for writer_statuses in executor.map(self.book, range(self.writers))
+                for status in writer_statuses
+            ]
+        self.assertTrue(set(statuses) <= {201, 403}, statuses)
+        intervals = sorted(
+            Reservation.objects.filter(reservables=self.room).values_list(
+                "start", "end"
+            )
+        )
+        self.assertTrue(intervals)
+        for (_start, end), (start, _end) in zip(intervals, intervals[1:], strict=False):
+            self.assertLessEqual(end, start)
+
+    def test_contention(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        lock = "reservations.models.ReservableQuerySet.lock"
+        with mock.patch(lock, side_effect=OperationalError("database is locked")):
+            response = client.post(
+                "/api/reservations/",
+                {
+                    "reason": "lecture",
+                    "start": hours(0).isoformat(),
+                    "end": hours(1).isoformat(),
+                    "owners": [self.user.pk],
+                    "reservables": [
+                        f"http://testserver/api/reservables/{self.room.pk}/"
+                    ],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data["detail"].code, "lock_contention")
+        self.assertFalse(Reservation.objects.exists())
+        # The other database errors are not hidden.
+        with mock.patch(lock, side_effect=OperationalError("disk I/O error")):
+            with self.assertRaises(OperationalError):
+                client.post("/api/reservations/bulk/", [], format="json")
@@ -4,12 +4,82 @@ Created on Dec 3, 2014
 @author: gregor
 """
 
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from django_auth_ldap.backend import LDAPBackend
 from django_auth_ldap.config import NestedGroupOfNamesType
 
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4096)
+def group_name(dn: str, name: str) -> Optional[str]:
+    """Get the name of the Django group of the LDAP group with the DN and the name.
+
+    The name is prefixed by the university taken from the third component of the DN
+    from the end, None is returned if there is no such component.
+    """
+    try:
+        return dn.split(",")[-3][3:] + "_" + name
+    except IndexError:
+        return None
+
 
 class ULNestedGroupOfNamesType(NestedGroupOfNamesType):
-    def __init__(self, name_attr="cn"):
+    """Nested groups of names with the expansion cached by the user DN.
+
+    Expanding the nested groups takes an LDAP search for every level of the tree on
+    every login. The expanded groups of the user are stored with only their name
+    attribute in the cache named by the ``RESERVATIONS_CACHE`` setting (the default
+    cache if not set) and read again for ``cache_timeout`` seconds, so the changes of
+    the directory are seen by the logins once the entries expire.
+    """
+
+    #: How long the expanded groups are kept in the cache in seconds.
+    cache_timeout = 5 * 60
+
+    def __init__(self, name_attr="cn", cache_timeout: Optional[int] = None):
         super(ULNestedGroupOfNamesType, self).__init__(name_attr)
+        if cache_timeout is not None:
+            self.cache_timeout = cache_timeout
+
+    def get_cache_key(self, ldap_user, group_search) -> str:
+        """Get the cache key of the groups of the user found by the search."""
+        variant = (
+            ldap_user.dn.lower(),
+            group_search.base_dn,
+            group_search.filterstr,
+            self.name_attr,
+        )
+        digest = hashlib.sha1(repr(variant).encode()).hexdigest()
+        return f"reservations:ldap-groups:{digest}"
+
+    def user_groups(self, ldap_user, group_search):
+        """Get the groups of the user and their parent groups, from the cache."""
+        if not self.cache_timeout or ldap_user.dn is None:
+            return super().user_groups(ldap_user, group_search)
+        cache = caches[getattr(settings, "RESERVATIONS_CACHE", DEFAULT_CACHE_ALIAS)]
+        key = self.get_cache_key(ldap_user, group_search)
+        group_infos = cache.get(key)
+        if group_infos is None:
+            # Keep the name of the groups without their member lists.
+            group_infos = [
+                (
+                    (dn, {self.name_attr: attrs[self.name_attr]})
+                    if self.name_attr in attrs
+                    else (dn, {})
+                )
+                for dn, attrs in super().user_groups(ldap_user, group_search)
+            ]
+            cache.set(key, group_infos, self.cache_timeout)
+        return group_infos
 
     def group_name_from_info(self, group_info):
         """
@@ -22,10 +92,70 @@ class ULNestedGroupOfNamesType(NestedGroupOfNamesType):
         parameter.
         """
         try:
-            dn = group_info[0]
-            university = dn.split(",")[-3][3:]
-            name = university + "_" + group_info[1][self.name_attr][0]
+            return group_name(group_info[0], group_info[1][self.name_attr][0])
         except (KeyError, IndexError):
-            name = None
+            return None
 
-        return name
+
+def mirror_groups(user, names: Iterable[str]) -> bool:
+    """Make the user a member of exactly the groups with the names.
+
+    The missing groups are created. Only the difference is written, with a single
+    delete and a single insert of the memberships, and the permission map of the
+    user is refreshed once instead of by the signal handlers of every change.
+
+    :returns: whether the memberships changed.
+    """
+    # The group type is created in the settings, before the models can be imported.
+    from django.contrib.auth.models import Group
+
+    from reservations.models import ReservablePermission
+
+    Membership = type(user).groups.through
+    names = set(filter(None, names))
+    with transaction.atomic():
+        current = dict(
+            Membership.objects.filter(user=user).values_list("group__name", "group")
+        )
+        added = names - current.keys()
+        removed = [current[name] for name in current.keys() - names]
+        if not added and not removed:
+            return False
+        if added:
+            Group.objects.bulk_create(
+                [Group(name=name) for name in added], ignore_conflicts=True
+            )
+            Membership.objects.bulk_create(
+                [
+                    Membership(user=user, group_id=pk)
+                    for pk in Group.objects.filter(name__in=added).values_list(
+                        "pk", flat=True
+                    )
+                ]
+            )
+        if removed:
+            Membership.objects.filter(user=user, group__in=removed).delete()
+        ReservablePermission.objects.refresh([user.pk])
+    return True
+
+
+class ULLDAPBackend(LDAPBackend):
+    """LDAP backend mirroring the groups of the users with :func:`mirror_groups`.
+
+    It replaces the ``AUTH_LDAP_MIRROR_GROUPS`` setting, which should be left unset:
+    the groups of the LDAP group type are mirrored after every authentication. The
+    user is not authenticated if the groups can not be read, as with the setting.
+    """
+
+    def authenticate_ldap_user(self, ldap_user, password):
+        """Authenticate the user and mirror their groups."""
+        user = super().authenticate_ldap_user(ldap_user, password)
+        if user is None:
+            return None
+        try:
+            names = ldap_user.group_names
+        except self.ldap.LDAPError as error:
+            logger.warning("Could not read the groups of %s: %s", user, error)
+            return None
+        mirror_groups(user, names)
+        return user
@@ -3,10 +3,17 @@ from django.views.i18n import JavaScriptCatalog
 
 from rest_framework import routers
 
+from reservations.asyncviews import (
+    AsyncAvailability,
+    AsyncReservableList,
+    AsyncReservationList,
+)
+from reservations.metrics import metrics
 from reservations.views import (  # MyReservationsViewSet,
     NResourcesViewSet,
     ReservableSetViewSet,
     ReservableViewSet,
+    ReservationSeriesViewSet,
     ReservationViewSet,
     ResourceViewSet,
 )
@@ -19,6 +26,7 @@ router.register(r"nresources", NResourcesViewSet)
 
 
 router.register(r"reservations", ReservationViewSet)
+router.register(r"series", ReservationSeriesViewSet)
 router.register(
     r"sets/(?P<reservable_set_slug>[\w-]+)/types/(?P<reservable_type>[\w-]+)/reservables",
     ReservableViewSet,
@@ -26,8 +34,17 @@ router.register(
 )
 
 
+async_urlpatterns = [
+    path("reservations/", AsyncReservationList.as_view()),
+    path("reservables/", AsyncReservableList.as_view()),
+    path("reservables/availability/", AsyncAvailability.as_view()),
+    path("reservables/<slug:slug>/availability/", AsyncAvailability.as_view()),
+]
+
 urlpatterns = [
+    path("api/async/", include(async_urlpatterns)),
     path("api/", include(router.urls)),
     path("api-auth/", include("rest_framework.urls")),
+    path("metrics/", metrics, name="metrics"),
     path("", include("django.contrib.auth.urls")),
 ]
@@ -1,44 +1,360 @@
 """Reservation application views."""
 
-from heapq import *
+import hashlib
+import json
+from heapq import merge
+from functools import cached_property
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, Optional
 
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import OperationalError, models, transaction
+from django.http import Http404, HttpResponseBase, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    http_date,
+    parse_header_parameters,
+    quote_etag,
+    urlencode,
+)
 from django.utils.translation import gettext_lazy as _
 
-from rest_framework import permissions, serializers, viewsets
+from rest_framework import (
+    exceptions,
+    permissions,
+    renderers,
+    serializers,
+    status,
+    viewsets,
+)
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils import encoders
 
+from reservations.analytics import utilisation
+from reservations.availability import availability, earliest_slots
+from reservations.bulk import check_reservations, insert_reservations
 from reservations.filters import (
+    ArchivedReservationFilter,
     NResourcesFilter,
+    ReservableAvailabilityFilter,
     ReservableFilter,
     ReservableSetFilter,
+    ReservableUtilisationFilter,
+    ReservationChangesFilter,
     ReservationFilter,
+    ReservationSeriesChangesFilter,
+    ReservationSeriesExportFilter,
+    ReservationSeriesFilter,
     ResourceFilter,
+    SeriesOccurrenceFilter,
 )
 from reservations.models import (
+    ArchivedReservation,
+    ChangeSequence,
     NResources,
+    Occurrence,
     Reservable,
     ReservableSet,
     Reservation,
+    ReservationSeries,
+    ReservationSeriesTombstone,
+    ReservationTombstone,
     Resource,
+    missing_resources,
+)
+from reservations.pagination import KeysetPagination
+from reservations.permissions import ReservationPermission, ReservationSeriesPermission
+from reservations.renderers import (
+    ReservationCSVRenderer,
+    ReservationExportRenderer,
+    ReservationICSRenderer,
 )
-from reservations.permissions import ReservationPermission
 from reservations.serializers import (
+    AvailabilityWindowSerializer,
+    BulkReservationSerializer,
+    ChangesQuerySerializer,
+    FlatReservationSerializer,
     ReservableNResourcesSerializer,
     ReservableSerializer,
     ReservableSetSerializer,
     ReservationSerializer,
+    ReservationSeriesSerializer,
     ResourceSerializer,
+    SeriesOccurrenceSerializer,
+    SlotQuerySerializer,
+    UtilisationQuerySerializer,
+    serialize_entries,
 )
 
 
-class ReservableViewSet(viewsets.ModelViewSet):
+#: The SQLSTATE codes of the PostgreSQL errors caused by concurrent transactions.
+CONTENTION_SQLSTATES = {"40001", "40P01", "55P03"}
+
+
+def is_lock_contention(error: OperationalError) -> bool:
+    """Tell whether the error was caused by the locks of a concurrent transaction.
+
+    SQLite rejects the writers it can not serialize as a locked database, PostgreSQL
+    reports the serialization failures, the deadlocks and the lock timeouts by their
+    SQLSTATE.
+    """
+    if getattr(error.__cause__, "sqlstate", None) in CONTENTION_SQLSTATES:
+        return True
+    return str(error).startswith(("database is locked", "database table is locked"))
+
+
+class LockContention(exceptions.APIException):
+    """The reservables are locked by a concurrent request."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("The reservables are locked by another request, try again.")
+    default_code = "lock_contention"
+    #: The number of seconds in the Retry-After header.
+    wait = 1
+
+
+class LockContentionMixin:
+    """Answer the requests failing on the locks of concurrent transactions with 503.
+
+    The transaction of the request is rolled back and the client is asked to retry
+    by the Retry-After header, instead of the server error.
+    """
+
+    def handle_exception(self, exc: Exception) -> Response:
+        """Replace the lock contention errors by the API exception."""
+        if isinstance(exc, OperationalError) and is_lock_contention(exc):
+            exc = LockContention()
+        return super().handle_exception(exc)
+
+
+class EagerLoadingMixin:
+    """Prefetch the related objects the serializer of the viewset needs.
+
+    The serializer class may define the ``setup_eager_loading`` static method which
+    receives the queryset and returns it with the prefetches added.
+    """
+
+    def get_queryset(self) -> models.QuerySet:
+        """Get the queryset prepared for the serializer."""
+        queryset = super().get_queryset()
+        setup_eager_loading = getattr(
+            self.get_serializer_class(), "setup_eager_loading", None
+        )
+        if setup_eager_loading is not None:
+            queryset = setup_eager_loading(queryset)
+        return queryset
+
+
+class FingerprintMixin:
+    """Fingerprint the objects requested from the catalog.
+
+    The fingerprint is the greatest catalog change sequence number of the
+    (filtered) objects and their count, or the sequence number of the object for
+    the detail. The signal handlers give the changed objects and the objects
+    including them a new sequence number and deletions lower the count. It is read
+    once per request.
+    """
+
+    #: The field with the catalog change sequence number of the objects.
+    sequence_field = "sequence"
+
+    @cached_property
+    def fingerprint(self) -> tuple:
+        """Get the greatest sequence number and the count of the requested objects."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            queryset = queryset.filter(**{self.lookup_field: lookup})
+        fingerprint = queryset.order_by().aggregate(
+            sequence=models.Max(self.sequence_field),
+            count=models.Count("pk", distinct=True),
+        )
+        return fingerprint["sequence"], fingerprint["count"]
+
+
+class ConditionalGetMixin(FingerprintMixin):
+    """Answer the conditional GET requests of the catalog without serializing.
+
+    The ETag is derived from the fingerprint of the requested objects. The
+    Last-Modified is the time of the last catalog change.
+    """
+
+    def get_etag(self) -> str:
+        """Get the ETag of the representation of the objects for the request."""
+        variant = (
+            *self.fingerprint,
+            self.request.get_host(),
+            self.request.get_full_path(),
+            self.request.accepted_media_type,
+        )
+        return quote_etag(hashlib.sha1(repr(variant).encode()).hexdigest())
+
+    def conditional(self, view: Callable, request: Request, **kwargs) -> Response:
+        """Answer with 304 Not Modified or the response of the view."""
+        etag = self.get_etag()
+        _sequence, last_change = ChangeSequence.state(ChangeSequence.CATALOG)
+        last_modified = int(last_change.timestamp()) if last_change else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response.headers["ETag"] = etag
+            if last_modified is not None:
+                response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """List the objects unless the client has the current list."""
+        return self.conditional(super().list, request, **kwargs)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """Retrieve the object unless the client has the current representation."""
+        return self.conditional(super().retrieve, request, **kwargs)
+
+
+class CachedResponseMixin(FingerprintMixin):
+    """Cache the list and detail responses of the read-mostly catalog.
+
+    The serialized data is stored in the cache named by the ``RESERVATIONS_CACHE``
+    setting (the default cache if not set). The key contains the fingerprint of the
+    requested objects, the path with the normalised query string, the host and the
+    accepted media type. The data does not depend on the user: the permissions are
+    checked before the cache is read and the browsable API renders its forms for the
+    user from the cached data. The outdated entries are not read again by any
+    process sharing the database and expire in ``cache_timeout`` seconds, while a
+    change of one object leaves the entries of the other objects valid. Data
+    serialized while the objects changed is stored under the old fingerprint and
+    never returned.
+    """
+
+    #: How long the responses are kept in the cache in seconds.
+    cache_timeout = 60 * 60
+
+    def get_cache_key(self, request: Request) -> str:
+        """Get the cache key of the response to the request."""
+        query = urlencode(
+            sorted(
+                (key, sorted(values)) for key, values in request.query_params.lists()
+            ),
+            doseq=True,
+        )
+        variant = (request.get_host(), request.path, query, request.accepted_media_type)
+        digest = hashlib.sha1(repr(variant).encode()).hexdigest()
+        sequence, count = self.fingerprint
+        return f"reservations:{self.basename}:{sequence}-{count}:{digest}"
+
+    def cached(self, view: Callable, request: Request, **kwargs) -> Response:
+        """Get the response from the cache or from the view."""
+        cache = caches[getattr(settings, "RESERVATIONS_CACHE", DEFAULT_CACHE_ALIAS)]
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = view(request, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            # Store plain data without the serializer and the hyperlinked objects.
+            data = json.loads(json.dumps(response.data, cls=encoders.JSONEncoder))
+            cache.set(key, data, self.cache_timeout)
+        return response
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """List the objects from the cache."""
+        return self.cached(super().list, request, **kwargs)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """Retrieve the object from the cache."""
+        return self.cached(super().retrieve, request, **kwargs)
+
+
+class ReservableViewSet(
+    ConditionalGetMixin, CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet
+):
     """The reservable viewset."""
 
     serializer_class = ReservableSerializer
     filterset_class = ReservableFilter
     queryset = Reservable.objects.all()
+    pagination_class = KeysetPagination
+    keyset_ordering = ("slug",)
+
+    def get_queryset(self) -> models.QuerySet:
+        """Restrict the reservables to the set and type given in the URL."""
+        queryset = super().get_queryset()
+        if "reservable_set_slug" in self.kwargs:
+            queryset = queryset.filter(
+                reservableset_set__slug=self.kwargs["reservable_set_slug"],
+                type=self.kwargs["reservable_type"],
+            )
+        return queryset
+
+    def get_availability(
+        self, request: Request, reservables: Iterable[tuple[int, str]]
+    ) -> Response:
+        """Get the availability of the (pk, slug) reservables.
 
+        The time window is given by the ``start`` and ``end`` query parameters.
+        """
+        window = AvailabilityWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        return Response(
+            availability(
+                reservables,
+                window.validated_data["start"],
+                window.validated_data["end"],
+            )
+        )
+
+    @action(
+        detail=False,
+        url_path="availability",
+        filterset_class=ReservableAvailabilityFilter,
+    )
+    def availability(self, request: Request, *args, **kwargs) -> Response:
+        """Get the busy and free intervals of the (filtered) reservables."""
+        reservables = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        return self.get_availability(request, reservables.values_list("pk", "slug"))
+
+    @action(detail=False, url_path=r"(?P<slug>[\w-]+)/availability")
+    def reservable_availability(self, request: Request, slug: str, *args, **kwargs):
+        """Get the busy and free intervals of the reservable."""
+        reservable = get_object_or_404(
+            self.get_queryset().prefetch_related(None).only("slug"), slug=slug
+        )
+        return self.get_availability(request, [(reservable.pk, reservable.slug)])
+
+    @action(detail=False, filterset_class=ReservableUtilisationFilter)
+    def utilisation(self, request: Request, *args, **kwargs) -> Response:
+        """Get the utilisation heat map of the (filtered) reservables.
 
-class ResourceViewSet(viewsets.ModelViewSet):
+        The query parameters are the time window (``start``, ``end``), the ``group``
+        of the rows (``reservable``, ``set`` or ``type``) and the ``resolution`` of
+        the buckets (``hour`` or ``day``).
+        """
+        query = UtilisationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        field = {
+            "reservable": "slug",
+            "set": "reservableset_set__slug",
+            "type": "type",
+        }[query.validated_data["group"]]
+        return Response(
+            utilisation(
+                self.filter_queryset(self.get_queryset()),
+                field,
+                query.validated_data["start"],
+                query.validated_data["end"],
+                query.validated_data["resolution"],
+            )
+        )
+
+
+class ResourceViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """The resource viewset."""
 
     queryset = Resource.objects.all()
@@ -46,39 +362,404 @@ class ResourceViewSet(viewsets.ModelViewSet):
     filterset_class = ResourceFilter
 
 
-class ReservableSetViewSet(viewsets.ModelViewSet):
+class ReservableSetViewSet(
+    ConditionalGetMixin, CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet
+):
     """The reservable sets viewset."""
 
     queryset = ReservableSet.objects.all()
     serializer_class = ReservableSetSerializer
     filterset_class = ReservableSetFilter
 
+    @action(detail=False, url_path=r"(?P<slug>[\w-]+)/slots")
+    def slots(self, request: Request, slug: str, *args, **kwargs) -> Response:
+        """Get the earliest free slots on the reservables in the set.
 
-class NResourcesViewSet(viewsets.ModelViewSet):
+        The query parameters are the search window (``start``, ``end``), the
+        ``duration`` of the slot, the required ``resources`` as comma separated
+        ``slug:n`` pairs and the ``limit`` on the number of slots.
+        """
+        reservable_set = get_object_or_404(ReservableSet.objects.only("pk"), slug=slug)
+        query = SlotQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        reservables = Reservable.objects.filter(
+            reservableset_set=reservable_set
+        ).with_resources(query.validated_data["resources"])
+        return Response(
+            earliest_slots(
+                reservables.values_list("pk", "slug"),
+                query.validated_data["start"],
+                query.validated_data["end"],
+                query.validated_data["duration"],
+                query.validated_data["limit"],
+            )
+        )
+
+
+class NResourcesViewSet(CachedResponseMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """The nresources viewset."""
 
     queryset = NResources.objects.all()
     serializer_class = ReservableNResourcesSerializer
     filterset_class = NResourcesFilter
+    # The reservables move in the catalog changes with their resources.
+    sequence_field = "reservable__sequence"
+
 
+def changes_between(
+    queryset: models.QuerySet,
+    tombstones: type[models.Model],
+    since: Optional[int],
+    token: int,
+) -> tuple[models.QuerySet, list[int]]:
+    """Get the objects of the queryset changed between the tokens and the
+    primary keys of the deleted objects in the order of the changes."""
+    queryset = queryset.filter(sequence__lt=token)
+    deleted = tombstones.objects.none()
+    if since is not None:
+        queryset = queryset.filter(sequence__gte=since)
+        deleted = tombstones.objects.filter(
+            sequence__gte=since, sequence__lt=token
+        ).order_by("sequence", "pk")
+    return (
+        queryset.order_by("sequence", "pk"),
+        list(deleted.values_list(tombstones.object_field, flat=True)),
+    )
 
-class ReservationViewSet(viewsets.ModelViewSet):
-    """Reservation view set."""
+
+class ReservationViewSet(LockContentionMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    """Reservation view set.
+
+    The reservations are read with primary keys instead of hyperlinks for the related
+    objects when requested by the ``flat`` query parameter or the media type parameter
+    (for instance ``Accept: application/json; flat=true``).
+
+    The listing includes the occurrences of the reservation series matching the
+    filters, see :class:`~reservations.filters.ReservationSeriesExportFilter`, in the
+    representation of :class:`~reservations.serializers.SeriesOccurrenceSerializer`.
+    It is paginated by the (``start``, ``id``) keyset when the ``cursor`` or the
+    ``page_size`` query parameter is given, the occurrences are keyed as described
+    by :class:`~reservations.models.Occurrence`. It can also be exported as CSV or
+    iCalendar (``format=csv`` or ``format=ics``), the exports are streamed and not
+    paginated. The exports include the same occurrences in the same order.
+
+    The archived reservations are listed and retrieved together with the current
+    ones, ordered by the keyset when there are any. They are read-only.
+    """
 
     queryset = Reservation.objects.all()
     permission_classes = (ReservationPermission,)
     filterset_class = ReservationFilter
     serializer_class = ReservationSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ("start", "id")
+
+    #: The renderers of the streamed exports.
+    export_renderer_classes = (ReservationCSVRenderer, ReservationICSRenderer)
+
+    def is_flat(self) -> bool:
+        """Did the client request the flat representation."""
+        flat = self.request.query_params.get("flat")
+        if flat is None and getattr(self.request, "accepted_media_type", None):
+            _media_type, params = parse_header_parameters(
+                self.request.accepted_media_type
+            )
+            flat = params.get("flat")
+        return flat in ("1", "true", "yes")
+
+    def get_serializer_class(self) -> type[serializers.Serializer]:
+        """Use the flat serializer for read-only requests when requested."""
+        if self.request.method in permissions.SAFE_METHODS and self.is_flat():
+            return FlatReservationSerializer
+        return super().get_serializer_class()
+
+    def get_renderers(self) -> list[renderers.BaseRenderer]:
+        """Offer the exports when listing the reservations."""
+        available = super().get_renderers()
+        if self.action == "list":
+            available += [renderer() for renderer in self.export_renderer_classes]
+        return available
+
+    def get_archived_queryset(self) -> Optional[models.QuerySet]:
+        """Get the filtered archived reservations if the query can match any."""
+        queryset = ArchivedReservationFilter.filter_archive(
+            self.request, ArchivedReservation.objects.horizon()
+        )
+        setup_eager_loading = getattr(
+            self.get_serializer_class(), "setup_eager_loading", None
+        )
+        if queryset is not None and setup_eager_loading is not None:
+            queryset = setup_eager_loading(queryset)
+        return queryset
+
+    def get_object(self) -> models.Model:
+        """Get the reservation, looking up the archive for the read-only requests."""
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method not in permissions.SAFE_METHODS:
+                raise
+        queryset = self.get_archived_queryset()
+        if queryset is None:
+            raise Http404
+        reservation = get_object_or_404(queryset, pk=self.kwargs["pk"])
+        self.check_object_permissions(self.request, reservation)
+        return reservation
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        """List the reservations and the occurrences, streaming the exports."""
+        renderer = request.accepted_renderer
+        querysets = [self.filter_queryset(self.get_queryset())]
+        archived = self.get_archived_queryset()
+        if archived is not None:
+            querysets.append(archived)
+        series = ReservationSeriesExportFilter(
+            request.query_params,
+            queryset=ReservationSeries.objects.all(),
+            request=request,
+        )
+        if not isinstance(renderer, ReservationExportRenderer):
+            return self.list_merged(querysets, series)
+        response = StreamingHttpResponse(
+            renderer.stream(
+                [queryset.order_by("start", "id") for queryset in querysets],
+                request,
+                series,
+            ),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="reservations.{renderer.format}"'
+        )
+        return response
 
+    def list_merged(
+        self,
+        querysets: Iterable[models.QuerySet],
+        series: ReservationSeriesExportFilter,
+    ) -> Response:
+        """List the reservations of the querysets and the occurrences of the series
+        merged by the keyset."""
+
+        def occurrences(cursor: Optional[tuple]) -> Iterator[Occurrence]:
+            since = None if cursor is None else cursor[0]
+            queryset = SeriesOccurrenceSerializer.setup_eager_loading(
+                series.qs.occurring(since, None)
+            )
+            return (
+                Occurrence(*occurrence)
+                for occurrence in series.occurrences(queryset, since)
+            )
+
+        page = self.paginator.paginate_querysets(
+            querysets, self.request, view=self, entries=occurrences
+        )
+        if page is not None:
+            return self.get_paginated_response(self.serialize_entries(page))
+        entries = merge(
+            *(queryset.order_by(*self.keyset_ordering) for queryset in querysets),
+            occurrences(None),
+            key=attrgetter(*self.keyset_ordering),
+        )
+        return Response(self.serialize_entries(list(entries)))
+
+    def serialize_entries(self, entries: list) -> list:
+        """Serialize the reservations and the occurrences keeping their order."""
+        return serialize_entries(
+            self.get_serializer_class(), entries, self.get_serializer_context()
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer: serializers.Serializer):
         """Perform additional permission checks.
 
         The has_object_permission is not called when creating objects so we have to
-        perform the necessary permission checks here.
+        perform the necessary permission checks here. The reservables are locked
+        while checking and creating the reservation.
 
         :raises PermissionDenied: if user has no permission to create the reservation.
         """
+        Reservable.objects.lock(serializer.validated_data["reservables"])
         ReservationPermission().can_create_update(
             serializer.validated_data, self.request.user
         )
         return super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer: serializers.Serializer):
+        """Repeat the permission checks while holding the lock on the reservables.
+
+        The requirements of the reservation must be satisfied by the resources of the
+        new reservables.
+
+        :raises PermissionDenied: if user has no permission to update the reservation.
+        :raises ValidationError: if the reservables do not have enough resources.
+        """
+        reservables = serializer.validated_data.get(
+            "reservables", serializer.instance.reservables.all()
+        )
+        Reservable.objects.lock([*reservables, *serializer.instance.reservables.all()])
+        ReservationPermission().can_create_update(
+            serializer.validated_data, self.request.user, serializer.instance
+        )
+        requirements = dict(
+            serializer.instance.nrequirements_set.values_list("resource", "n")
+        )
+        missing = missing_resources(
+            requirements, NResources.objects.capacity(reservables)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                {
+                    "reservables": [
+                        _("Insufficient resources: {}.").format(
+                            ", ".join(
+                                Resource.objects.filter(pk__in=missing)
+                                .order_by("slug")
+                                .values_list("slug", flat=True)
+                            )
+                        )
+                    ]
+                }
+            )
+        return super().perform_update(serializer)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request: Request, *args, **kwargs) -> Response:
+        """Create the list of reservations in a single transaction.
+
+        The reservations are given in the flat representation. Either all of them are
+        created or none, the response contains the result for every reservation.
+        """
+        serializer = BulkReservationSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, dict):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            items = serializer.validated_data
+            with transaction.atomic():
+                Reservable.objects.lock(
+                    pk for item in items for pk in item["reservables"]
+                )
+                errors = check_reservations(items, request.user)
+                if not any(errors):
+                    reservations = insert_reservations(items)
+        if any(errors):
+            return Response(
+                [{"index": i, "errors": e} for i, e in enumerate(errors) if e],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            [{"index": i, "id": r.pk} for i, r in enumerate(reservations)],
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, filterset_class=ReservationChangesFilter)
+    def changes(self, request: Request, *args, **kwargs) -> Response:
+        """Get the (filtered) reservations and series changed or deleted after the
+        token.
+
+        The token is given by the ``since`` query parameter and the response contains
+        the token for the next request, all reservations are returned without it.
+        Deleted reservations are listed by their primary keys regardless of the
+        filters. The series are listed the same way under ``series``, they are
+        filtered like in the exports.
+        """
+        query = ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data.get("since")
+        # The changes below the token are all committed.
+        token = ChangeSequence.committed()
+        changed, deleted = changes_between(
+            self.filter_queryset(self.get_queryset()),
+            ReservationTombstone,
+            since,
+            token,
+        )
+        series, deleted_series = changes_between(
+            ReservationSeriesChangesFilter(
+                request.query_params,
+                queryset=ReservationSeriesSerializer.setup_eager_loading(
+                    ReservationSeries.objects.all()
+                ),
+                request=request,
+            ).qs,
+            ReservationSeriesTombstone,
+            since,
+            token,
+        )
+        return Response(
+            {
+                "token": token,
+                "changed": self.get_serializer(changed, many=True).data,
+                "deleted": deleted,
+                "series": {
+                    "changed": ReservationSeriesSerializer(
+                        series, many=True, context=self.get_serializer_context()
+                    ).data,
+                    "deleted": deleted_series,
+                },
+            }
+        )
+
+
+class ReservationSeriesViewSet(
+    LockContentionMixin, EagerLoadingMixin, viewsets.ModelViewSet
+):
+    """Reservation series view set."""
+
+    queryset = ReservationSeries.objects.all()
+    permission_classes = (ReservationSeriesPermission,)
+    filterset_class = ReservationSeriesFilter
+    serializer_class = ReservationSeriesSerializer
+
+    @transaction.atomic
+    def perform_create(self, serializer: serializers.Serializer):
+        """Perform additional permission checks while holding the reservable locks.
+
+        :raises PermissionDenied: if user has no permission to create the series.
+        """
+        Reservable.objects.lock(serializer.validated_data["reservables"])
+        ReservationSeriesPermission().can_create_update(
+            serializer.validated_data, self.request.user
+        )
+        return super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer: serializers.Serializer):
+        """Repeat the permission checks while holding the reservable locks.
+
+        :raises PermissionDenied: if user has no permission to update the series.
+        """
+        Reservable.objects.lock(
+            [
+                *serializer.validated_data["reservables"],
+                *serializer.instance.reservables.all(),
+            ]
+        )
+        ReservationSeriesPermission().can_create_update(
+            serializer.validated_data, self.request.user, serializer.instance
+        )
+        return super().perform_update(serializer)
+
+    @action(detail=False, filterset_class=SeriesOccurrenceFilter)
+    def occurrences(self, request: Request, *args, **kwargs) -> Response:
+        """Get the occurrences of the (filtered) series in the time window.
+
+        The time window is given by the ``start`` and ``end`` query parameters.
+        """
+        window = AvailabilityWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start = window.validated_data["start"]
+        end = window.validated_data["end"]
+        queryset = self.filter_queryset(self.get_queryset()).occurring(start, end)
+        occurrences = sorted(
+            (
+                Occurrence(series, occurrence_start, occurrence_end)
+                for series in queryset.distinct()
+                for occurrence_start, occurrence_end in series.occurrences(start, end)
+            ),
+            key=attrgetter("start", "id"),
+        )
+        return Response(SeriesOccurrenceSerializer(occurrences, many=True).data)